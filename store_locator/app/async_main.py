@@ -0,0 +1,392 @@
+"""
+Async variant of the API: `uvicorn app.async_main:app`.
+
+Search, auth and admin endpoints run on an AsyncSession (aiosqlite / asyncpg), so a
+request waiting on the database or the geocoder holds no threadpool thread. CPU-bound
+work goes to the threadpool: bcrypt, and a radius search's pass over the spatial index
+(distances, filter masks, page selection). Only the page's rows are then loaded on the
+AsyncSession. Reused sync code that queries as it goes (searches without a radius, the
+SQL backend, service resolution) runs through AsyncSession.run_sync on the event loop.
+Routes without an async version (health, CSV import, seed) are served by the sync app's
+handlers.
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from . import main, models, schemas
+from .auth_utils import (
+    create_access_token,
+    create_refresh_token,
+    get_current_user_async,
+    get_password_hash,
+    verify_password,
+    verify_refresh_token,
+)
+from .config import settings
+from .database import dispose_async_engine, get_async_db
+from .services import import_jobs, spatial_index
+from .services.geocoder import GeocoderUnavailable, get_lat_lon_async
+from .services.metrics import RequestMetricsMiddleware, search_request, stage
+from .services.profiling import ProfilingMiddleware
+from .services.sql_trace import SQLStatsMiddleware
+from .services.search import (
+    InvalidCursor,
+    cache_search,
+    get_cached_search,
+    load_index_page,
+    search_cache_key,
+    search_stores_logic,
+    select_index_page,
+)
+from .utils import process_services
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with main.lifespan(app):
+        yield
+    await dispose_async_engine()
+
+
+app = FastAPI(title="Store Locator API (async)", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=main.origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(SQLStatsMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
+limiter = main.limiter
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+async def _user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(
+        select(models.User).options(selectinload(models.User.role)).where(models.User.email == email)
+    )
+
+
+# --- 1. PUBLIC SEARCH ---
+@app.post("/api/stores/search")
+@limiter.limit("100/minute")
+async def search_stores(
+        payload: schemas.SearchRequest,
+        request: Request,
+        db: AsyncSession = Depends(get_async_db)
+):
+    deadline = time.monotonic() + settings.SEARCH_DEADLINE_SECONDS
+    with search_request():
+        try:
+            search_query = payload.zip_code or payload.address
+            filters = payload.filters
+
+            with stage("cache"):
+                cache_key = search_cache_key(
+                    db, search_query, None, None, filters.radius_miles, filters.store_type,
+                    filters.services, filters.open_now, payload.page, payload.limit, cursor=payload.cursor
+                )
+                cached = get_cached_search(cache_key)
+            if cached is not None:
+                return main.encode_search(cached)
+
+            lat, lon = None, None
+            if search_query:
+                budget = (deadline - time.monotonic()) * settings.GEOCODE_BUDGET_FRACTION
+                with stage("geocode"):
+                    try:
+                        lat, lon = await get_lat_lon_async(search_query, timeout=budget)
+                    except GeocoderUnavailable as e:
+                        raise main.geocoder_unavailable(e)
+                # No match: without coordinates the radius can't be applied, so no unfiltered listing
+                if lat is None:
+                    raise HTTPException(status_code=404, detail="Location not found")
+
+            selected = None
+            if settings.SEARCH_BACKEND != "sql":
+                with stage("index"):
+                    index = await spatial_index.get_index_async(db)
+                # Masks and page selection are pure CPU: keep them off the event loop
+                selected = await run_in_threadpool(
+                    select_index_page, index, lat, lon, filters.radius_miles, filters.store_type,
+                    filters.services, payload.page, payload.limit, open_now=filters.open_now,
+                    cursor=payload.cursor
+                )
+            if selected is not None:
+                results = await db.run_sync(lambda session: load_index_page(session, selected))
+            else:
+                results = await db.run_sync(
+                    lambda session: search_stores_logic(
+                        session, lat, lon, filters.radius_miles, filters.store_type, filters.services,
+                        payload.page, payload.limit, open_now=filters.open_now, backend="sql",
+                        cursor=payload.cursor
+                    )
+                )
+
+            cache_search(cache_key, results)
+            return main.encode_search(results)
+
+        except HTTPException:
+            raise
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            return main.search_failed()
+
+
+# --- 2. AUTHENTICATION ---
+@app.post("/api/auth/login", response_model=schemas.Token)
+async def login(form_data: schemas.TokenData, db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, form_data.email)
+    # bcrypt is deliberately slow: end the read transaction so its connection goes back
+    # to the pool (nothing is expired on commit), then hash off the event loop
+    await db.commit()
+    if not user or not await run_in_threadpool(verify_password, form_data.role, user.password_hash):
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    access_token = create_access_token(data={"sub": user.email, "role": user.role.name, "user_id": user.id})
+    refresh_token = create_refresh_token(data={"sub": user.email})
+
+    db.add(models.RefreshToken(
+        token_hash=await run_in_threadpool(get_password_hash, refresh_token),
+        user_id=user.id
+    ))
+    await db.commit()
+
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@app.post("/api/auth/refresh", response_model=schemas.Token)
+async def refresh_token(payload: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    email = verify_refresh_token(payload.refresh_token)
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = await _user_by_email(db, email)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    new_access_token = create_access_token(data={"sub": user.email, "role": user.role.name, "user_id": user.id})
+    return {"access_token": new_access_token, "refresh_token": payload.refresh_token, "token_type": "bearer"}
+
+
+# --- 3. ADMIN: STORE MANAGEMENT ---
+@app.post("/api/admin/stores", response_model=schemas.StoreResponse, status_code=201)
+async def create_store(
+        store: schemas.StoreCreate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name not in ["admin", "marketer"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if await db.get(models.Store, store.store_id):
+        raise HTTPException(status_code=400, detail="Store ID exists")
+
+    lat, lon = 0.0, 0.0
+    if store.address_postal_code:
+        found = await get_lat_lon_async(store.address_postal_code)
+        if found[0] is not None:
+            lat, lon = found
+
+    service_objs = await db.run_sync(process_services, store.services)
+    new_store = models.Store(
+        **store.model_dump(exclude={"services"}),
+        latitude=lat,
+        longitude=lon,
+        services=service_objs
+    )
+
+    db.add(new_store)
+    await db.commit()
+    await db.refresh(new_store)
+    return new_store
+
+
+@app.get("/api/admin/stores/{store_id}", response_model=schemas.StoreResponse)
+async def get_store(
+        store_id: str,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    store = await db.get(models.Store, store_id)
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+    return store
+
+
+@app.patch("/api/admin/stores/{store_id}", response_model=schemas.StoreResponse)
+async def update_store(
+        store_id: str,
+        payload: schemas.StoreUpdate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name not in ["admin", "marketer"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    store = await db.get(models.Store, store_id)
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+
+    update_data = payload.model_dump(exclude_unset=True)
+
+    if "services" in update_data:
+        store.services = await db.run_sync(process_services, update_data.pop("services"))
+
+    for key, value in update_data.items():
+        setattr(store, key, value)
+
+    await db.commit()
+    await db.refresh(store)
+    return store
+
+
+@app.get("/api/admin/stores/import/{job_id}")
+async def get_import_job(
+        job_id: str,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name not in ["admin", "marketer"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job = await db.get(models.ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_jobs.job_status(job)
+
+
+@app.post("/api/admin/reset_db")
+async def reset_db(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    await db.execute(text("DELETE FROM users WHERE id > 1"))
+    if "postgres" in str(db.get_bind().url):
+        await db.execute(text("ALTER SEQUENCE users_id_seq RESTART WITH 2"))
+    else:
+        await db.execute(text("UPDATE sqlite_sequence SET seq = 1 WHERE name = 'users'"))
+
+    await db.commit()
+    return {"message": "Database cleaned and IDs reset to 2"}
+
+
+# --- 4. ADMIN: USER MANAGEMENT ---
+@app.post("/api/admin/users", response_model=schemas.UserResponse, status_code=201)
+async def create_user(
+        user: schemas.UserCreate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if await db.scalar(select(models.User.id).where(models.User.email == user.email)):
+        raise HTTPException(status_code=400, detail="Email registered")
+
+    role_id = user.role_id
+    if not role_id:
+        role_id = await db.scalar(select(models.Role.id).where(models.Role.name == "viewer"))
+
+    new_user = models.User(
+        email=user.email,
+        password_hash=await run_in_threadpool(get_password_hash, user.password),
+        role_id=role_id,
+        is_active=user.is_active
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+@app.get("/api/admin/users", response_model=List[schemas.UserResponse])
+async def list_users(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return (await db.scalars(select(models.User))).all()
+
+
+@app.put("/api/admin/users/{user_id}", response_model=schemas.UserResponse)
+async def update_user(
+        user_id: int,
+        user_update: schemas.UserUpdate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user_update.role_id is not None:
+        user.role_id = user_update.role_id
+
+    if user_update.is_active is not None:
+        if user.id == current_user.id and user_update.is_active is False:
+            raise HTTPException(status_code=400, detail="Cannot deactivate yourself")
+        user.is_active = user_update.is_active
+
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+@app.delete("/api/admin/users/{user_id}", status_code=204)
+async def delete_user(
+        user_id: int,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async)
+):
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if user_id == 1:
+        raise HTTPException(status_code=400, detail="Cannot delete Super Admin")
+
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await db.delete(user)
+    await db.commit()
+    return None
+
+
+# --- 5. SYNC FALLBACK ---
+# Anything not defined above (health check, CSV import, seed) keeps its sync handler
+_async_routes = {(r.path, m) for r in app.router.routes if isinstance(r, APIRoute) for m in r.methods}
+for _route in main.app.router.routes:
+    if isinstance(_route, APIRoute) and not any((_route.path, m) in _async_routes for m in _route.methods):
+        app.router.routes.append(_route)
@@ -4,10 +4,11 @@ import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 
 from . import models
-from .database import get_db
+from .database import get_async_db, get_db
 from .config import settings
 
 # 1. Setup Password Hashing
@@ -64,27 +65,45 @@ def verify_refresh_token(token: str) -> Optional[str]:
 
 
 # --- User Dependencies ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """
-    Validates the Access Token and retrieves the User object.
-    Used by endpoints to protect routes (e.g., current_user: models.User = Depends(get_current_user))
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _access_token_email(token: str) -> str:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except jwt.PyJWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    email: str = payload.get("sub")
+    if email is None:
+        raise _credentials_exception()
+    return email
 
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Validates the Access Token and retrieves the User object.
+    Used by endpoints to protect routes (e.g., current_user: models.User = Depends(get_current_user))
+    """
+    email = _access_token_email(token)
     user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(get_async_db)):
+    """get_current_user for app.async_main. The role is loaded up front: an AsyncSession cannot lazy-load it later."""
+    email = _access_token_email(token)
+    user = await db.scalar(
+        select(models.User).options(selectinload(models.User.role)).where(models.User.email == email)
+    )
+    if user is None:
+        raise _credentials_exception()
     return user
 
 
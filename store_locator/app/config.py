@@ -3,6 +3,19 @@ import os
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Used by app.async_main; empty = DATABASE_URL with its async driver (aiosqlite/asyncpg)
+    ASYNC_DATABASE_URL: str = ""
+
+    # Connection pool (per engine, per worker process). A checkout waits up to
+    # DB_POOL_TIMEOUT_SECONDS once DB_POOL_SIZE + DB_MAX_OVERFLOW connections are in use.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite only: WAL journal (readers don't block on a writer) and lock wait before "database is locked"
+    DB_SQLITE_WAL: bool = True
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000
     SECRET_KEY: str = "supersecretkey"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -11,6 +24,88 @@ class Settings(BaseSettings):
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
 
+    # Store search: "index" (in-memory grid) or "sql" (bounding box pushed into the WHERE clause)
+    SEARCH_BACKEND: str = "index"
+
+    # In-memory spatial index used by store search
+    SPATIAL_INDEX_CELL_DEGREES: float = 0.5
+    SPATIAL_INDEX_MAX_AGE_SECONDS: int = 300
+
+    # Geocode cache: bounded LRU, 30-day TTL. Set GEOCODE_CACHE_PATH (e.g. geocode_cache.sqlite3)
+    # to snapshot it to disk and reload it on startup.
+    GEOCODE_CACHE_MAX_ENTRIES: int = 50000
+    GEOCODE_CACHE_TTL_SECONDS: int = 2592000
+    GEOCODE_CACHE_SWEEP_SECONDS: int = 60
+    GEOCODE_CACHE_SNAPSHOT_SECONDS: int = 300
+    GEOCODE_CACHE_PATH: str = ""
+
+    # Failed lookups are cached briefly so a bad address doesn't pay the timeout on every search
+    GEOCODE_NEGATIVE_TTL_SECONDS: int = 600
+    GEOCODE_ERROR_TTL_SECONDS: int = 30
+
+    # Circuit breaker: after N consecutive upstream errors/timeouts, skip the geocoder for the cooldown
+    GEOCODER_BREAKER_THRESHOLD: int = 5
+    GEOCODER_BREAKER_COOLDOWN_SECONDS: int = 30
+
+    # Async geocoder used by search (Nominatim-compatible /search endpoint)
+    GEOCODER_URL: str = "https://nominatim.openstreetmap.org/search"
+    GEOCODER_TIMEOUT_SECONDS: float = 10.0
+    GEOCODER_MAX_CONCURRENCY: int = 4
+
+    # Time budget for one search request; geocoding may use at most GEOCODE_BUDGET_FRACTION of it
+    SEARCH_DEADLINE_SECONDS: float = 5.0
+    GEOCODE_BUDGET_FRACTION: float = 0.6
+
+    # Import geocoding for rows without coordinates. With GEOCODE_BATCH_URL set (US Census batch
+    # endpoint, e.g. https://geocoding.geo.census.gov/geocoder/locations/addressbatch) addresses
+    # are sent GEOCODE_BATCH_SIZE per request; otherwise they go through the single-address
+    # geocoder on a small pool throttled to Nominatim's 1 request/second policy.
+    GEOCODE_BATCH_URL: str = ""
+    GEOCODE_BATCH_BENCHMARK: str = "Public_AR_Current"
+    GEOCODE_BATCH_SIZE: int = 1000
+    GEOCODE_BATCH_TIMEOUT_SECONDS: int = 300
+    GEOCODE_BATCH_WORKERS: int = 2
+    GEOCODE_BATCH_RATE_PER_SECOND: float = 1.0
+
+    # CSV import: rows parsed, geocoded and written per batch of statements
+    IMPORT_CHUNK_SIZE: int = 1000
+    # Background import jobs: where uploads are spooled (empty = system temp dir), and how
+    # many row-level errors a job keeps for its status report
+    IMPORT_SPOOL_DIR: str = ""
+    IMPORT_MAX_ERROR_DETAILS: int = 100
+    # Jobs run inside the app process and do not survive a restart: at startup, jobs left
+    # queued/staging/merging are marked failed and their staging rows and spool files removed.
+    # Turn off when several app processes share the database and may start while another imports.
+    IMPORT_RECOVER_ON_STARTUP: bool = True
+
+    # Offline ZIP -> centroid table (built with app.scripts.load_zip_gazetteer)
+    ZIP_GAZETTEER_PATH: str = "data/zip_centroids.csv"
+
+    # Search result cache (cleared whenever stores change)
+    SEARCH_CACHE_TTL_SECONDS: int = 300
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048
+
+    # Prometheus metrics on GET /metrics (request counts/latency, search stages, caches, DB pools).
+    # Off by default: the endpoint is public unless METRICS_TOKEN is set, in which case
+    # scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str = ""
+
+    # Request profiling: an admin adds "X-Profile: 1" (or ?profile=1) to any request, and a
+    # PROFILE_SAMPLE_RATE share of all requests is profiled at random. Profiles are kept per
+    # worker (the last PROFILE_MAX_STORED) and also written to PROFILE_DIR when set.
+    PROFILING_ENABLED: bool = True
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 2.0
+    PROFILE_MAX_STORED: int = 50
+    PROFILE_DIR: str = ""
+
+    # SQL instrumentation: statements slower than SLOW_QUERY_MS (0 = off) are logged as JSON
+    # lines on the "app.slow_query" logger; SQL_DEBUG_HEADERS adds each request's statement
+    # count and time as X-SQL-Statements / X-SQL-Time-Ms response headers (debugging only)
+    SLOW_QUERY_MS: float = 200.0
+    SQL_DEBUG_HEADERS: bool = False
+
     class Config:
         env_file = ".env"
 
@@ -1,11 +1,69 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .services.pool_metrics import async_pool_metrics, instrument, instrumented, sync_pool_metrics
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+# --- ENGINE OPTIONS ---
+def is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, pool_cls, metrics):
+    """
+    (url, create_engine kwargs) from the DB_POOL_* settings, with pool checkouts timed
+    into metrics. SQLite gets check_same_thread=False so pooled connections can move
+    between threadpool workers, and an in-memory URL becomes a named shared-cache
+    database so every pooled connection sees the same data.
+    """
+    url = make_url(url)
+    options = {
+        "poolclass": instrumented(pool_cls, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.DB_SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        if is_memory_sqlite(url):
+            url = url.set(database="file:store_locator", query={"mode": "memory", "cache": "shared", "uri": "true"})
+    return url, options
+
+
+def configure_sqlite(engine):
+    """
+    Per-connection pragmas. WAL lets readers proceed while a writer commits (the default
+    rollback journal blocks them), synchronous=NORMAL is the recommended pairing for WAL,
+    and busy_timeout makes a second writer wait instead of failing with "database is locked".
+    """
+    if engine.url.get_backend_name() != "sqlite":
+        return
+    memory = is_memory_sqlite(engine.url) or engine.url.query.get("mode") == "memory"
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.DB_SQLITE_BUSY_TIMEOUT_MS)}")
+        if settings.DB_SQLITE_WAL and not memory:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+
+_url, _options = engine_options(SQLALCHEMY_DATABASE_URL, QueuePool, sync_pool_metrics)
+engine = create_engine(_url, **_options)
+configure_sqlite(engine)
+instrument(engine, sync_pool_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -15,4 +73,55 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- ASYNC ENGINE (app.async_main) ---
+# Created on first use, so the sync app never needs aiosqlite/asyncpg installed
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+_async_engine = None
+_async_session_factory = None
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url, options = engine_options(
+            settings.ASYNC_DATABASE_URL or async_database_url(SQLALCHEMY_DATABASE_URL),
+            AsyncAdaptedQueuePool, async_pool_metrics,
+        )
+        _async_engine = create_async_engine(url, **options)
+        configure_sqlite(_async_engine.sync_engine)
+        instrument(_async_engine.sync_engine, async_pool_metrics)
+        # expire_on_commit=False: attributes cannot be lazy-loaded after commit outside the session's greenlet
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_session_factory() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine, _async_session_factory = None, None
+
+
+def pool_stats() -> dict:
+    return {"sync": sync_pool_metrics.stats(), "async": async_pool_metrics.stats()}
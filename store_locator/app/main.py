@@ -1,24 +1,52 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import List, Optional
-import csv
 import codecs
+import hmac
 import json
-import hashlib
+import logging
+import math
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
+from contextlib import asynccontextmanager
 import os
+import time
 
 # Internal modules
-from .database import engine, get_db
+from .database import engine, get_db, pool_stats
 from . import models, schemas
+from .migrations import upgrade_schema
 from .config import settings
 # Updated Import: Removed redis_client since we switched to in-memory
-from .services.search import search_stores_logic, get_lat_lon
+from .services.search import (
+    search_stores_logic,
+    get_lat_lon,
+    search_cache_key,
+    get_cached_search,
+    cache_search,
+    search_cache_stats,
+    InvalidCursor
+)
+from .services.geocoder import (
+    GeocoderUnavailable,
+    start_geocode_cache,
+    stop_geocode_cache,
+    get_lat_lon_async,
+    close_geocoder_client,
+    geocode_stats
+)
+from .services.gazetteer import load_gazetteer
+from .services.metrics import SEARCH_ERRORS, RequestMetricsMiddleware, registry, search_request, stage
+from .services.profiling import ProfilingMiddleware, get_profile, list_profiles
+from .services.sql_trace import SQLStatsMiddleware
+from .services import importer, import_jobs
 from .auth_utils import (
     get_password_hash,
     verify_password,
@@ -31,8 +59,22 @@ from .utils import process_services, check_is_open
 
 # 1. Create Database Tables
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the ZIP gazetteer, reload the geocode cache snapshot and start its background expiry
+    load_gazetteer()
+    start_geocode_cache()
+    if settings.IMPORT_RECOVER_ON_STARTUP:
+        import_jobs.recover_interrupted_jobs(engine)
+    yield
+    stop_geocode_cache()
+    await close_geocoder_client()
+
 
-app = FastAPI(title="Store Locator API")
+app = FastAPI(title="Store Locator API", lifespan=lifespan)
 
 origins = [
     "https://storelocatorfrontend-production.up.railway.app",
@@ -48,6 +90,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(SQLStatsMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Outermost, so request timings include every other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
+search_log = logging.getLogger("app.search")
 
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
@@ -63,38 +113,87 @@ def health_check():
 # --- 2. PUBLIC SEARCH ---
 @app.post("/api/stores/search")
 @limiter.limit("100/minute")
-def search_stores(
+async def search_stores(
         payload: schemas.SearchRequest,
         request: Request,
         db: Session = Depends(get_db)
 ):
-    try:
-        # 1. Geocoding (Logic inside get_lat_lon handles in-memory caching now)
-        lat, lon = None, None
-        search_query = payload.zip_code or payload.address
-        if search_query:
-            lat, lon = get_lat_lon(search_query)
-
-        # 2. Search Logic
-        results = search_stores_logic(
-            db=db,
-            lat=lat,
-            lon=lon,
-            radius_miles=payload.filters.radius_miles,
-            store_type=payload.filters.store_type,
-            services=payload.filters.services,
-            page=payload.page,
-            limit=payload.limit,
-            open_now=payload.filters.open_now
-        )
+    # Geocoding may only spend part of the request's time budget
+    deadline = time.monotonic() + settings.SEARCH_DEADLINE_SECONDS
+    with search_request():
+        try:
+            search_query = payload.zip_code or payload.address
+            filters = payload.filters
+
+            # 1. Result Cache (a hit skips geocoding and the database)
+            with stage("cache"):
+                cache_key = search_cache_key(
+                    db, search_query, None, None, filters.radius_miles, filters.store_type,
+                    filters.services, filters.open_now, payload.page, payload.limit, cursor=payload.cursor
+                )
+                cached = get_cached_search(cache_key)
+            if cached is not None:
+                return encode_search(cached)
+
+            # 2. Geocoding (async, bounded by the deadline; caching happens inside)
+            lat, lon = None, None
+            if search_query:
+                budget = (deadline - time.monotonic()) * settings.GEOCODE_BUDGET_FRACTION
+                with stage("geocode"):
+                    try:
+                        lat, lon = await get_lat_lon_async(search_query, timeout=budget)
+                    except GeocoderUnavailable as e:
+                        raise geocoder_unavailable(e)
+                # No match: without coordinates the radius can't be applied, so no unfiltered listing
+                if lat is None:
+                    raise HTTPException(status_code=404, detail="Location not found")
+
+            # 3. Search Logic (blocking DB work stays off the event loop)
+            results = await run_in_threadpool(
+                search_stores_logic,
+                db=db,
+                lat=lat,
+                lon=lon,
+                radius_miles=filters.radius_miles,
+                store_type=filters.store_type,
+                services=filters.services,
+                page=payload.page,
+                limit=payload.limit,
+                open_now=filters.open_now,
+                cursor=payload.cursor
+            )
+
+            cache_search(cache_key, results)
+            return encode_search(results)
+
+        except HTTPException:
+            raise
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            return search_failed()
+
+
+def geocoder_unavailable(e: GeocoderUnavailable) -> HTTPException:
+    # The address may exist; the geocoder just could not say so in time
+    return HTTPException(
+        status_code=503, detail="Geocoding is temporarily unavailable",
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
 
-        return results
 
-    except Exception as e:
-        import traceback
-        print(f"CRITICAL SEARCH ERROR: {str(e)}")
-        print(traceback.format_exc())
-        return {"error": str(e), "results": [], "total": 0, "page": 1, "limit": 10}
+def search_failed() -> JSONResponse:
+    # Called from the except block: logs the traceback, counts the failure, and answers a
+    # generic 500 so http_requests_total sees it too (the message stays in the log)
+    search_log.exception("Search failed")
+    SEARCH_ERRORS.inc()
+    return JSONResponse(status_code=500, content={"detail": "Search failed"})
+
+
+def encode_search(results: dict) -> JSONResponse:
+    # What FastAPI would do with the returned dict, done here so it is timed as a search stage
+    with stage("encode"):
+        return JSONResponse(jsonable_encoder(results))
 
 
 # --- 3. AUTHENTICATION ---
@@ -352,81 +451,87 @@ def seed_admin_user(db: Session = Depends(get_db)):
 # --- 6. IMPORT ---
 @app.post("/api/admin/stores/import")
 def import_stores(
+        background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
+        background: bool = False,
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_user)
 ):
     if current_user.role.name not in ["admin", "marketer"]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    csv_reader = csv.DictReader(codecs.iterdecode(file.file, 'utf-8-sig'))
-    stats = {"created": 0, "updated": 0, "errors": 0}
+    # Large files: spool to disk and import in the background; poll the status URL
+    if background:
+        job = import_jobs.create_job(db, file.file, file.filename, current_user.id)
+        background_tasks.add_task(import_jobs.run_job, job.id, db.get_bind())
+        return JSONResponse(status_code=202, content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/admin/stores/import/{job.id}",
+        })
 
-    for row in csv_reader:
-        try:
-            store_id = row.get("store_id")
-            if not store_id: continue
-
-            existing = db.query(models.Store).filter(models.Store.store_id == store_id).first()
-
-            # --- ROBUST FIX: Convert String to List ---
-            raw_services = row.get("services", "")
-            service_list = []
-
-            if raw_services:
-                # 1. Replace pipes with commas
-                clean_str = raw_services.replace("|", ",")
-                # 2. Split into list and strip whitespace
-                service_list = [s.strip() for s in clean_str.split(',') if s.strip()]
-
-            # 3. Pass LIST to process_services (same as create_store)
-            service_objs = process_services(db, service_list)
-
-            # ------------------------------------------
-
-            def safe_float(v):
-                try:
-                    return float(v)
-                except:
-                    return 0.0
-
-            if existing:
-                existing.name = row["name"]
-                existing.store_type = row["store_type"]
-                existing.status = row["status"]
-                existing.phone = row["phone"]
-                existing.services = service_objs  # Updates relationship
-                existing.latitude = safe_float(row["latitude"])
-                existing.longitude = safe_float(row["longitude"])
-                stats["updated"] += 1
-            else:
-                new_store = models.Store(
-                    store_id=store_id,
-                    name=row["name"],
-                    store_type=row["store_type"],
-                    status=row["status"],
-                    latitude=safe_float(row["latitude"]),
-                    longitude=safe_float(row["longitude"]),
-                    address_street=row["address_street"],
-                    address_city=row["address_city"],
-                    address_state=row["address_state"],
-                    address_postal_code=row["address_postal_code"],
-                    address_country=row["address_country"],
-                    phone=row["phone"],
-                    services=service_objs,
-                    hours_mon=row.get("hours_mon"),
-                    hours_tue=row.get("hours_tue"),
-                    hours_wed=row.get("hours_wed"),
-                    hours_thu=row.get("hours_thu"),
-                    hours_fri=row.get("hours_fri"),
-                    hours_sat=row.get("hours_sat"),
-                    hours_sun=row.get("hours_sun")
-                )
-                db.add(new_store)
-                stats["created"] += 1
-        except Exception as e:
-            print(f"Row Error: {e}")
-            stats["errors"] += 1
+    # Set-based: a fixed number of statements per chunk of rows (see services/importer.py)
+    stats = importer.import_stores(db, codecs.iterdecode(file.file, 'utf-8-sig'))
+    return {"message": "Import completed", "stats": stats}
 
-    db.commit()
-    return {"message": "Import completed", "stats": stats}
\ No newline at end of file
+
+@app.get("/api/admin/stores/import/{job_id}")
+def get_import_job(
+        job_id: str,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    if current_user.role.name not in ["admin", "marketer"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job = db.get(models.ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_jobs.job_status(job)
+
+
+# --- 7. METRICS ---
+@app.get("/api/admin/metrics")
+def get_metrics(current_user: models.User = Depends(get_current_user)):
+    """Pool wait/usage, geocoder and search cache counters for this worker process."""
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"db_pool": pool_stats(), "geocoder": geocode_stats(), "search_cache": search_cache_stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Request, search stage, cache and pool metrics of this worker in Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), settings.METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- 8. PROFILING ---
+@app.get("/api/admin/profiles")
+def get_profiles(current_user: models.User = Depends(get_current_user)):
+    """Profiles recorded by this worker, newest first."""
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return list_profiles()
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_request_profile(profile_id: str, current_user: models.User = Depends(get_current_user)):
+    """Summary, SQL statements with timings and folded stacks of one profiled request."""
+    if current_user.role.name != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@app.get("/api/admin/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(profile_id: str, current_user: models.User = Depends(get_current_user)):
+    """Folded stacks only, for flamegraph.pl / inferno / speedscope."""
+    return get_request_profile(profile_id, current_user)["folded"]
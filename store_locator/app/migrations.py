@@ -0,0 +1,26 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from .database import Base
+
+
+def upgrade_schema(engine: Engine):
+    """
+    create_all() only creates missing tables. For tables that already exist, this adds
+    nullable columns and indexes that were added to the models later.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.primary_key or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Schema upgrade: added {table.name}.{column.name}")
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime, Index, Table
+from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime, Index, Table, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -7,7 +7,9 @@ from .database import Base
 store_services = Table(
     'store_services', Base.metadata,
     Column('store_id', String, ForeignKey('stores.store_id')),
-    Column('service_id', Integer, ForeignKey('services.id'))
+    Column('service_id', Integer, ForeignKey('services.id')),
+    # Import replaces a chunk's links with DELETE ... WHERE store_id IN (...)
+    Index('idx_store_services_store', 'store_id'),
 )
 
 role_permissions = Table(
@@ -42,9 +44,13 @@ class Store(Base):
     address_country = Column(String)
     phone = Column(String)
     timezone = Column(String, default="America/New_York")
+    # sha256 of the last imported CSV row; re-importing an identical row is a no-op.
+    # Cleared by any other write (see store_events) so the next import rewrites it.
+    content_hash = Column(String(64))
 
-    # FIX: lazy="joined" forces data to load immediately
-    services = relationship("Service", secondary="store_services", back_populates="stores")
+    # lazy="selectin": services for a whole result set load in one extra SELECT
+    # (instead of one SELECT per store when the list is read)
+    services = relationship("Service", secondary="store_services", back_populates="stores", lazy="selectin")
 
     hours_mon = Column(String)
     hours_tue = Column(String)
@@ -62,6 +68,66 @@ class Store(Base):
     )
 
 
+# --- Import Job Models ---
+class ImportJob(Base):
+    """A CSV import run in the background (POST /api/admin/stores/import?background=true)."""
+    __tablename__ = "import_jobs"
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued")  # queued, staging, merging, succeeded, failed
+    filename = Column(String)
+    spool_path = Column(String)
+    created_by = Column(Integer, ForeignKey("users.id"))
+
+    total_bytes = Column(Integer, default=0)
+    bytes_processed = Column(Integer, default=0)
+    rows_staged = Column(Integer, default=0)
+    created = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    error_details = Column(Text, default="[]")  # JSON list of {"row": n, "error": "..."}
+    geocoding = Column(Text, default="{}")  # JSON counts, as in the synchronous import report
+    message = Column(String)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class StoreImportRow(Base):
+    """Staging table: validated rows of an import job, merged into stores in one transaction at the end."""
+    __tablename__ = "store_import_rows"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, ForeignKey("import_jobs.id"), nullable=False)
+    row_number = Column(Integer, nullable=False)
+
+    store_id = Column(String, nullable=False)
+    name = Column(String)
+    store_type = Column(String)
+    status = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    address_street = Column(String)
+    address_city = Column(String)
+    address_state = Column(String)
+    address_postal_code = Column(String)
+    address_country = Column(String)
+    phone = Column(String)
+    services = Column(String)  # normalized names joined with "|"
+
+    hours_mon = Column(String)
+    hours_tue = Column(String)
+    hours_wed = Column(String)
+    hours_thu = Column(String)
+    hours_fri = Column(String)
+    hours_sat = Column(String)
+    hours_sun = Column(String)
+
+    __table_args__ = (
+        Index('idx_import_rows_job', 'job_id', 'row_number'),
+    )
+
+
 # --- Auth Models ---
 
 class User(Base):
@@ -15,6 +15,8 @@ class StoreSearchRequest(BaseModel):
     zip_code: Optional[str] = None
     page: int = 1
     limit: int = 10
+    # next_cursor from the previous response; when set, page is ignored
+    cursor: Optional[str] = None
     filters: SearchFilters
 
 # --- 2. Store Base & Validators ---
@@ -74,9 +76,10 @@ class Store(StoreBase):
 # --- 3. Response Schemas ---
 class SearchResponse(BaseModel):
     results: List[Store]
-    page: int
+    page: Optional[int]  # None for cursor requests
     limit: int
     total: int
+    next_cursor: Optional[str] = None
 
 
 # --- 4. User Schemas ---
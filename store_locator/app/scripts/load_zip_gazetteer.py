@@ -0,0 +1,106 @@
+"""
+Builds the offline ZIP -> centroid file used by app/services/gazetteer.py.
+
+Accepts a local path or an http(s) URL to a public ZIP centroid table, e.g. the
+US Census ZCTA Gazetteer file (tab-separated GEOID / INTPTLAT / INTPTLONG) or any
+CSV with zip / latitude / longitude style columns, and writes zip,latitude,longitude.
+
+Usage:
+    python -m app.scripts.load_zip_gazetteer SOURCE [--output data/zip_centroids.csv]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import urllib.request
+import zipfile
+
+from app.config import settings
+
+ZIP_COLUMNS = ["zip", "zipcode", "zip_code", "zcta", "zcta5", "geoid", "postal_code"]
+LAT_COLUMNS = ["latitude", "lat", "intptlat"]
+LON_COLUMNS = ["longitude", "lon", "lng", "long", "intptlong"]
+
+
+def read_source(source: str) -> str:
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            data = response.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    # The Census publishes the gazetteer as a zip with one .txt inside
+    if data[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            data = archive.read(archive.namelist()[0])
+    return data.decode("utf-8-sig")
+
+
+def _find_column(fieldnames, candidates):
+    normalized = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def parse_centroids(text: str):
+    """Yields (zip, lat, lon) from a delimited table, detecting delimiter and column names."""
+    sample = text[:4096]
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",\t;|").delimiter
+    except csv.Error:
+        delimiter = ","
+
+    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    zip_col = _find_column(reader.fieldnames or [], ZIP_COLUMNS)
+    lat_col = _find_column(reader.fieldnames or [], LAT_COLUMNS)
+    lon_col = _find_column(reader.fieldnames or [], LON_COLUMNS)
+    if not (zip_col and lat_col and lon_col):
+        raise ValueError(f"Could not find zip/latitude/longitude columns in {reader.fieldnames}")
+
+    for row in reader:
+        try:
+            zip_code = row[zip_col].strip()[:5].zfill(5)
+            lat, lon = float(row[lat_col]), float(row[lon_col])
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if zip_code.isdigit() and -90 <= lat <= 90 and -180 <= lon <= 180:
+            yield zip_code, lat, lon
+
+
+def write_centroids(rows, output: str) -> int:
+    seen = {}
+    for zip_code, lat, lon in rows:
+        seen.setdefault(zip_code, (lat, lon))
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["zip", "latitude", "longitude"])
+        for zip_code in sorted(seen):
+            lat, lon = seen[zip_code]
+            writer.writerow([zip_code, f"{lat:.6f}", f"{lon:.6f}"])
+    return len(seen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline ZIP centroid gazetteer.")
+    parser.add_argument("source", help="Path or URL of a ZIP centroid CSV/TSV (or zipped Census gazetteer)")
+    parser.add_argument("--output", default=settings.ZIP_GAZETTEER_PATH or "data/zip_centroids.csv")
+    args = parser.parse_args(argv)
+
+    try:
+        count = write_centroids(parse_centroids(read_source(args.source)), args.output)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    print(f"✅ Wrote {count} ZIP centroids to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
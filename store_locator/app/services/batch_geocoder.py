@@ -0,0 +1,174 @@
+import csv
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import httpx
+from app.config import settings
+from app.services.gazetteer import lookup_zip
+from app.services.geocoder import NOT_FOUND, UNAVAILABLE, cache_get, cache_key, cache_set, get_lat_lon
+
+# (street, city, state, postal_code)
+Address = Tuple[str, str, str, str]
+
+GEOCODED, CACHED, ZIP_CENTROID, FAILED = "geocoded", "cached", "zip_centroid", "failed"
+
+
+# --- 1. HELPERS ---
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def address_query(address: Address) -> str:
+    street, city, state, postal_code = address
+    return ", ".join(part for part in (street, city, f"{state} {postal_code}".strip()) if part)
+
+
+def row_address(row: dict) -> Address:
+    return tuple((row.get(col) or "").strip() for col in (
+        "address_street", "address_city", "address_state", "address_postal_code"
+    ))
+
+
+def row_coordinates(row: dict) -> Optional[Tuple[float, float]]:
+    """The row's own lat/lon, or None if missing, unparseable or the 0,0 placeholder."""
+    try:
+        lat, lon = float(row.get("latitude")), float(row.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if (lat, lon) == (0.0, 0.0) or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+# --- 2. BATCH STAGE ---
+def geocode_addresses(addresses: Iterable[Address]) -> Dict[Address, Tuple[Tuple[Optional[float], Optional[float]], str]]:
+    """
+    Resolves each distinct address once: cache/gazetteer first, then one batch upstream
+    stage for the rest, then the ZIP centroid for addresses the upstream could not place.
+    Returns {address: ((lat, lon), source)}.
+    """
+    resolved = {}
+    pending: List[Address] = []
+    for address in dict.fromkeys(addresses):
+        street, _, _, postal_code = address
+        query = address_query(address)
+        centroid = lookup_zip(postal_code) if not street else None
+        cached = cache_get(cache_key(query)) if query and not centroid else None
+        if centroid:
+            resolved[address] = (centroid, CACHED)
+        elif cached in (NOT_FOUND, UNAVAILABLE):
+            resolved[address] = _zip_fallback(postal_code)
+        elif cached:
+            resolved[address] = (cached, CACHED)
+        elif query:
+            pending.append(address)
+        else:
+            resolved[address] = (NOT_FOUND, FAILED)
+
+    upstream = _census_batch(pending) if settings.GEOCODE_BATCH_URL else _pooled_lookups(pending)
+    for address in pending:
+        coords = upstream.get(address, NOT_FOUND)
+        if coords != NOT_FOUND:
+            resolved[address] = (coords, GEOCODED)
+        else:
+            resolved[address] = _zip_fallback(address[3])
+    return resolved
+
+
+def _zip_fallback(postal_code: str):
+    centroid = lookup_zip(postal_code)
+    return (centroid, ZIP_CENTROID) if centroid else (NOT_FOUND, FAILED)
+
+
+def _pooled_lookups(addresses: List[Address]) -> Dict[Address, Tuple[Optional[float], Optional[float]]]:
+    """Single-address geocoder behind a small worker pool, throttled to the upstream's rate limit."""
+    if not addresses:
+        return {}
+    limiter = RateLimiter(settings.GEOCODE_BATCH_RATE_PER_SECOND)
+
+    def lookup(address):
+        limiter.wait()
+        return get_lat_lon(address_query(address))
+
+    with ThreadPoolExecutor(max_workers=settings.GEOCODE_BATCH_WORKERS) as pool:
+        return dict(zip(addresses, pool.map(lookup, addresses)))
+
+
+def _census_batch(addresses: List[Address]) -> Dict[Address, Tuple[Optional[float], Optional[float]]]:
+    """
+    US Census batch geocoder format: POST a headerless CSV of
+    id,street,city,state,zip as `addressFile`; each response line is
+    id,input,Match|No_Match|Tie,match type,matched address,"lon,lat",...
+    """
+    results = {}
+    size = settings.GEOCODE_BATCH_SIZE
+    for start in range(0, len(addresses), size):
+        chunk = addresses[start:start + size]
+        body = io.StringIO()
+        csv.writer(body).writerows([i, *address] for i, address in enumerate(chunk))
+        try:
+            response = httpx.post(
+                settings.GEOCODE_BATCH_URL,
+                data={"benchmark": settings.GEOCODE_BATCH_BENCHMARK},
+                files={"addressFile": ("addresses.csv", body.getvalue().encode(), "text/csv")},
+                timeout=settings.GEOCODE_BATCH_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Batch geocode failed for {len(chunk)} addresses: {e}")
+            for address in chunk:
+                cache_set(cache_key(address_query(address)), UNAVAILABLE, settings.GEOCODE_ERROR_TTL_SECONDS)
+            continue
+
+        matches = {}
+        for line in csv.reader(io.StringIO(response.text)):
+            try:
+                if line[2] == "Match":
+                    lon, lat = (float(v) for v in line[5].split(","))
+                    matches[int(line[0])] = (lat, lon)
+            except (IndexError, ValueError):
+                continue
+
+        for i, address in enumerate(chunk):
+            key = cache_key(address_query(address))
+            if i in matches:
+                results[address] = matches[i]
+                cache_set(key, matches[i], settings.GEOCODE_CACHE_TTL_SECONDS)
+            else:
+                cache_set(key, NOT_FOUND, settings.GEOCODE_NEGATIVE_TTL_SECONDS)
+    return results
+
+
+# --- 3. IMPORT INTEGRATION ---
+def fill_missing_coordinates(rows: List[dict]) -> dict:
+    """
+    Geocodes every import row without usable coordinates, in place.
+    Returns per-row counts: geocoded, cached, zip_centroid, failed.
+    """
+    stats = {GEOCODED: 0, CACHED: 0, ZIP_CENTROID: 0, FAILED: 0}
+    missing = [row for row in rows if row.get("store_id") and row_coordinates(row) is None]
+    if not missing:
+        return stats
+
+    resolved = geocode_addresses(row_address(row) for row in missing)
+    for row in missing:
+        (lat, lon), source = resolved[row_address(row)]
+        stats[source] += 1
+        if lat is not None:
+            row["latitude"], row["longitude"] = lat, lon
+    return stats
@@ -0,0 +1,88 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+
+    closed    -> calls go through; failure_threshold consecutive failures open the circuit
+    open      -> calls are rejected until cooldown_seconds have passed
+    half_open -> one trial call is let through; success closes the circuit, failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """True if the caller may hit the upstream now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through (0 when not open)."""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache bounded by entry count, with a per-entry TTL.
+    The least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.dirty = False  # changed since the last snapshot
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if time.time() > expires:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        expires = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._set(key, value, expires)
+
+    def _set(self, key, value, expires):
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        self.dirty = True
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Drops every expired entry, not just the ones that get read again."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expires) in self._data.items() if expires < now]
+            for k in expired:
+                del self._data[k]
+            self.expirations += len(expired)
+            if expired:
+                self.dirty = True
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.dirty = True
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    # --- Persistence (string keys, JSON values) ---
+    def save(self, path: str):
+        """Snapshots unexpired entries to a SQLite file, written atomically."""
+        now = time.time()
+        with self._lock:
+            rows = [(k, json.dumps(v), exp) for k, (v, exp) in self._data.items() if exp >= now]
+            self.dirty = False
+
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            # Oldest first, so reloading keeps the LRU order
+            conn.executemany("INSERT INTO cache VALUES (?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+
+    def load(self, path: str, decode: Callable[[Any], Any] = lambda v: v) -> int:
+        """Reloads a snapshot written by save(). Expired entries are skipped."""
+        if not os.path.exists(path):
+            return 0
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute(
+                "SELECT key, value, expires FROM cache WHERE expires >= ? ORDER BY rowid", (time.time(),)
+            ).fetchall()
+        except sqlite3.DatabaseError:
+            return 0
+        finally:
+            conn.close()
+
+        with self._lock:
+            for key, value, expires in rows:
+                self._set(key, decode(json.loads(value)), expires)
+            self.dirty = False
+        return len(rows)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution: the first caller
+    runs the function, callers arriving while it is in flight wait and share its result.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The shared call runs as its own task, so a caller
+    whose timeout expires stops waiting without cancelling it for everyone else.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+        else:
+            self.coalesced += 1
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+
+class CacheMaintainer:
+    """
+    Background thread that purges expired entries every sweep_seconds and,
+    when a path is set, snapshots the cache every snapshot_seconds if it changed.
+    """
+
+    def __init__(self, cache: LRUCache, sweep_seconds: float, path: str = "", snapshot_seconds: float = 300):
+        self.cache = cache
+        self.sweep_seconds = sweep_seconds
+        self.path = path
+        self.snapshot_seconds = snapshot_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-maintainer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.snapshot()
+
+    def snapshot(self):
+        if self.path and self.cache.dirty:
+            try:
+                self.cache.save(self.path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Cache snapshot failed: {e}")
+
+    def _run(self):
+        last_snapshot = time.time()
+        while not self._stop.wait(self.sweep_seconds):
+            self.cache.purge_expired()
+            if time.time() - last_snapshot >= self.snapshot_seconds:
+                self.snapshot()
+                last_snapshot = time.time()
@@ -0,0 +1,79 @@
+import csv
+import os
+import re
+import threading
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from app.config import settings
+
+ZIP_PATTERN = re.compile(r"^\s*(\d{5})(?:-\d{4})?\s*$")
+
+
+class ZipGazetteer:
+    """
+    US ZIP -> centroid table held as three sorted NumPy arrays (~20 bytes per ZIP).
+    Lookups are a binary search, so postal-code searches never wait on Nominatim.
+    """
+
+    def __init__(self, zips: Iterable[int], lats: Iterable[float], lons: Iterable[float]):
+        zips = np.asarray(list(zips), dtype=np.int32)
+        order = np.argsort(zips, kind="stable")
+        self.zips = zips[order]
+        self.lats = np.asarray(list(lats), dtype=np.float64)[order]
+        self.lons = np.asarray(list(lons), dtype=np.float64)[order]
+
+    @classmethod
+    def from_csv(cls, path: str) -> "ZipGazetteer":
+        """Reads the normalized zip,latitude,longitude file written by app.scripts.load_zip_gazetteer."""
+        zips, lats, lons = [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    zips.append(int(row["zip"]))
+                    lats.append(float(row["latitude"]))
+                    lons.append(float(row["longitude"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return cls(zips, lats, lons)
+
+    def __len__(self):
+        return len(self.zips)
+
+    def lookup(self, query: str) -> Optional[Tuple[float, float]]:
+        match = ZIP_PATTERN.match(query or "")
+        if not match or len(self.zips) == 0:
+            return None
+
+        zip_code = int(match.group(1))
+        i = int(np.searchsorted(self.zips, zip_code))
+        if i < len(self.zips) and self.zips[i] == zip_code:
+            return float(self.lats[i]), float(self.lons[i])
+        return None
+
+
+# --- SHARED INSTANCE ---
+_gazetteer: Optional[ZipGazetteer] = None
+_loaded_path: Optional[str] = None
+_lock = threading.Lock()
+
+
+def load_gazetteer(path: Optional[str] = None) -> Optional[ZipGazetteer]:
+    """Loads (or reloads) the gazetteer. A missing file leaves ZIP lookups to the geocoder."""
+    global _gazetteer, _loaded_path
+    path = path if path is not None else settings.ZIP_GAZETTEER_PATH
+    with _lock:
+        _loaded_path = path
+        if not path or not os.path.exists(path):
+            _gazetteer = None
+            return None
+        _gazetteer = ZipGazetteer.from_csv(path)
+        print(f"ZIP gazetteer: loaded {len(_gazetteer)} centroids from {path}")
+        return _gazetteer
+
+
+def lookup_zip(query: str) -> Optional[Tuple[float, float]]:
+    if not ZIP_PATTERN.match(query or ""):
+        return None
+    if _loaded_path != settings.ZIP_GAZETTEER_PATH:
+        load_gazetteer()
+    return _gazetteer.lookup(query) if _gazetteer is not None else None
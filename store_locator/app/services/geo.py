@@ -0,0 +1,58 @@
+import math
+from typing import Tuple
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    R = EARTH_RADIUS_MILES
+    dlat, dlon = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+
+
+def distances_from(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Vectorized calculate_distance from one point to many, in miles."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype=np.float64)), np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(lat: float, lon: float, radius_miles: float) -> Tuple[float, float, float, float]:
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) enclosing every point within radius_miles.
+    Longitude is widened by latitude. When the box crosses the antimeridian, min_lon > max_lon
+    (e.g. 170 -> -170). When it reaches a pole, every longitude is included.
+    """
+    angular = radius_miles / EARTH_RADIUS_MILES
+    lat_r = math.radians(lat)
+
+    min_lat = lat_r - angular
+    max_lat = lat_r + angular
+
+    if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2:
+        # The circle covers a pole, so all longitudes are in range
+        return (
+            math.degrees(max(min_lat, -math.pi / 2)),
+            math.degrees(min(max_lat, math.pi / 2)),
+            -180.0,
+            180.0,
+        )
+
+    ratio = math.sin(angular) / math.cos(lat_r)
+    if ratio >= 1:
+        return math.degrees(min_lat), math.degrees(max_lat), -180.0, 180.0
+
+    dlon = math.asin(ratio)
+    min_lon = math.degrees(math.radians(lon) - dlon)
+    max_lon = math.degrees(math.radians(lon) + dlon)
+
+    # Wrap into [-180, 180]; a wrapped edge means the box crosses the antimeridian
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+
+    return math.degrees(min_lat), math.degrees(max_lat), min_lon, max_lon
@@ -1,56 +1,202 @@
-import json
-import ssl
-import certifi
+import asyncio
+from typing import Optional, Tuple
+import httpx
 from geopy.geocoders import Nominatim
-from redis import Redis, RedisError
+from app.config import settings
+from app.services.breaker import CircuitBreaker
+from app.services.cache import AsyncSingleFlight, CacheMaintainer, LRUCache, SingleFlight
+from app.services.gazetteer import lookup_zip
+from app.services.metrics import register_cache
 
-# 1. Setup SSL Context (The Fix for Mac)
-ctx = ssl.create_default_context(cafile=certifi.where())
+USER_AGENT = "retail_locator_final_v3"
 
-# 2. Connect to Redis
-redis_client = Redis(host='localhost', port=6379, db=0, decode_responses=True)
-
-# 3. Setup Geocoder with SSL Context
-geolocator = Nominatim(
-    user_agent="store_locator_project_v1",
-    ssl_context=ctx  # <--- This solves the SSL Error
+# --- 1. GEOCODE CACHE ---
+# Bounded LRU with TTL; a background thread purges expired entries and, when
+# GEOCODE_CACHE_PATH is set, snapshots the cache to disk so a restarted worker
+# does not have to re-query Nominatim for its whole hot set.
+_geocode_cache = LRUCache(settings.GEOCODE_CACHE_MAX_ENTRIES, settings.GEOCODE_CACHE_TTL_SECONDS)
+register_cache("geocode", _geocode_cache.stats)
+_maintainer = CacheMaintainer(
+    _geocode_cache,
+    sweep_seconds=settings.GEOCODE_CACHE_SWEEP_SECONDS,
+    snapshot_seconds=settings.GEOCODE_CACHE_SNAPSHOT_SECONDS,
 )
 
 
-def get_coordinates(query: str):
-    if not query:
-        return None, None
+def cache_get(key: str):
+    return _geocode_cache.get(key)
 
-    cache_key = f"geo:{query.lower().strip()}"
 
-    # --- 1. SAFE Cache Check ---
-    try:
-        cached_val = redis_client.get(cache_key)
-        if cached_val:
-            print(f"   ⚡ Cache Hit for '{query}'")
-            lat, lon = json.loads(cached_val)
-            return lat, lon
-    except (RedisError, ConnectionError):
-        print(f"   ⚠ Redis is down. Skipping cache.")
-
-    # --- 2. Call API ---
+def cache_set(key: str, value, ttl_seconds: int):
+    _geocode_cache.set(key, value, ttl_seconds)
+
+
+def geocode_cache_stats() -> dict:
+    return _geocode_cache.stats()
+
+
+def geocode_stats() -> dict:
+    return {"cache": _geocode_cache.stats(), "coalesced": _inflight.coalesced + _async_inflight.coalesced, "breaker": _breaker.stats()}
+
+
+def start_geocode_cache():
+    """Reloads the last snapshot (if any) and starts background expiry/snapshots."""
+    _maintainer.path = settings.GEOCODE_CACHE_PATH
+    if settings.GEOCODE_CACHE_PATH:
+        loaded = _geocode_cache.load(settings.GEOCODE_CACHE_PATH, decode=tuple)
+        print(f"Geocode cache: loaded {loaded} entries from {settings.GEOCODE_CACHE_PATH}")
+    _maintainer.start()
+
+
+def stop_geocode_cache():
+    """Stops the background thread and writes a final snapshot."""
+    _maintainer.stop()
+
+
+# --- 2. GEOCODER (sync, used by admin writes and imports) ---
+# Concurrent misses for the same key share one upstream call
+_inflight = SingleFlight()
+_breaker = CircuitBreaker(settings.GEOCODER_BREAKER_THRESHOLD, settings.GEOCODER_BREAKER_COOLDOWN_SECONDS)
+
+# Cached for misses; truthy, so a cache hit short-circuits like a real result
+NOT_FOUND = (None, None)
+# Cached (for GEOCODE_ERROR_TTL_SECONDS) when the upstream failed: the address may well exist.
+# One element, so code that unpacks it as (lat, lon) fails loudly instead of reading junk.
+UNAVAILABLE = ("unavailable",)
+
+
+class GeocoderUnavailable(Exception):
+    """The async geocoder could not answer: upstream error, open breaker or out of time budget."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+def cache_key(query: str) -> str:
+    return f"geo:{query.lower().strip()}"
+
+
+def get_lat_lon(query: str) -> Tuple[Optional[float], Optional[float]]:
+    # Plain ZIP codes resolve from the offline gazetteer; Nominatim is for free-form addresses
+    centroid = lookup_zip(query)
+    if centroid:
+        return centroid
+
+    key = cache_key(query)
+    cached_geo = cache_get(key)
+    if cached_geo:
+        return NOT_FOUND if cached_geo == UNAVAILABLE else cached_geo
+
+    return _inflight.do(key, lambda: _geocode_upstream(query, key))
+
+
+def _geocode_upstream(query: str, key: str) -> Tuple[Optional[float], Optional[float]]:
+    # While the upstream is failing, answer immediately instead of waiting out the timeout
+    if not _breaker.allow():
+        return NOT_FOUND
+
+    geolocator = Nominatim(user_agent=USER_AGENT)
     try:
-        print(f"    Calling Nominatim API for '{query}'...")
-        # The geolocator now uses the 'ctx' we created above
-        location = geolocator.geocode(query)
+        location = geolocator.geocode(f"{query}, USA", timeout=10)
+    except Exception:
+        _breaker.record_failure()
+        cache_set(key, UNAVAILABLE, settings.GEOCODE_ERROR_TTL_SECONDS)
+        return NOT_FOUND
+
+    _breaker.record_success()
+    if not location:
+        cache_set(key, NOT_FOUND, settings.GEOCODE_NEGATIVE_TTL_SECONDS)
+        return NOT_FOUND
+
+    result = (location.latitude, location.longitude)
+    cache_set(key, result, settings.GEOCODE_CACHE_TTL_SECONDS)
+    return result
+
+
+# --- 3. ASYNC GEOCODER (used by search) ---
+# One pooled HTTP client per event loop, and at most GEOCODER_MAX_CONCURRENCY upstream
+# requests in flight: a slow upstream makes callers run out of budget, not out of workers.
+_async_inflight = AsyncSingleFlight()
+_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+_semaphore: Optional[asyncio.Semaphore] = None
 
-        if location:
-            lat, lon = location.latitude, location.longitude
 
-            # --- 3. SAFE Cache Save ---
-            try:
-                redis_client.setex(cache_key, 2592000, json.dumps((lat, lon)))
-            except RedisError:
-                pass
+def _get_client() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=settings.GEOCODER_TIMEOUT_SECONDS,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=settings.GEOCODER_MAX_CONCURRENCY),
+        )
+        _client_loop = loop
+        _semaphore = asyncio.Semaphore(settings.GEOCODER_MAX_CONCURRENCY)
+    return _client, _semaphore
 
-            return lat, lon
 
-    except Exception as e:
-        print(f"    Geocoding error: {e}")
+async def close_geocoder_client():
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client, _client_loop = None, None
+
+
+async def get_lat_lon_async(query: str, timeout: Optional[float] = None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Same lookup order as get_lat_lon, but never waits longer than timeout seconds.
+    A lookup still running when the caller gives up finishes in the background and fills the cache.
+    Returns NOT_FOUND only when the upstream answered with no match; raises GeocoderUnavailable
+    when it could not answer (error, open breaker, timeout), so callers can tell the two apart.
+    """
+    centroid = lookup_zip(query)
+    if centroid:
+        return centroid
+
+    key = cache_key(query)
+    cached_geo = cache_get(key)
+    if cached_geo == UNAVAILABLE:
+        raise GeocoderUnavailable("geocoder failed recently", settings.GEOCODE_ERROR_TTL_SECONDS)
+    if cached_geo:
+        return cached_geo
+
+    timeout = settings.GEOCODER_TIMEOUT_SECONDS if timeout is None else min(timeout, settings.GEOCODER_TIMEOUT_SECONDS)
+    if timeout <= 0:
+        raise GeocoderUnavailable("no time left to geocode", 1)
+    try:
+        result = await _async_inflight.do(key, lambda: _geocode_upstream_async(query, key), timeout)
+    except asyncio.TimeoutError:
+        raise GeocoderUnavailable("geocoder timed out", 1)
+    if result == UNAVAILABLE:
+        raise GeocoderUnavailable("geocoder unavailable", max(1.0, _breaker.retry_after()))
+    return result
+
+
+async def _geocode_upstream_async(query: str, key: str) -> Tuple[Optional[float], Optional[float]]:
+    # Returns UNAVAILABLE rather than raising: this runs as a shared task that may outlive its callers
+    client, semaphore = _get_client()
+    async with semaphore:
+        if not _breaker.allow():
+            return UNAVAILABLE
+        try:
+            response = await client.get(
+                settings.GEOCODER_URL, params={"q": f"{query}, USA", "format": "json", "limit": 1}
+            )
+            response.raise_for_status()
+            matches = response.json()
+        except (httpx.HTTPError, ValueError):
+            _breaker.record_failure()
+            cache_set(key, UNAVAILABLE, settings.GEOCODE_ERROR_TTL_SECONDS)
+            return UNAVAILABLE
+
+    _breaker.record_success()
+    try:
+        result = (float(matches[0]["lat"]), float(matches[0]["lon"]))
+    except (IndexError, KeyError, TypeError, ValueError):
+        cache_set(key, NOT_FOUND, settings.GEOCODE_NEGATIVE_TTL_SECONDS)
+        return NOT_FOUND
 
-    return None, None
\ No newline at end of file
+    cache_set(key, result, settings.GEOCODE_CACHE_TTL_SECONDS)
+    return result
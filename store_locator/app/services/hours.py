@@ -0,0 +1,129 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+import pytz
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAY_COLUMNS = ['hours_mon', 'hours_tue', 'hours_wed', 'hours_thu', 'hours_fri', 'hours_sat', 'hours_sun']
+
+# --- 1. TIMEZONE MAP ---
+STATE_TIMEZONES = {
+    'MA': 'America/New_York', 'RI': 'America/New_York', 'CT': 'America/New_York',
+    'NY': 'America/New_York', 'NJ': 'America/New_York', 'PA': 'America/New_York',
+    'DE': 'America/New_York', 'MD': 'America/New_York', 'VA': 'America/New_York',
+    'NC': 'America/New_York', 'SC': 'America/New_York', 'GA': 'America/New_York',
+    'FL': 'America/New_York', 'ME': 'America/New_York', 'NH': 'America/New_York',
+    'VT': 'America/New_York', 'OH': 'America/New_York', 'MI': 'America/New_York',
+    'IN': 'America/New_York', 'KY': 'America/New_York', 'WV': 'America/New_York',
+
+    'IL': 'America/Chicago', 'WI': 'America/Chicago', 'MN': 'America/Chicago',
+    'IA': 'America/Chicago', 'MO': 'America/Chicago', 'ND': 'America/Chicago',
+    'SD': 'America/Chicago', 'NE': 'America/Chicago', 'KS': 'America/Chicago',
+    'OK': 'America/Chicago', 'TX': 'America/Chicago', 'AL': 'America/Chicago',
+    'MS': 'America/Chicago', 'TN': 'America/Chicago', 'AR': 'America/Chicago',
+    'LA': 'America/Chicago',
+
+    'MT': 'America/Denver', 'ID': 'America/Denver', 'WY': 'America/Denver',
+    'UT': 'America/Denver', 'CO': 'America/Denver', 'NM': 'America/Denver',
+    'AZ': 'America/Phoenix',
+
+    'CA': 'America/Los_Angeles', 'NV': 'America/Los_Angeles', 'OR': 'America/Los_Angeles',
+    'WA': 'America/Los_Angeles',
+
+    'AK': 'America/Anchorage', 'HI': 'Pacific/Honolulu'
+}
+
+
+# --- 2. HOURS PARSING ---
+def parse_hours(hours: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    "08:00-22:00" -> (480, 1320) in minutes since midnight. "24:00" is end of day.
+    Overnight spans ("22:00-02:00") end past 1440. Returns None for "closed" or bad input.
+    """
+    if not isinstance(hours, str) or hours.strip().lower() in ("", "closed"):
+        return None
+    try:
+        start_str, end_str = hours.split("-")
+        start_h, start_m = (int(x) for x in start_str.strip().split(":"))
+        end_h, end_m = (int(x) for x in end_str.strip().split(":"))
+    except ValueError:
+        return None
+
+    start, end = start_h * 60 + start_m, end_h * 60 + end_m
+    if not (0 <= start < MINUTES_PER_DAY and 0 <= end <= MINUTES_PER_DAY):
+        return None
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+@lru_cache(maxsize=4096)
+def compile_week(day_hours: Tuple[Optional[str], ...]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Turns the 7 daily strings (Mon..Sun) into sorted minute-of-week intervals [start, end].
+    Cached by value: stores sharing a schedule share the compiled intervals.
+    """
+    intervals = []
+    for day, hours in enumerate(day_hours):
+        span = parse_hours(hours)
+        if span is None:
+            continue
+        start, end = day * MINUTES_PER_DAY + span[0], day * MINUTES_PER_DAY + span[1]
+        if end >= MINUTES_PER_WEEK:
+            # Sunday overnight wraps into Monday morning
+            intervals.append((start, MINUTES_PER_WEEK - 1))
+            intervals.append((0, end - MINUTES_PER_WEEK))
+        else:
+            intervals.append((start, end))
+    return tuple(sorted(intervals))
+
+
+def store_schedule(store) -> Tuple[Tuple[int, int], ...]:
+    return compile_week(tuple(getattr(store, col, None) for col in DAY_COLUMNS))
+
+
+def is_open(intervals: Sequence[Tuple[int, int]], minute_of_week: int) -> bool:
+    for start, end in intervals:
+        if start > minute_of_week:
+            return False
+        if minute_of_week <= end:
+            return True
+    return False
+
+
+# --- 3. CLOCK ---
+@lru_cache(maxsize=1024)
+def _utc_offset_minutes(tz_name: str, hour_bucket: int) -> int:
+    try:
+        tz = pytz.timezone(tz_name)
+    except (pytz.UnknownTimeZoneError, AttributeError):
+        tz = pytz.UTC
+    return int(datetime.fromtimestamp(hour_bucket, tz).utcoffset().total_seconds() // 60)
+
+
+def utc_offset_minutes(tz_name: str, now: datetime) -> int:
+    """UTC offset of a timezone, cached per zone for the current hour (DST-aware)."""
+    timestamp = int(now.timestamp())
+    return _utc_offset_minutes(tz_name, timestamp - timestamp % 3600)
+
+
+class WeekClock:
+    """
+    "Now" as a minute-of-week (Monday 00:00 = 0), computed once per request
+    and memoized per timezone.
+    """
+
+    def __init__(self, now: Optional[datetime] = None):
+        self.now = now or datetime.now(pytz.UTC)
+        utc = self.now.astimezone(pytz.UTC)
+        self._utc_minute = utc.weekday() * MINUTES_PER_DAY + utc.hour * 60 + utc.minute
+        self._minutes = {}
+
+    def minute_of_week(self, tz_name: str) -> int:
+        minute = self._minutes.get(tz_name)
+        if minute is None:
+            minute = (self._utc_minute + utc_offset_minutes(tz_name, self.now)) % MINUTES_PER_WEEK
+            self._minutes[tz_name] = minute
+        return minute
@@ -0,0 +1,206 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Iterator, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from app import models
+from app.config import settings
+from app.services import importer, store_events
+from app.services.batch_geocoder import fill_missing_coordinates
+
+STAGING = models.StoreImportRow.__table__
+ACTIVE_STATUSES = ("queued", "staging", "merging")
+STAGED_COLUMNS = [*importer.INSERT_COLUMNS, *importer.HOURS_COLUMNS, "services"]
+
+
+# --- 1. JOB CREATION ---
+def spool_dir() -> str:
+    path = settings.IMPORT_SPOOL_DIR or os.path.join(tempfile.gettempdir(), "store_imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def create_job(db: Session, upload: BinaryIO, filename: str, user_id: Optional[int]) -> models.ImportJob:
+    """Copies the upload to disk and records a queued job; the request can return right away."""
+    job_id = uuid.uuid4().hex
+    path = os.path.join(spool_dir(), f"{job_id}.csv")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(upload, out, length=1024 * 1024)
+
+    job = models.ImportJob(
+        id=job_id,
+        status="queued",
+        filename=filename,
+        spool_path=path,
+        created_by=user_id,
+        total_bytes=os.path.getsize(path),
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+# --- 2. WORKER ---
+class _ByteCounter:
+    """Decodes the spooled file line by line while counting bytes read, for progress."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.bytes = 0
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self.f:
+            self.bytes += len(raw)
+            yield raw.decode("utf-8-sig")
+
+
+def run_job(job_id: str, bind, chunk_size: Optional[int] = None):
+    """
+    Background worker. Phase 1 validates, geocodes and stages the file chunk by chunk,
+    committing each chunk, so memory stays bounded by the chunk size. Phase 2 merges the
+    staged rows into stores in a single transaction: either every row lands or none does.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    db = sessionmaker(autocommit=False, autoflush=False, bind=bind)()
+    job = db.get(models.ImportJob, job_id)
+    if job is None:
+        db.close()
+        return
+
+    spool_path = job.spool_path
+    try:
+        job.status, job.started_at = "staging", datetime.utcnow()
+        db.commit()
+        _stage(db, job, chunk_size)
+
+        job.status = "merging"
+        db.commit()
+        if _merge(db, job, chunk_size):
+            store_events.bump_version()
+    except Exception as e:
+        db.rollback()
+        print(f"Import job {job_id} failed: {e}")
+        job.status, job.message = "failed", str(e)
+        job.finished_at = datetime.utcnow()
+        db.execute(delete(STAGING).where(STAGING.c.job_id == job_id))
+        db.commit()
+    finally:
+        db.close()
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+def _stage(db: Session, job: models.ImportJob, chunk_size: int):
+    error_details, geocoding = [], {}
+    row_number = 0
+
+    with open(job.spool_path, "rb") as f:
+        lines = _ByteCounter(f)
+        for rows in importer.chunked(csv.DictReader(lines), chunk_size):
+            for source, count in fill_missing_coordinates(rows).items():
+                geocoding[source] = geocoding.get(source, 0) + count
+
+            staged = []
+            for row in rows:
+                row_number += 1
+                if not row.get("store_id"):
+                    continue
+                try:
+                    values = importer.store_values(row)
+                except (KeyError, ValueError) as e:
+                    job.errors += 1
+                    if len(error_details) < settings.IMPORT_MAX_ERROR_DETAILS:
+                        error_details.append({"row": row_number, "error": importer.row_error(e)})
+                    continue
+                values["services"] = "|".join(importer.parse_services(row.get("services", "")))
+                staged.append({"job_id": job.id, "row_number": row_number, **values})
+
+            if staged:
+                db.execute(insert(STAGING), staged)
+            job.rows_staged += len(staged)
+            job.bytes_processed = lines.bytes
+            job.error_details = json.dumps(error_details)
+            job.geocoding = json.dumps(geocoding)
+            db.commit()  # one transaction per chunk
+
+
+def _merge(db: Session, job: models.ImportJob, chunk_size: int) -> bool:
+    """Returns True if any store was written."""
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "errors": 0}
+    columns = [STAGING.c[col] for col in STAGED_COLUMNS]
+    last = 0
+    while True:
+        chunk = db.execute(
+            select(STAGING.c.row_number, *columns)
+            .where(STAGING.c.job_id == job.id, STAGING.c.row_number > last)
+            .order_by(STAGING.c.row_number)
+            .limit(chunk_size)
+        ).all()
+        if not chunk:
+            break
+        last = chunk[-1].row_number
+        importer.write_chunk(db, [dict(r._mapping) for r in chunk], stats)
+
+    db.execute(delete(STAGING).where(STAGING.c.job_id == job.id))
+    job.created, job.updated, job.unchanged = stats["created"], stats["updated"], stats["unchanged"]
+    job.errors += stats["errors"]
+    job.status, job.finished_at = "succeeded", datetime.utcnow()
+    db.commit()  # the data and the "succeeded" status land together
+    return bool(stats["created"] or stats["updated"])
+
+
+# --- 3. RECOVERY ---
+def recover_interrupted_jobs(bind) -> int:
+    """
+    Jobs run as background tasks of the app process, so a restart or crash stops them
+    where they are. The merge is one transaction, so the stores are untouched; this marks
+    jobs left queued/staging/merging as failed and removes their staging rows and spool
+    files. Called at startup; returns the number of jobs failed.
+    """
+    db = sessionmaker(autocommit=False, autoflush=False, bind=bind)()
+    try:
+        jobs = db.query(models.ImportJob).filter(models.ImportJob.status.in_(ACTIVE_STATUSES)).all()
+        spool_paths = [job.spool_path for job in jobs if job.spool_path]
+        for job in jobs:
+            job.status, job.message = "failed", "Interrupted by a server restart; upload the file again"
+            job.finished_at = datetime.utcnow()
+            db.execute(delete(STAGING).where(STAGING.c.job_id == job.id))
+        db.commit()
+    finally:
+        db.close()
+
+    for path in spool_paths:
+        if os.path.exists(path):
+            os.remove(path)
+    if jobs:
+        print(f"Import jobs: marked {len(jobs)} interrupted job(s) as failed")
+    return len(jobs)
+
+
+# --- 4. STATUS ---
+def job_status(job: models.ImportJob) -> dict:
+    end = job.finished_at or datetime.utcnow()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "progress": round(job.bytes_processed / job.total_bytes, 4) if job.total_bytes else 0.0,
+        "rows_staged": job.rows_staged,
+        "rows_per_second": round(job.rows_staged / elapsed, 1) if elapsed > 0 else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "stats": {
+            "created": job.created,
+            "updated": job.updated,
+            "unchanged": job.unchanged,
+            "errors": job.errors,
+            "geocoding": json.loads(job.geocoding or "{}"),
+        },
+        "error_details": json.loads(job.error_details or "[]"),
+        "message": job.message,
+    }
@@ -0,0 +1,189 @@
+import csv
+import hashlib
+from itertools import islice
+from typing import Iterable, List, Optional
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services import store_events
+from app.services.batch_geocoder import fill_missing_coordinates
+from app.services.service_registry import normalize_names, service_registry
+
+STORES = models.Store.__table__
+STORE_SERVICES = models.store_services
+
+# Columns written for a new store. An existing store gets every one of them but its key, so the
+# stored row always matches its content_hash (which covers the same columns)
+INSERT_COLUMNS = [
+    "store_id", "name", "store_type", "status", "latitude", "longitude",
+    "address_street", "address_city", "address_state", "address_postal_code", "address_country", "phone",
+]
+HOURS_COLUMNS = ["hours_mon", "hours_tue", "hours_wed", "hours_thu", "hours_fri", "hours_sat", "hours_sun"]
+UPDATE_COLUMNS = [*INSERT_COLUMNS[1:], *HOURS_COLUMNS]
+REQUIRED_COLUMNS = ["name", "store_type"]  # NOT NULL in stores
+
+# executemany UPDATE keyed by primary key
+UPDATE_STORES = (
+    update(STORES)
+    .where(STORES.c.store_id == bindparam("key"))
+    .values({col: bindparam(col) for col in [*UPDATE_COLUMNS, "content_hash"]})
+)
+
+
+# --- 1. ROW PARSING ---
+def safe_float(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_services(raw: Optional[str]) -> List[str]:
+    """ "wifi|Parking, atm" -> ["wifi", "parking", "atm"] (normalized, de-duplicated, order kept)."""
+    if not raw:
+        return []
+    return normalize_names(raw.replace("|", ",").split(","))
+
+
+def row_error(e: Exception) -> str:
+    return f"missing column {e}" if isinstance(e, KeyError) else str(e)
+
+
+def store_values(row: dict) -> dict:
+    """
+    Column values for one CSV row. Raises KeyError if the file lacks a column,
+    ValueError if a NOT NULL value is empty.
+    """
+    values = {col: row[col] for col in INSERT_COLUMNS}
+    for col in REQUIRED_COLUMNS:
+        if not (values[col] or "").strip():
+            raise ValueError(f"empty {col}")
+    values["latitude"] = safe_float(row["latitude"])
+    values["longitude"] = safe_float(row["longitude"])
+    values.update({col: row.get(col) for col in HOURS_COLUMNS})
+    return values
+
+
+def content_hash(values: dict, services: List[str]) -> str:
+    """sha256 over the normalized row: stripped text, coordinates to 6 decimals, sorted services."""
+    parts = []
+    for col in [*INSERT_COLUMNS, *HOURS_COLUMNS]:
+        v = values.get(col)
+        parts.append(f"{v:.6f}" if isinstance(v, float) else (v or "").strip())
+    parts.append("|".join(sorted(services)))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def chunked(rows: Iterable[dict], size: int):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- 2. SET-BASED WRITES ---
+def upsert_statement(db: Session):
+    """
+    INSERT for new stores. On PostgreSQL and SQLite a row that appeared since the
+    preload (a concurrent import) turns into an update instead of failing the batch.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(STORES)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(STORES)
+    else:
+        return insert(STORES)
+    return stmt.on_conflict_do_update(
+        index_elements=[STORES.c.store_id],
+        set_={col: stmt.excluded[col] for col in [*UPDATE_COLUMNS, "content_hash"]},
+    )
+
+
+def write_chunk(db: Session, rows: List[dict], stats: dict):
+    """Parses, then writes one chunk of CSV rows with a fixed number of statements."""
+    # Last occurrence of a store_id within the chunk wins
+    parsed = {}
+    for row in rows:
+        store_id = row.get("store_id")
+        if not store_id:
+            continue
+        try:
+            parsed[store_id] = (store_values(row), parse_services(row.get("services", "")))
+        except (KeyError, ValueError) as e:
+            print(f"Row Error: {row_error(e)}")
+            stats["errors"] += 1
+    if not parsed:
+        return
+
+    for values, names in parsed.values():
+        values["content_hash"] = content_hash(values, names)
+
+    existing = dict(db.execute(
+        select(models.Store.store_id, models.Store.content_hash).where(models.Store.store_id.in_(list(parsed)))
+    ).all())
+
+    # Rows identical to the last import of that store are skipped entirely
+    unchanged = [sid for sid, (values, _) in parsed.items() if existing.get(sid) == values["content_hash"]]
+    for store_id in unchanged:
+        del parsed[store_id]
+    stats["unchanged"] += len(unchanged)
+    if not parsed:
+        return
+
+    new_rows = [values for store_id, (values, _) in parsed.items() if store_id not in existing]
+    updated_rows = [
+        {"key": store_id, **{col: values[col] for col in [*UPDATE_COLUMNS, "content_hash"]}}
+        for store_id, (values, _) in parsed.items() if store_id in existing
+    ]
+
+    if new_rows:
+        db.execute(upsert_statement(db), new_rows)
+    if updated_rows:
+        db.execute(UPDATE_STORES, updated_rows)
+
+    # Services: replace every link of the stores in this chunk
+    service_ids = service_registry.resolve(db, (n for _, names in parsed.values() for n in names))
+    db.execute(delete(STORE_SERVICES).where(STORE_SERVICES.c.store_id.in_(list(parsed))))
+    links = [
+        {"store_id": store_id, "service_id": service_ids[name]}
+        for store_id, (_, names) in parsed.items() for name in names
+    ]
+    if links:
+        db.execute(insert(STORE_SERVICES), links)
+
+    stats["created"] += len(new_rows)
+    stats["updated"] += len(updated_rows)
+
+
+# --- 3. ENTRY POINT ---
+def import_stores(db: Session, lines: Iterable[str], chunk_size: Optional[int] = None) -> dict:
+    """
+    Imports CSV text lines in chunks of IMPORT_CHUNK_SIZE rows, all in one transaction.
+    Each chunk costs one SELECT for existing ids, one INSERT, one UPDATE and a few
+    statements for services, however many rows it holds.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "errors": 0}
+    geocoding = {}
+
+    try:
+        for rows in chunked(csv.DictReader(lines), chunk_size):
+            # Rows without usable coordinates are geocoded together before they are written
+            for source, count in fill_missing_coordinates(rows).items():
+                geocoding[source] = geocoding.get(source, 0) + count
+            write_chunk(db, rows, stats)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Bulk statements bypass the ORM's flush events; a no-op re-import keeps caches warm
+    if stats["created"] or stats["updated"]:
+        store_events.bump_version()
+    stats["geocoding"] = geocoding
+    return stats
@@ -0,0 +1,279 @@
+"""
+In-process request and search metrics, rendered in the Prometheus text format by GET /metrics.
+
+Counters and histograms are updated on the hot path (a bisect and a locked increment);
+gauges that already live elsewhere (pool and cache counters) are read only when
+/metrics is scraped. Every worker process keeps its own values, as Prometheus expects
+when it scrapes each worker.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers a cached search (~100 us) up to the search deadline
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# --- 1. METRIC TYPES ---
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() finds the bucket with one bisect."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip([*self.buckets, float("inf")], counts):
+                cumulative += n
+                le = _labels((*self.labelnames, "le"), (*labels, "+Inf" if bound == float("inf") else _number(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# --- 2. REGISTRY ---
+# A collector returns (name, type, help, [(labels dict, value), ...]) families at scrape time
+Family = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status.", ("method", "endpoint", "status")
+))
+HTTP_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "endpoint")
+))
+SEARCH_ERRORS = registry.register(Counter(
+    "search_errors_total", "Searches that failed with an unexpected error (answered with a 500)."
+))
+# cache, geocode, index, sql, filter, open_now, serialize, encode
+SEARCH_STAGES = registry.register(Histogram(
+    "search_stage_seconds", "Time spent in each stage of POST /api/stores/search.", ("stage",)
+))
+
+
+# Per-request stage totals: a stage entered several times in one search (e.g. two SQL
+# queries) is observed once, as its sum. A dict rather than a float so the same object
+# is shared with the threadpool / run_sync code, which runs in a copy of the context.
+_stage_totals: ContextVar[Optional[dict]] = ContextVar("search_stage_totals", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        totals = _stage_totals.get()
+        if totals is None:
+            SEARCH_STAGES.observe(elapsed, self.name)
+        else:
+            totals[self.name] = totals.get(self.name, 0.0) + elapsed
+
+
+def stage(name: str) -> _Stage:
+    """with stage("sql"): ... adds the block's time to the current search's stage totals."""
+    return _Stage(name)
+
+
+@contextmanager
+def search_request():
+    """Collects stage() timings for one search and observes each stage once at the end."""
+    totals = {}
+    token = _stage_totals.set(totals)
+    try:
+        yield totals
+    finally:
+        _stage_totals.reset(token)
+        for name, seconds in totals.items():
+            SEARCH_STAGES.observe(seconds, name)
+
+
+def reset_metrics():
+    for metric in registry.metrics:
+        metric.reset()
+
+
+# --- 3. SCRAPE-TIME GAUGES ---
+_caches = {}  # name -> stats() of an LRUCache
+_pools = {}  # name -> PoolMetrics
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    _caches[name] = stats
+
+
+def register_pool(name: str, pool_metrics):
+    _pools[name] = pool_metrics
+
+
+@registry.collector
+def _cache_families():
+    stats = {name: fn() for name, fn in _caches.items()}
+
+    def family(key):
+        return [({"cache": name}, s[key]) for name, s in stats.items()]
+
+    yield "cache_hits_total", "counter", "Cache lookups that found an entry.", family("hits")
+    yield "cache_misses_total", "counter", "Cache lookups that found nothing.", family("misses")
+    yield "cache_evictions_total", "counter", "Entries dropped to stay under max_entries.", family("evictions")
+    yield "cache_entries", "gauge", "Entries currently held.", family("entries")
+    yield "cache_hit_ratio", "gauge", "hits / (hits + misses) since startup.", [
+        ({"cache": name}, s["hits"] / (s["hits"] + s["misses"]) if s["hits"] + s["misses"] else 0.0)
+        for name, s in stats.items()
+    ]
+
+
+@registry.collector
+def _pool_families():
+    # Pools whose engine was never created (e.g. async in the sync app) are left out
+    stats = {name: m.stats() for name, m in _pools.items() if m.pool is not None}
+
+    def family(key, scale=1.0):
+        return [({"pool": name}, s[key] * scale if s[key] is not None else None) for name, s in stats.items()]
+
+    yield "db_pool_size", "gauge", "Configured pool size.", family("size")
+    yield "db_pool_in_use", "gauge", "Connections checked out.", family("in_use")
+    yield "db_pool_idle", "gauge", "Connections idle in the pool.", family("idle")
+    yield "db_pool_overflow", "gauge", "Connections open beyond the pool size.", family("overflow")
+    yield "db_pool_checkouts_total", "counter", "Connection checkouts.", family("checkouts")
+    yield "db_pool_timeouts_total", "counter", "Checkouts that gave up after the pool timeout.", family("timeouts")
+    yield "db_pool_connects_total", "counter", "New DBAPI connections opened.", family("connects")
+    yield "db_pool_wait_seconds_avg", "gauge", "Mean checkout wait since startup.", family("wait_ms_avg", 0.001)
+    yield "db_pool_wait_seconds_max", "gauge", "Longest checkout wait since startup.", family("wait_ms_max", 0.001)
+
+
+# --- 4. REQUEST MIDDLEWARE ---
+class RequestMetricsMiddleware:
+    """
+    Counts requests and times them per route template (/api/admin/stores/{store_id}, not
+    the concrete path, so label cardinality stays bounded). Plain ASGI rather than
+    BaseHTTPMiddleware, which would add a task and a stream per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], endpoint, str(status))
+            HTTP_DURATION.observe(time.perf_counter() - started, scope["method"], endpoint)
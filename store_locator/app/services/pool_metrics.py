@@ -0,0 +1,112 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from app.services.metrics import register_pool
+
+
+class PoolMetrics:
+    """
+    Counters for one connection pool: how long checkouts wait, how many connections
+    are in use (and how many of those are overflow), and how often a checkout times out.
+    Live gauges are read from the pool itself when stats() is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None  # the engine's current pool, set by instrument()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.in_use_peak = 0
+            self.overflow_peak = 0
+
+    def record_checkout(self, wait: float, in_use: int, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.in_use_peak = max(self.in_use_peak, in_use)
+            self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, wait)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def stats(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            return {
+                "pool": type(pool).__name__ if pool is not None else None,
+                "size": _gauge(pool, "size"),
+                "in_use": _gauge(pool, "checkedout"),
+                "idle": _gauge(pool, "checkedin"),
+                "overflow": max(0, _gauge(pool, "overflow") or 0),
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+                "in_use_peak": self.in_use_peak,
+                "overflow_peak": self.overflow_peak,
+            }
+
+
+def _gauge(pool, name: str):
+    # Only QueuePool-style pools have size/overflow; others (StaticPool, NullPool) report None
+    method = getattr(pool, name, None)
+    return method() if callable(method) else None
+
+
+class _TimedCheckout:
+    """Mixin for QueuePool subclasses: times _do_get, i.e. the wait for a free (or new) connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started, self.checkedout(), max(0, self.overflow()))
+        return record
+
+
+def instrumented(pool_cls, metrics: PoolMetrics):
+    """
+    pool_cls subclass reporting into metrics. Being a class (not a listener on one pool
+    instance) it survives engine.dispose(), which recreates the pool from its class.
+    """
+    return type(f"Instrumented{pool_cls.__name__}", (_TimedCheckout, pool_cls), {"metrics": metrics})
+
+
+def instrument(engine, metrics: PoolMetrics):
+    """Counts new DBAPI connections and keeps metrics pointed at the engine's live pool."""
+    metrics.pool = engine.pool
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "engine_disposed")
+    def _on_dispose(engine):
+        metrics.pool = engine.pool
+
+
+# One per engine in app.database
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+register_pool("sync", sync_pool_metrics)
+register_pool("async", async_pool_metrics)
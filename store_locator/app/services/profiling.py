@@ -0,0 +1,264 @@
+"""
+On-demand request profiling.
+
+A request is profiled when an admin asks for it (X-Profile: 1 header or ?profile=1, with
+an admin access token) or, with PROFILE_SAMPLE_RATE > 0, at random. While it runs, a
+sampler thread records the Python stacks of every busy thread every PROFILE_INTERVAL_MS,
+and SQL statements executed in the request's context are recorded with their timings.
+Stacks are kept in the folded format ("frame;frame;frame count") read by flamegraph.pl,
+inferno and speedscope.
+
+Stacks come from the whole worker process, so requests running at the same time show
+up too; the SQL list only holds the profiled request's statements.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+import jwt
+from starlette.concurrency import run_in_threadpool
+
+from app import models
+from app.config import settings
+from app.database import get_db
+from app.services.sql_trace import SQLStats, track
+
+MAX_STATEMENTS = 1000  # per profile; later statements are only counted
+SAMPLER_THREAD_NAME = "request-profiler"
+
+# Innermost frames of threads that are waiting, not working (event loop select, idle pool workers)
+_IDLE_FRAMES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("threading.py", "_wait_for_tstate_lock"), ("socket.py", "accept"),
+}
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# --- 1. PROFILE ---
+class RequestProfile:
+    def __init__(self, method: str, path: str, reason: str, interval: float):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.reason = reason  # "requested" or "sampled"
+        self.interval = interval
+        self.status = None
+        self.started_at = datetime.now(timezone.utc)
+        self.duration = None
+        self.stacks = Counter()
+        self.sql = SQLStats(keep=MAX_STATEMENTS)
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=SAMPLER_THREAD_NAME, daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "thread")
+                if name == SAMPLER_THREAD_NAME or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(name.replace(";", ","))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "samples": sum(self.stacks.values()),
+            "sql_count": self.sql.count,
+            "sql_ms": round(self.sql.seconds * 1000, 3),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "interval_ms": self.interval * 1000,
+            "sql": self.sql.statements,
+            "folded": self.folded(),
+        }
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+@lru_cache(maxsize=4096)
+def _label(code) -> str:
+    path = code.co_filename
+    if path.startswith(_APP_ROOT + os.sep):
+        path = os.path.relpath(path, _APP_ROOT)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+
+# --- 2. STORAGE ---
+# Kept per worker process; set PROFILE_DIR to collect them from every worker in one place
+_profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def _store(profile: RequestProfile):
+    with _profiles_lock:
+        _profiles[profile.id] = profile
+        while len(_profiles) > settings.PROFILE_MAX_STORED:
+            _profiles.popitem(last=False)
+
+
+def _save(profile: RequestProfile):
+    if not settings.PROFILE_DIR:
+        return
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILE_DIR, profile.id)
+    with open(base + ".folded", "w", encoding="utf-8") as f:
+        f.write(profile.folded())
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(profile.to_dict(), f)
+
+
+def _finish(profile: RequestProfile):
+    profile.stop()
+    _save(profile)
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    """A stored profile, from this worker's memory or else from PROFILE_DIR."""
+    with _profiles_lock:
+        profile = _profiles.get(profile_id)
+    if profile is not None:
+        return profile.to_dict()
+    if settings.PROFILE_DIR and profile_id and all(c in "0123456789abcdef" for c in profile_id):
+        path = os.path.join(settings.PROFILE_DIR, profile_id + ".json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+def list_profiles() -> List[dict]:
+    with _profiles_lock:
+        return [p.summary() for p in reversed(_profiles.values())]
+
+
+def reset_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+
+# --- 3. MIDDLEWARE ---
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def profile_requested(scope) -> bool:
+    if (_header(scope, b"x-profile") or "").strip().lower() in ("1", "true", "yes"):
+        return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[0].lower() in ("1", "true", "yes")
+
+
+def admin_token_email(authorization: Optional[str]) -> Optional[str]:
+    """
+    The subject of a valid access token that claims the admin role. A cheap pre-check:
+    the claim may be stale, so is_admin_user confirms it against the database.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token.strip(), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    return payload.get("sub") if payload.get("role") == "admin" else None
+
+
+def is_admin_user(scope, email: str) -> bool:
+    """
+    The user still exists, is active and is an admin (a demoted or deactivated admin's token
+    stays valid until it expires). Uses the app's get_db, honouring dependency overrides.
+    Blocking: call it from the threadpool.
+    """
+    provider = getattr(scope.get("app"), "dependency_overrides", {}).get(get_db, get_db)
+    sessions = provider()
+    db = next(sessions)
+    try:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        return bool(user and user.is_active and user.role and user.role.name == "admin")
+    finally:
+        sessions.close()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests an admin asked for (the response then carries X-Profile-Id) and a
+    PROFILE_SAMPLE_RATE share of all others. Anything else only pays for the checks; the
+    database is only asked when the request carries the flag and an admin-claim token.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        email = admin_token_email(_header(scope, b"authorization")) if profile_requested(scope) else None
+        if email and await run_in_threadpool(is_admin_user, scope, email):
+            reason = "requested"
+        elif settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        else:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], reason, settings.PROFILE_INTERVAL_MS / 1000)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if reason == "requested":
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        _store(profile)  # listed (without a duration) while it runs
+        profile.start()
+        try:
+            with track(profile.sql):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            # Joining the sampler and writing files block; keep both off the event loop
+            await run_in_threadpool(_finish, profile)
@@ -1,188 +1,475 @@
+import base64
+import bisect
+import hashlib
+import json
 import math
-import time
-from typing import List, Optional, Tuple, Dict
+from typing import List, Optional, Dict, Tuple
+import numpy as np
+from sqlalchemy import and_, or_, select, func, distinct, true
 from sqlalchemy.orm import Session
 from app import models
-from geopy.geocoders import Nominatim
-from datetime import datetime
-import pytz  # Required for Timezone fix
+from app.config import settings
+from app.services import hours, spatial_index, store_events
+from app.services.metrics import register_cache, stage
+from app.services.cache import LRUCache
+from app.services.geo import bounding_box, calculate_distance, distances_from
+from app.services.hours import STATE_TIMEZONES, WeekClock
+# Geocoding lives in its own module; re-exported here for existing imports
+from app.services.geocoder import get_lat_lon, cache_get, cache_set
+
+# --- 1. OPEN LOGIC ---
+def store_timezone(store) -> str:
+    return STATE_TIMEZONES.get(store.address_state, 'UTC')
+
+
+def is_store_open(store, clock: Optional[WeekClock] = None):
+    """
+    Checks the store's precompiled weekly intervals against "now" in the store's timezone.
+    Pass one WeekClock per request so "now" and the UTC offsets are computed once.
+    """
+    clock = clock or WeekClock()
+    return hours.is_open(hours.store_schedule(store), clock.minute_of_week(store_timezone(store)))
+
+
+# --- 2. SEARCH LOGIC ---
+def bounding_box_filter(lat: float, lon: float, radius_miles: float):
+    """
+    SQL WHERE clause for the box around the search point, so the database can use
+    idx_lat_lon instead of shipping every row to Python.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_miles)
+    clause = models.Store.latitude.between(min_lat, max_lat)
+
+    if min_lon <= -180.0 and max_lon >= 180.0:
+        return clause
+    if min_lon <= max_lon:
+        return and_(clause, models.Store.longitude.between(min_lon, max_lon))
+
+    # Box crosses the antimeridian: two longitude ranges
+    return and_(clause, or_(models.Store.longitude >= min_lon, models.Store.longitude <= max_lon))
+
+
+def services_filter(services: List[str]):
+    """
+    Stores that have ALL of the given services, as one uncorrelated subquery
+    (instead of one correlated EXISTS per service).
+    """
+    names = {name.strip().lower() for name in services if name and name.strip()}
+    if not names:
+        return true()
+
+    matching = (
+        select(models.store_services.c.store_id)
+        .join(models.Service, models.Service.id == models.store_services.c.service_id)
+        .where(func.lower(models.Service.name).in_(names))
+        .group_by(models.store_services.c.store_id)
+        .having(func.count(distinct(func.lower(models.Service.name))) == len(names))
+    )
+    return models.Store.store_id.in_(matching)
 
-# --- 1. IN-MEMORY CACHE ---
-_internal_cache: Dict[str, dict] = {}
 
+def search_stores_logic(
+        db: Session,
+        lat: Optional[float],
+        lon: Optional[float],
+        radius_miles: float,
+        store_type: Optional[str],
+        services: Optional[List[str]],
+        page: int,
+        limit: int,
+        open_now: bool = False,
+        backend: Optional[str] = None,
+        index: Optional[spatial_index.SpatialIndex] = None,
+        cursor: Optional[str] = None
+):
+    """
+    backend: "index" (in-memory grid, default) or "sql" (bounding box in the WHERE clause).
+    Defaults to settings.SEARCH_BACKEND. index: a snapshot the caller already holds
+    (app.async_main builds it with get_index_async); fetched with get_index if omitted.
+    cursor: a next_cursor from an earlier response of the same search; replaces page and
+    resumes after that result. Raises InvalidCursor if it is malformed or from another search.
+    """
+    backend = backend or settings.SEARCH_BACKEND
+    clock = WeekClock()  # one "now" for every open_now / is_open check in this request
+
+    use_distance, paging = _paging(lat, lon, radius_miles, store_type, services, open_now, page, limit, cursor)
+
+    # In-memory index: distance, type, services and open_now all run on the snapshot
+    if use_distance and backend != "sql":
+        if index is None:
+            with stage("index"):
+                index = spatial_index.get_index(db)
+        return load_index_page(db, _select_index_page(
+            index, store_type, services, lat, lon, radius_miles, paging, open_now, clock
+        ))
 
-def cache_get(key: str):
-    data = _internal_cache.get(key)
-    if not data:
-        return None
-    if time.time() > data["expires"]:
-        del _internal_cache[key]
-        return None
-    return data["value"]
-
-
-def cache_set(key: str, value, ttl_seconds: int):
-    _internal_cache[key] = {
-        "value": value,
-        "expires": time.time() + ttl_seconds
-    }
-
+    query = db.query(models.Store)
+    # 1. Filter by Store Type
+    if store_type and store_type.lower() != "all":
+        query = query.filter(models.Store.store_type.ilike(store_type.strip()))
 
-# --- 2. GEOCODER ---
-def get_lat_lon(query: str) -> Tuple[Optional[float], Optional[float]]:
-    cache_key = f"geo:{query.lower().strip()}"
-    cached_geo = cache_get(cache_key)
-    if cached_geo:
-        return cached_geo
+    # 2. Filter by Services (AND logic)
+    if services and len(services) > 0:
+        query = query.filter(services_filter(services))
+
+    # 3. Distance Pre-filter
+    if use_distance:
+        query = query.filter(bounding_box_filter(lat, lon, radius_miles))
+        return _search_candidates(db, query, lat, lon, radius_miles, paging, open_now, clock)
+    if open_now:
+        return _search_candidates(db, query, None, None, None, paging, open_now, clock)
+
+    # No per-row work left: the database counts and pages (ordered by store_id, as ties are elsewhere)
+    with stage("sql"):
+        total = query.order_by(None).count()
+        ordered = query.order_by(models.Store.store_id)
+        if paging.after is not None:
+            ordered = ordered.filter(models.Store.store_id > paging.after[1])
+        else:
+            ordered = ordered.offset(paging.start)
+        stores = ordered.limit(limit + 1).all()  # one extra row says whether there is a next page
 
-    geolocator = Nominatim(user_agent="retail_locator_final_v3")
-    try:
-        location = geolocator.geocode(f"{query}, USA", timeout=10)
-        if location:
-            result = (location.latitude, location.longitude)
-            cache_set(cache_key, result, 2592000)
-            return result
-    except Exception:
-        pass
+    with stage("serialize"):
+        for s in stores:
+            s.distance_miles = None
+        results = [store_to_result(s, clock) for s in stores[:limit]]
+        return paging.response(results, total, has_more=len(stores) > limit)
+
+
+def _paging(lat: Optional[float], lon: Optional[float], radius_miles: float, store_type: Optional[str],
+            services: Optional[List[str]], open_now: bool, page: int, limit: int, cursor: Optional[str]):
+    # (whether the search is by distance, its Paging); raises InvalidCursor
+    use_distance = bool(lat and lon and radius_miles < 5000)
+    fingerprint = search_fingerprint(lat, lon, radius_miles, store_type, services, open_now)
+    after = decode_cursor(cursor, fingerprint, use_distance) if cursor else None
+    return use_distance, Paging(page, limit, after, fingerprint)
+
+
+CANDIDATE_COLUMNS = [models.Store.store_id, models.Store.latitude, models.Store.longitude, models.Store.address_state]
+
+
+def _search_candidates(db: Session, query, lat: Optional[float], lon: Optional[float], radius_miles: Optional[float],
+                       paging: "Paging", open_now: bool, clock: WeekClock):
+    """
+    SQL-filtered search that still needs per-row checks (exact distance, open_now).
+    Candidates are read as plain column tuples, never as ORM objects; only the
+    page * limit nearest survive a partial selection, and only the page is loaded.
+    """
+    day_columns = [getattr(models.Store, col) for col in hours.DAY_COLUMNS] if open_now else []
+    with stage("sql"):
+        rows = query.with_entities(*CANDIDATE_COLUMNS, *day_columns).order_by(models.Store.store_id).all()
+
+    if open_now:
+        with stage("open_now"):
+            rows = [
+                r for r in rows
+                if hours.is_open(hours.compile_week(tuple(r[4:])), clock.minute_of_week(STATE_TIMEZONES.get(r[3], 'UTC')))
+            ]
+
+    with stage("filter"):
+        ids = np.asarray([r[0] for r in rows], dtype=object)
+        if lat is None:
+            # Rows already come ordered by store_id
+            first = bisect.bisect_right(ids.tolist(), paging.after[1]) if paging.after else paging.start
+            positions = range(first, min(first + paging.limit, len(ids)))
+            dist, has_more = None, first + paging.limit < len(ids)
+        else:
+            dist = distances_from(lat, lon, [r[1] for r in rows], [r[2] for r in rows])
+            keep = dist <= radius_miles  # the bounding box is approximate, Haversine is exact
+            ids, dist = ids[keep], dist[keep]
+            positions, has_more = _select_page(ids, dist, paging)
+    return _page_result(db, ids, dist, positions, has_more, paging, clock)
 
-    return None, None
 
+class IndexPage:
+    """The page an index search picked from the snapshot: everything but the stores' rows."""
 
-# --- 3. TIMEZONE MAP & OPEN LOGIC ---
-STATE_TIMEZONES = {
-    'MA': 'America/New_York', 'RI': 'America/New_York', 'CT': 'America/New_York',
-    'NY': 'America/New_York', 'NJ': 'America/New_York', 'PA': 'America/New_York',
-    'DE': 'America/New_York', 'MD': 'America/New_York', 'VA': 'America/New_York',
-    'NC': 'America/New_York', 'SC': 'America/New_York', 'GA': 'America/New_York',
-    'FL': 'America/New_York', 'ME': 'America/New_York', 'NH': 'America/New_York',
-    'VT': 'America/New_York', 'OH': 'America/New_York', 'MI': 'America/New_York',
-    'IN': 'America/New_York', 'KY': 'America/New_York', 'WV': 'America/New_York',
+    def __init__(self, ids: np.ndarray, dist: np.ndarray, positions, has_more: bool, paging: "Paging",
+                 clock: WeekClock):
+        self.ids = ids
+        self.dist = dist
+        self.positions = positions
+        self.has_more = has_more
+        self.paging = paging
+        self.clock = clock
 
-    'IL': 'America/Chicago', 'WI': 'America/Chicago', 'MN': 'America/Chicago',
-    'IA': 'America/Chicago', 'MO': 'America/Chicago', 'ND': 'America/Chicago',
-    'SD': 'America/Chicago', 'NE': 'America/Chicago', 'KS': 'America/Chicago',
-    'OK': 'America/Chicago', 'TX': 'America/Chicago', 'AL': 'America/Chicago',
-    'MS': 'America/Chicago', 'TN': 'America/Chicago', 'AR': 'America/Chicago',
-    'LA': 'America/Chicago',
 
-    'MT': 'America/Denver', 'ID': 'America/Denver', 'WY': 'America/Denver',
-    'UT': 'America/Denver', 'CO': 'America/Denver', 'NM': 'America/Denver',
-    'AZ': 'America/Phoenix',
+def select_index_page(
+        index: spatial_index.SpatialIndex,
+        lat: Optional[float],
+        lon: Optional[float],
+        radius_miles: float,
+        store_type: Optional[str],
+        services: Optional[List[str]],
+        page: int,
+        limit: int,
+        open_now: bool = False,
+        cursor: Optional[str] = None
+) -> Optional[IndexPage]:
+    """
+    The CPU half of search_stores_logic on the index backend, without touching the database.
+    None if the search has no radius (those go to SQL). app.async_main runs this in the
+    threadpool and then loads the page on its AsyncSession with load_index_page.
+    """
+    use_distance, paging = _paging(lat, lon, radius_miles, store_type, services, open_now, page, limit, cursor)
+    if not use_distance:
+        return None
+    return _select_index_page(index, store_type, services, lat, lon, radius_miles, paging, open_now, WeekClock())
+
+
+def _select_index_page(index: spatial_index.SpatialIndex, store_type: Optional[str], services: Optional[List[str]],
+                       lat: float, lon: float, radius_miles: float, paging: "Paging", open_now: bool,
+                       clock: WeekClock) -> IndexPage:
+    """
+    Radius search against the in-memory snapshot. Distances for every candidate come from
+    one vectorized pass; the type, services and open_now filters are NumPy masks over the
+    snapshot's columns.
+    """
+    store_type = store_type if store_type and store_type.lower() != "all" else None
+    with stage("filter"):
+        positions, dist = index.query(lat, lon, radius_miles)
+        if len(positions) and (store_type or services):
+            keep = index.services_mask(positions, services or [])
+            if store_type:
+                keep &= index.type_mask(positions, store_type)
+            positions, dist = positions[keep], dist[keep]
+
+    if open_now and len(positions):
+        with stage("open_now"):
+            keep = index.open_mask(positions, clock)
+            positions, dist = positions[keep], dist[keep]
+
+    ids = index.ids[positions]
+    with stage("filter"):
+        page_positions, has_more = _select_page(ids, dist, paging)
+    return IndexPage(ids, dist, page_positions, has_more, paging, clock)
+
+
+def load_index_page(db: Session, selected: IndexPage) -> dict:
+    """Loads only the rows of the selected page and builds the search response."""
+    return _page_result(
+        db, selected.ids, selected.dist, selected.positions, selected.has_more, selected.paging, selected.clock
+    )
+
+
+def _select_page(ids: np.ndarray, dist: np.ndarray, paging: "Paging"):
+    """
+    (positions of the page ordered by (distance, store_id), whether more follow).
+    With a cursor, everything at or before its key is masked out first, so a deep page
+    costs one partial selection of limit rows rather than of page * limit.
+    """
+    if paging.after is None:
+        positions = spatial_index.nearest(ids, dist, paging.start + paging.limit)[paging.start:]
+        return positions, len(ids) > paging.start + paging.limit
+
+    last_dist, last_id = paging.after
+    remaining = np.nonzero((dist > last_dist) | ((dist == last_dist) & (ids > last_id)))[0]
+    chosen = spatial_index.nearest(ids[remaining], dist[remaining], paging.limit)
+    return [int(remaining[i]) for i in chosen], len(remaining) > paging.limit
+
+
+def _page_result(db: Session, ids: np.ndarray, dist: Optional[np.ndarray], positions, has_more: bool,
+                 paging: "Paging", clock: WeekClock) -> dict:
+    with stage("sql"):
+        stores = fetch_stores(db, [ids[i] for i in positions])
+    with stage("serialize"):
+        results = []
+        for i in positions:
+            s = stores[ids[i]]
+            s.distance_miles = float(dist[i]) if dist is not None else None
+            results.append(store_to_result(s, clock))
+        return paging.response(results, len(ids), has_more)
+
+
+_IN_CHUNK_SIZE = 500
+
+
+def _chunks(values: list, size: int = _IN_CHUNK_SIZE):
+    # Keeps IN (...) lists under SQLite's bound-parameter limit
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def fetch_stores(db: Session, store_ids: List[str]) -> Dict[str, models.Store]:
+    stores = {}
+    for chunk in _chunks(store_ids):
+        for s in db.query(models.Store).filter(models.Store.store_id.in_(chunk)):
+            stores[s.store_id] = s
+    return stores
+
+
+def store_to_result(s, clock: Optional[WeekClock] = None) -> dict:
+    return {
+        "store_id": s.store_id,
+        "name": s.name,
+        "store_type": s.store_type,
+        "status": s.status,
+        "address_street": s.address_street,
+        "address_city": s.address_city,
+        "address_state": s.address_state,
+        "address_postal_code": s.address_postal_code,
+        "latitude": s.latitude,
+        "longitude": s.longitude,
+        "distance": getattr(s, 'distance_miles', None),
+        "services": [service.name for service in s.services],
+
+        # FIELDS FOR FRONTEND
+        "phone": s.phone,
+        "hours_mon": s.hours_mon,
+        "hours_tue": s.hours_tue,
+        "hours_wed": s.hours_wed,
+        "hours_thu": s.hours_thu,
+        "hours_fri": s.hours_fri,
+        "hours_sat": s.hours_sat,
+        "hours_sun": s.hours_sun,
+        "is_open": is_store_open(s, clock)
+    }
 
-    'CA': 'America/Los_Angeles', 'NV': 'America/Los_Angeles', 'OR': 'America/Los_Angeles',
-    'WA': 'America/Los_Angeles',
 
-    'AK': 'America/Anchorage', 'HI': 'Pacific/Honolulu'
-}
+# --- 3. CURSOR PAGINATION ---
+class InvalidCursor(ValueError):
+    pass
 
 
-def is_store_open(store, current_time_unused=None):
-    # 1. Determine Store's Timezone
-    tz_name = STATE_TIMEZONES.get(store.address_state, 'UTC')
-    tz = pytz.timezone(tz_name)
+def search_fingerprint(lat: Optional[float], lon: Optional[float], radius_miles: float,
+                       store_type: Optional[str], services: Optional[List[str]], open_now: bool) -> str:
+    """Identifies the result ordering a cursor belongs to (normalized like search_cache_key)."""
+    key = (
+        None if lat is None else round(lat, 6), None if lon is None else round(lon, 6), float(radius_miles),
+        store_type.strip().lower() if store_type and store_type.lower() != "all" else None,
+        tuple(sorted({s.strip().lower() for s in services or [] if s and s.strip()})),
+        bool(open_now),
+    )
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:16]
 
-    # 2. Get REAL Current Time in THAT Timezone
-    store_now = datetime.now(tz)
 
-    days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
-    day_name = days[store_now.weekday()]
+def encode_cursor(distance: Optional[float], store_id: str, fingerprint: str) -> str:
+    raw = json.dumps({"d": distance, "id": store_id, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-    # 3. Check Hours
-    hours = getattr(store, f"hours_{day_name}", None)
-    if not hours or hours.lower() == "closed":
-        return False
 
+def decode_cursor(cursor: str, fingerprint: str, use_distance: bool) -> Tuple[Optional[float], str]:
+    """
+    Returns the (distance, store_id) of the last result the cursor was issued after.
+    The fingerprint is computable by anyone, so the position is checked too: a distance
+    search needs a finite distance, a search without a location needs none.
+    """
     try:
-        current_time_str = store_now.strftime("%H:%M")
-        start_str, end_str = hours.split("-")
-        return start_str <= current_time_str <= end_str
-    except:
-        return False
-
-
-# --- 4. SEARCH LOGIC ---
-def search_stores_logic(
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        distance, store_id, cursor_fingerprint = data["d"], data["id"], data["f"]
+        if distance is not None:
+            distance = float(distance)
+        if not isinstance(store_id, str):
+            raise TypeError(store_id)
+        if use_distance != (distance is not None) or (distance is not None and not math.isfinite(distance)):
+            raise ValueError(distance)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_fingerprint != fingerprint:
+        raise InvalidCursor("Cursor belongs to a different search")
+    return distance, store_id
+
+
+class Paging:
+    """Offset (page) or keyset (after) position of one search request, and its response envelope."""
+
+    def __init__(self, page: int, limit: int, after: Optional[Tuple[Optional[float], str]], fingerprint: str):
+        self.page = page
+        self.limit = limit
+        self.after = after
+        self.fingerprint = fingerprint
+        self.start = 0 if after is not None else (page - 1) * limit
+
+    def response(self, results: List[dict], total: int, has_more: bool) -> dict:
+        next_cursor = None
+        if has_more and results:
+            last = results[-1]
+            next_cursor = encode_cursor(last["distance"], last["store_id"], self.fingerprint)
+        return {
+            "results": results,
+            "total": total,
+            "page": None if self.after is not None else self.page,
+            "limit": self.limit,
+            "next_cursor": next_cursor,
+        }
+
+
+# --- 4. SEARCH RESULT CACHE ---
+_search_cache = LRUCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL_SECONDS)
+register_cache("search", _search_cache.stats)
+_search_cache_version = None
+
+
+def search_cache_key(
         db: Session,
+        location: Optional[str],
         lat: Optional[float],
         lon: Optional[float],
         radius_miles: float,
         store_type: Optional[str],
         services: Optional[List[str]],
+        open_now: bool,
         page: int,
         limit: int,
-        open_now: bool = False
-):
+        clock: Optional[WeekClock] = None,
+        cursor: Optional[str] = None
+) -> tuple:
+    """
+    Normalized search request. Keyed on the geocode text when there is one (so a hit
+    also skips geocoding), otherwise on coordinates rounded to ~10 m. open_now results
+    change with the clock, so they are bucketed per minute. The stores version makes
+    entries written before a store change unreachable.
+    """
+    if location:
+        where = ("q", " ".join(location.lower().split()))
+    elif lat is not None and lon is not None:
+        where = ("ll", round(lat, 4), round(lon, 4))
+    else:
+        where = None
+
+    store_type = store_type.strip().lower() if store_type and store_type.lower() != "all" else None
+    services = tuple(sorted({s.strip().lower() for s in services or [] if s and s.strip()}))
+    open_bucket = (clock or WeekClock()).minute_of_week("UTC") if open_now else None
+
+    return (
+        id(db.get_bind()), store_events.current_version(),
+        where, float(radius_miles), store_type, services, open_bucket, page, limit, cursor
+    )
+
+
+def _sync_cache_version():
+    # Drop everything once the stores table changes instead of waiting for TTL/LRU
+    global _search_cache_version
+    version = store_events.current_version()
+    if version != _search_cache_version:
+        _search_cache.clear()
+        _search_cache_version = version
+
+
+def get_cached_search(key: tuple, clock: Optional[WeekClock] = None) -> Optional[dict]:
+    _sync_cache_version()
+    cached = _search_cache.get(key)
+    if cached is None:
+        return None
 
-    query = db.query(models.Store)
-    # 1. Filter by Store Type
-    if store_type and store_type.lower() != "all":
-        query = query.filter(models.Store.store_type.ilike(store_type.strip()))
+    # is_open depends on the time of the request, not of the cached computation
+    clock = clock or WeekClock()
+    results = []
+    for r in cached["results"]:
+        schedule = hours.compile_week(tuple(r.get(col) for col in hours.DAY_COLUMNS))
+        tz_name = STATE_TIMEZONES.get(r.get("address_state"), 'UTC')
+        results.append({**r, "is_open": hours.is_open(schedule, clock.minute_of_week(tz_name))})
+    return {**cached, "results": results}
 
-    # 2. Filter by Services (NEW LOGIC)
-    if services and len(services) > 0:
-        for service_name in services:
-             # This checks if the store has *at least* this service
-            query = query.filter(models.Store.services.any(models.Service.name.ilike(service_name)))
-
-    all_candidates = query.all()
-    valid_stores = []
-
-    for s in all_candidates:
-        # Distance Check
-        dist = None
-        if lat and lon and radius_miles < 5000:
-            dist = calculate_distance(lat, lon, s.latitude, s.longitude)
-            if dist > radius_miles:
-                continue
-            s.distance_miles = dist
-        else:
-            s.distance_miles = None
 
-        # Open Now Check (Timezone Aware)
-        if open_now and not is_store_open(s):
-            continue
+def cache_search(key: tuple, result: dict):
+    _sync_cache_version()
+    _search_cache.set(key, result)
 
-        valid_stores.append(s)
 
-    valid_stores.sort(key=lambda x: x.distance_miles if x.distance_miles is not None else 9999)
+def search_cache_stats() -> dict:
+    return _search_cache.stats()
 
-    total = len(valid_stores)
-    start = (page - 1) * limit
-    paginated = valid_stores[start: start + limit]
 
-    results = []
-    for s in paginated:
-        results.append({
-            "store_id": s.store_id,
-            "name": s.name,
-            "store_type": s.store_type,
-            "status": s.status,
-            "address_street": s.address_street,
-            "address_city": s.address_city,
-            "address_state": s.address_state,
-            "address_postal_code": s.address_postal_code,
-            "latitude": s.latitude,
-            "longitude": s.longitude,
-            "distance": getattr(s, 'distance_miles', None),
-            "services": [service.name for service in s.services],
-
-            # FIELDS FOR FRONTEND
-            "phone": s.phone,
-            "hours_mon": s.hours_mon,
-            "hours_tue": s.hours_tue,
-            "hours_wed": s.hours_wed,
-            "hours_thu": s.hours_thu,
-            "hours_fri": s.hours_fri,
-            "hours_sat": s.hours_sat,
-            "hours_sun": s.hours_sun,
-            "is_open": is_store_open(s)
-        })
-
-    return {"results": results, "total": total, "page": page, "limit": limit}
-
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 3958.8
-    dlat, dlon = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-    return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
\ No newline at end of file
+def reset_search_cache():
+    _search_cache.clear()
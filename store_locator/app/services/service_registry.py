@@ -0,0 +1,107 @@
+import threading
+import weakref
+from typing import Dict, Iterable, List
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+
+SERVICES = models.Service.__table__
+
+
+def normalize_names(names: Iterable[str]) -> List[str]:
+    """Lower-cased, stripped, de-duplicated (order kept); blanks dropped."""
+    cleaned = (name.strip().lower() for name in names if name)
+    return list(dict.fromkeys(name for name in cleaned if name))
+
+
+class ServiceRegistry:
+    """
+    In-memory services.name -> id map, one per database.
+
+    resolve() costs nothing for cached names, one IN query for the rest, and one
+    INSERT for names that do not exist yet. Nothing is committed: new rows belong to
+    the caller's transaction, and ids are only cached once that transaction commits.
+    """
+
+    def __init__(self):
+        self._ids = weakref.WeakKeyDictionary()  # engine -> {name: id}
+        self._lock = threading.Lock()
+
+    def _cached(self, bind) -> Dict[str, int]:
+        with self._lock:
+            return self._ids.setdefault(bind, {})
+
+    def resolve(self, db: Session, names: Iterable[str]) -> Dict[str, int]:
+        names = normalize_names(names)
+        if not names:
+            return {}
+
+        bind = db.get_bind()
+        pending = db.info.setdefault("service_ids", {})
+        cached = self._cached(bind)
+        ids = {n: cached.get(n, pending.get(n)) for n in names}
+        missing = [n for n, service_id in ids.items() if service_id is None]
+        if not missing:
+            return ids
+
+        found = self._select(db, missing)
+        new = [n for n in missing if n not in found]
+        if new:
+            self._insert(db, new)
+            found.update(self._select(db, new))
+
+        ids.update(found)
+        pending.update(found)
+        db.info["service_ids_bind"] = bind
+        return {n: i for n, i in ids.items() if i is not None}
+
+    @staticmethod
+    def _select(db: Session, names: List[str]) -> Dict[str, int]:
+        return dict(db.execute(select(SERVICES.c.name, SERVICES.c.id).where(SERVICES.c.name.in_(names))).all())
+
+    @staticmethod
+    def _insert(db: Session, names: List[str]):
+        # A concurrent creator may insert the same name first: the unique constraint
+        # turns that into a no-op, and the following SELECT picks up its id
+        rows = [{"name": n} for n in names]
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            db.execute(postgresql.insert(SERVICES).on_conflict_do_nothing(index_elements=["name"]), rows)
+        elif dialect == "sqlite":
+            db.execute(sqlite.insert(SERVICES).on_conflict_do_nothing(index_elements=["name"]), rows)
+        else:
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(SERVICES), row)
+                except IntegrityError:
+                    pass
+
+    def promote(self, session: Session):
+        """Caches the ids a transaction saw once it has committed."""
+        pending = session.info.pop("service_ids", None)
+        bind = session.info.pop("service_ids_bind", None)
+        if pending and bind is not None:
+            cached = self._cached(bind)
+            with self._lock:
+                cached.update(pending)
+
+    def reset(self):
+        with self._lock:
+            self._ids.clear()
+
+
+service_registry = ServiceRegistry()
+
+
+@event.listens_for(Session, "after_commit")
+def _promote_on_commit(session):
+    service_registry.promote(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("service_ids", None)
+    session.info.pop("service_ids_bind", None)
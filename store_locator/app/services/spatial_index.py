@@ -0,0 +1,294 @@
+import asyncio
+import math
+import threading
+import time
+import weakref
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services import hours, store_events
+from app.services.geo import EARTH_RADIUS_MILES, bounding_box
+
+
+# --- 1. COLUMNAR SNAPSHOT + GRID ---
+class SpatialIndex:
+    """
+    Columnar snapshot of store coordinates with a uniform lat/lon grid on top.
+    Coordinates (and their radians/cosines) live in contiguous NumPy arrays, so
+    distances for all candidates of a search are computed in one vectorized pass.
+    A radius query only gathers rows from the grid cells overlapping its bounding box.
+    Opening hours are kept as compiled weekly intervals, store types as small ints and
+    services as bitmasks, so open_now and the type/services filters need no row loads.
+    """
+
+    def __init__(self, store_ids, lats, lons, cell_degrees: float = 0.5, schedules=None, timezones=None,
+                 store_types=None, services=None):
+        self.cell_degrees = cell_degrees
+        self.lon_cells = int(math.ceil(360.0 / cell_degrees))
+        self.lat_cells = int(math.ceil(180.0 / cell_degrees))
+
+        self.ids = np.asarray(store_ids, dtype=object)
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self.lat_rad = np.radians(self.lat)
+        self.lon_rad = np.radians(self.lon)
+        self.cos_lat = np.cos(self.lat_rad)
+        self.size = len(self.ids)
+
+        # Opening hours: distinct schedules padded into (n_schedules, k) start/end arrays,
+        # so open_now is one vectorized comparison instead of a per-store loop
+        schedule_list, self.schedule_ids = _intern(schedules if schedules is not None else [()] * self.size)
+        width = max([len(sc) for sc in schedule_list] + [1])
+        self.open_starts = np.ones((len(schedule_list), width), dtype=np.int64)  # 1 > 0: never matches
+        self.open_ends = np.zeros((len(schedule_list), width), dtype=np.int64)
+        for row, intervals in enumerate(schedule_list):
+            for col, (start, end) in enumerate(intervals):
+                self.open_starts[row, col], self.open_ends[row, col] = start, end
+        self.tz_names, self.tz_ids = _intern(timezones if timezones is not None else ['UTC'] * self.size)
+
+        # Store types compared case-insensitively, like the SQL filter's ILIKE
+        type_names, self.type_ids = _intern(
+            [t.lower() if t is not None else None for t in store_types] if store_types is not None
+            else [None] * self.size
+        )
+        self.type_lookup = {name: i for i, name in enumerate(type_names)}
+
+        # Services: one bit per distinct (lowercased) name; rows share distinct service sets,
+        # so the bitmasks are stored per set in 64-bit words, (n_sets, words)
+        raw_sets, raw_ids = _intern(frozenset(names) for names in services or [()] * self.size)
+        service_sets, lowered_ids = _intern(frozenset(n.lower() for n in names) for names in raw_sets)
+        self.service_set_ids = lowered_ids[raw_ids]
+        self.service_bits = {name: bit for bit, name in enumerate(sorted(set().union(*service_sets)))}
+        self.service_words = max(1, -(-len(self.service_bits) // 64))
+        self.service_masks = np.zeros((len(service_sets), self.service_words), dtype=np.uint64)
+        for row, names in enumerate(service_sets):
+            self.service_masks[row] = self._bitmask(names)
+
+        # Group row positions by cell: sort once, then slice per distinct key
+        keys = self._lat_cell(self.lat) * self.lon_cells + self._lon_cell(self.lon)
+        order = np.argsort(keys, kind="stable")
+        distinct, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], self.size)
+        self.cells = {int(k): order[s:e] for k, s, e in zip(distinct, starts, ends)}
+
+        # Set by get_index() so callers can tell when the index is stale
+        self.version = None
+        self.bind = None
+        self.built_at = 0.0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, float, float]], cell_degrees: float = 0.5):
+        rows = [r for r in rows if r[1] is not None and r[2] is not None]
+        return cls([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], cell_degrees)
+
+    def _lat_cell(self, lat):
+        return np.clip(np.floor_divide(np.add(lat, 90.0), self.cell_degrees), 0, self.lat_cells - 1).astype(np.int64)
+
+    def _lon_cell(self, lon):
+        return np.mod(np.floor_divide(np.add(lon, 180.0), self.cell_degrees), self.lon_cells).astype(np.int64)
+
+    def _lon_cell_range(self, min_lon: float, max_lon: float) -> List[int]:
+        if min_lon <= -180.0 and max_lon >= 180.0:
+            return list(range(self.lon_cells))
+
+        first, last = int(self._lon_cell(min_lon)), int(self._lon_cell(max_lon))
+        if min_lon <= max_lon and first <= last:
+            return list(range(first, last + 1))
+
+        # Box crosses the antimeridian: walk east from first and wrap around
+        return list(range(first, self.lon_cells)) + list(range(0, last + 1))
+
+    def _candidates(self, lat: float, lon: float, radius_miles: float) -> np.ndarray:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_miles)
+        lat_range = range(int(self._lat_cell(min_lat)), int(self._lat_cell(max_lat)) + 1)
+        lon_range = self._lon_cell_range(min_lon, max_lon)
+
+        # Wide searches would probe mostly empty cells; scanning every row is cheaper
+        if len(lat_range) * len(lon_range) >= len(self.cells):
+            return np.arange(self.size)
+
+        parts = []
+        for lat_cell in lat_range:
+            base = lat_cell * self.lon_cells
+            for lon_cell in lon_range:
+                cell = self.cells.get(base + lon_cell)
+                if cell is not None:
+                    parts.append(cell)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def distances(self, lat: float, lon: float, positions: np.ndarray) -> np.ndarray:
+        """Vectorized Haversine from (lat, lon) to the rows at positions, in miles."""
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        dlat = self.lat_rad[positions] - lat1
+        dlon = self.lon_rad[positions] - lon1
+        a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * self.cos_lat[positions] * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def query(self, lat: float, lon: float, radius_miles: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (positions, distances) arrays for every store within the radius, unordered."""
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        positions = self._candidates(lat, lon, radius_miles)
+        dist = self.distances(lat, lon, positions)
+        keep = dist <= radius_miles
+        return positions[keep], dist[keep]
+
+    def within(self, lat: float, lon: float, radius_miles: float) -> List[Tuple[str, float]]:
+        """Returns (store_id, distance_miles) for every indexed store within the radius."""
+        positions, dist = self.query(lat, lon, radius_miles)
+        return list(zip(self.ids[positions].tolist(), dist.tolist()))
+
+    def open_mask(self, positions: np.ndarray, clock: hours.WeekClock) -> np.ndarray:
+        """Boolean array: which of the rows at positions are open at the clock's "now"."""
+        tz_minutes = np.array([clock.minute_of_week(name) for name in self.tz_names], dtype=np.int64)
+        now = tz_minutes[self.tz_ids[positions]][:, None]
+
+        schedule = self.schedule_ids[positions]
+        starts, ends = self.open_starts[schedule], self.open_ends[schedule]
+        return ((starts <= now) & (now <= ends)).any(axis=1)
+
+    def type_mask(self, positions: np.ndarray, store_type: str) -> np.ndarray:
+        """Boolean array: which of the rows at positions have this store_type (case-insensitive)."""
+        type_id = self.type_lookup.get(store_type.strip().lower())
+        if type_id is None:
+            return np.zeros(len(positions), dtype=bool)
+        return self.type_ids[positions] == type_id
+
+    def services_mask(self, positions: np.ndarray, services: Iterable[str]) -> np.ndarray:
+        """Boolean array: which of the rows at positions have ALL of the services (case-insensitive)."""
+        names = {name.strip().lower() for name in services if name and name.strip()}
+        if not names:
+            return np.ones(len(positions), dtype=bool)
+        if not names <= self.service_bits.keys():
+            return np.zeros(len(positions), dtype=bool)
+        required = self._bitmask(names)
+        matching_sets = ((self.service_masks & required) == required).all(axis=1)
+        return matching_sets[self.service_set_ids[positions]]
+
+    def _bitmask(self, names) -> np.ndarray:
+        value = 0
+        for name in names:
+            value |= 1 << self.service_bits[name]
+        return np.array([(value >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(self.service_words)], dtype=np.uint64)
+
+
+def _intern(values):
+    """Distinct values plus an int array mapping each row to its value."""
+    distinct, ids = {}, []
+    for v in values:
+        ids.append(distinct.setdefault(v, len(distinct)))
+    return list(distinct), np.asarray(ids, dtype=np.int64)
+
+
+def nearest(ids: np.ndarray, dist: np.ndarray, k: int) -> List[int]:
+    """
+    Positions of the k nearest entries ordered by (distance, store_id).
+    np.argpartition picks them in O(n); only those k are sorted.
+    """
+    n = len(dist)
+    if k <= 0 or n == 0:
+        return []
+    if k < n:
+        kth = dist[np.argpartition(dist, k - 1)[k - 1]]
+        # Keep every tie at the boundary so the store_id tie-break stays deterministic
+        positions = np.nonzero(dist <= kth)[0]
+    else:
+        positions = np.arange(n)
+
+    ordered = sorted(positions.tolist(), key=lambda i: (dist[i], ids[i]))
+    return ordered[:k]
+
+
+# --- 2. SHARED INSTANCE ---
+_index: Optional[SpatialIndex] = None
+_lock = threading.Lock()
+
+
+def _is_fresh(index: Optional[SpatialIndex], bind) -> bool:
+    if index is None or index.bind is not bind:
+        return False
+    if index.version != store_events.current_version():
+        return False
+    # Writes made by other worker processes are picked up on expiry
+    return time.time() - index.built_at < settings.SPATIAL_INDEX_MAX_AGE_SECONDS
+
+
+def build_index(db: Session) -> SpatialIndex:
+    version = store_events.current_version()
+    columns = [getattr(models.Store, col) for col in hours.DAY_COLUMNS]
+    rows = db.query(
+        models.Store.store_id, models.Store.latitude, models.Store.longitude, models.Store.address_state,
+        models.Store.store_type, *columns
+    ).filter(models.Store.latitude.isnot(None), models.Store.longitude.isnot(None)).all()
+
+    # One row per store with its service ids joined ("3,7,12"). Stores share few distinct
+    # combinations, so each joined string is turned into a set of names once.
+    names = {str(k): v for k, v in db.execute(select(models.Service.id, models.Service.name))}
+    link = models.store_services.c
+    service_rows = db.execute(
+        select(link.store_id, func.aggregate_strings(cast(link.service_id, String), ",")).group_by(link.store_id)
+    ).all()
+    sets = {}
+    services = {}
+    for store_id, joined in service_rows:
+        found = sets.get(joined)
+        if found is None:
+            found = sets[joined] = frozenset(names[i] for i in joined.split(","))
+        services[store_id] = found
+
+    index = SpatialIndex(
+        [r[0] for r in rows],
+        [r[1] for r in rows],
+        [r[2] for r in rows],
+        settings.SPATIAL_INDEX_CELL_DEGREES,
+        schedules=[hours.compile_week(tuple(r[5:])) for r in rows],
+        timezones=[hours.STATE_TIMEZONES.get(r[3], 'UTC') for r in rows],
+        store_types=[r[4] for r in rows],
+        services=[services.get(r[0], frozenset()) for r in rows],
+    )
+    index.version = version
+    index.bind = db.get_bind()
+    index.built_at = time.time()
+    return index
+
+
+def get_index(db: Session) -> SpatialIndex:
+    """Returns the shared index, rebuilding it if the stores table changed since it was built."""
+    global _index
+    bind = db.get_bind()
+    if _is_fresh(_index, bind):
+        return _index
+
+    with _lock:
+        if not _is_fresh(_index, bind):
+            _index = build_index(db)
+        return _index
+
+
+# AsyncSession.run_sync runs the build on the event loop thread, where waiting on
+# _lock while another request's build is suspended mid-query would deadlock
+_async_locks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+
+async def get_index_async(db) -> SpatialIndex:
+    """get_index for an AsyncSession: concurrent requests wait on an asyncio lock instead."""
+    global _index
+    bind = db.get_bind()
+    if _is_fresh(_index, bind):
+        return _index
+
+    lock = _async_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        if not _is_fresh(_index, bind):
+            _index = await db.run_sync(build_index)
+        return _index
+
+
+def reset_index():
+    global _index
+    with _lock:
+        _index = None
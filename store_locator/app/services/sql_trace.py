@@ -0,0 +1,208 @@
+"""
+SQL statement instrumentation through SQLAlchemy's cursor_execute events, on every engine.
+
+Each statement is timed. Per-request totals go to whatever SQLStats are tracked in the
+current context (SQLStatsMiddleware tracks one per request; a request profile tracks its
+own). Statements slower than SLOW_QUERY_MS are written to the "app.slow_query" logger as
+one JSON object per line, with normalized SQL (literals and IN lists collapsed) and the
+shape of the bind parameters, never their values.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.services.metrics import Counter, Histogram, registry
+
+slow_query_log = logging.getLogger("app.slow_query")
+
+SQL_DURATION = registry.register(Histogram(
+    "sql_statement_duration_seconds", "Duration of each SQL statement (cursor execute)."
+))
+SQL_SLOW = registry.register(Counter("sql_slow_queries_total", "Statements slower than SLOW_QUERY_MS."))
+REQUEST_SQL = registry.register(Histogram(
+    "http_request_sql_statements", "SQL statements executed per request, by route template.", ("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+))
+
+
+# --- 1. PER-REQUEST STATS ---
+class SQLStats:
+    """Statement count and time; with keep > 0, also the first keep statements and their timings."""
+
+    def __init__(self, keep: int = 0):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+        self.keep = keep
+        self.statements = []
+
+    def record(self, statement: str, seconds: float, executemany: bool, slow: bool):
+        self.count += 1
+        self.seconds += seconds
+        self.slow += slow
+        if len(self.statements) < self.keep:
+            self.statements.append({
+                "statement": statement,
+                "duration_ms": round(seconds * 1000, 3),
+                "executemany": executemany,
+            })
+
+
+_trackers: ContextVar[tuple] = ContextVar("sql_trackers", default=())
+
+
+@contextmanager
+def track(stats: SQLStats):
+    """Records statements run in this context (and threadpool / run_sync code it calls) into stats."""
+    token = _trackers.set(_trackers.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _trackers.reset(token)
+
+
+# --- 2. EVENT LISTENERS ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    SQL_DURATION.observe(seconds)
+
+    slow = 0 < settings.SLOW_QUERY_MS <= seconds * 1000
+    if slow:
+        SQL_SLOW.inc()
+        log_slow_query(statement, parameters, seconds, executemany, cursor)
+    for stats in _trackers.get():
+        stats.record(statement, seconds, executemany, slow)
+
+
+# --- 3. SLOW-QUERY LOG ---
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_REPEATED_LIST = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    One line per statement shape: literals become ?, and placeholder lists (IN lists,
+    VALUES rows) become (...), so statements that differ only in values compare equal.
+    """
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(...)", sql)
+    return _REPEATED_LIST.sub("(...), ...", sql)
+
+
+def bind_shape(parameters, executemany: bool = False):
+    """
+    Types of the bound values without the values themselves: ["str*500"] for an IN list of
+    500 strings, {"email": "str"} for named parameters, plus a row count for executemany.
+    """
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "params": bind_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _type_name(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        shape = []
+        for value in parameters:
+            name = _type_name(value)
+            if shape and shape[-1][0] == name:
+                shape[-1][1] += 1
+            else:
+                shape.append([name, 1])
+        return [name if n == 1 else f"{name}*{n}" for name, n in shape]
+    return None
+
+
+def _type_name(value) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _caller() -> Optional[str]:
+    # The innermost frame in app code, other than this module
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_APP_DIR) and path != __file__:
+            return f"{os.path.relpath(path, os.path.dirname(_APP_DIR))}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def log_slow_query(statement: str, parameters, seconds: float, executemany: bool, cursor=None):
+    slow_query_log.warning(json.dumps({
+        "event": "slow_query",
+        "duration_ms": round(seconds * 1000, 3),
+        "threshold_ms": settings.SLOW_QUERY_MS,
+        "sql": normalize_sql(statement),
+        "binds": bind_shape(parameters, executemany),
+        "executemany": executemany,
+        "rowcount": getattr(cursor, "rowcount", None),
+        "caller": _caller(),
+        "request": _request.get(),
+    }))
+
+
+# --- 4. REQUEST MIDDLEWARE ---
+_request: ContextVar[Optional[str]] = ContextVar("sql_request", default=None)  # "METHOD /path" for the log
+
+
+class SQLStatsMiddleware:
+    """
+    Counts each request's statements into http_request_sql_statements and, with
+    SQL_DEBUG_HEADERS, reports them as X-SQL-Statements / X-SQL-Time-Ms response headers
+    (statements run before the response starts, i.e. everything but background tasks).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = SQLStats()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-sql-statements", str(stats.count).encode()),
+                    (b"x-sql-time-ms", f"{stats.seconds * 1000:.3f}".encode()),
+                ]
+            await send(message)
+
+        token = _request.set(f"{scope['method']} {scope['path']}")
+        try:
+            with track(stats):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _request.reset(token)
+            route = scope.get("route")
+            REQUEST_SQL.observe(stats.count, getattr(route, "path", None) or "unmatched")
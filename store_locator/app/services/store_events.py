@@ -0,0 +1,49 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import models
+
+# --- STORE DATA VERSION ---
+# Bumped after every commit that touched a Store, so in-memory structures
+# built from the stores table (spatial index, caches) know when to rebuild.
+_version = 0
+_lock = threading.Lock()
+
+
+def current_version() -> int:
+    return _version
+
+
+def bump_version():
+    """Call after writes that bypass the ORM (bulk SQL) so readers pick them up."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+@event.listens_for(Session, "before_flush")
+def _clear_import_hash(session, flush_context, instances):
+    # An edit made outside the CSV import means the stored row no longer matches
+    # the last imported one, so the next import must not skip it
+    for obj in session.dirty:
+        if isinstance(obj, models.Store) and session.is_modified(obj):
+            obj.content_hash = None
+
+
+@event.listens_for(Session, "after_flush")
+def _track_store_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.Store):
+            session.info["stores_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop("stores_changed", False):
+        bump_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session):
+    session.info.pop("stores_changed", None)
@@ -1,8 +1,9 @@
-from datetime import datetime
-import pytz
+from typing import Optional
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from . import models
+from .services.hours import WeekClock, is_open, store_schedule
+from .services.service_registry import service_registry
 
 # --- PASSWORD HASHING SETUP ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -17,57 +18,24 @@ def get_password_hash(password):
 
 
 # --- TIMEZONE / OPEN CHECKER ---
-def check_is_open(store_obj) -> bool:
+def check_is_open(store_obj, clock: Optional[WeekClock] = None) -> bool:
     """
     Checks if the store is open RIGHT NOW based on the Store's Local Time.
+    Uses the Store's timezone column (search uses the state's timezone instead).
     """
-    # 1. Determine the Store's Timezone
     tz_name = getattr(store_obj, 'timezone', 'UTC')
-    if not tz_name:
+    if not tz_name or not isinstance(tz_name, str):
         tz_name = 'UTC'
 
-    try:
-        store_tz = pytz.timezone(tz_name)
-    except pytz.UnknownTimeZoneError:
-        store_tz = pytz.UTC
-
-    # 2. Get the current time inside THAT timezone
-    store_now = datetime.now(store_tz)
-
-    current_time = store_now.time()
-    weekday = store_now.weekday()  # 0=Monday, 6=Sunday
-
-    # 3. Map day to column
-    day_map = {
-        0: 'hours_mon', 1: 'hours_tue', 2: 'hours_wed',
-        3: 'hours_thu', 4: 'hours_fri', 5: 'hours_sat', 6: 'hours_sun'
-    }
-
-    # 4. Fetch hours string
-    hours_str = getattr(store_obj, day_map[weekday], None)
-
-    if not hours_str or hours_str.lower() == "closed":
-        return False
-
-    try:
-        start_str, end_str = hours_str.split('-')
-        start_time = datetime.strptime(start_str.strip(), "%H:%M").time()
-        end_time = datetime.strptime(end_str.strip(), "%H:%M").time()
-
-        # 5. Check range
-        if start_time <= current_time <= end_time:
-            return True
-
-    except ValueError:
-        return False
-
-    return False
+    clock = clock or WeekClock()
+    return is_open(store_schedule(store_obj), clock.minute_of_week(tz_name))
 
 
 def process_services(db: Session, services_input):
     """
     Parses "wifi|coffee" string OR ["wifi", "coffee"] list
-    Returns list of Service DB Objects
+    Returns list of Service DB Objects. New services are added to the caller's
+    transaction (no commit here); ids come from the cached service registry.
     """
     if not services_input:
         return []
@@ -80,19 +48,11 @@ def process_services(db: Session, services_input):
     elif isinstance(services_input, list):
         service_names = services_input
 
-    # 2. Find or Create Services
-    service_objs = []
-    for name in service_names:
-        name = name.strip().lower()  # Normalize text
-        if not name: continue
-
-        # Check if exists
-        service = db.query(models.Service).filter(models.Service.name == name).first()
-        if not service:
-            service = models.Service(name=name)
-            db.add(service)
-            db.commit()
-            db.refresh(service)
-        service_objs.append(service)
+    # 2. Find or Create Services (one IN query at most, one INSERT for new names)
+    ids = service_registry.resolve(db, service_names)
+    if not ids:
+        return []
 
-    return service_objs
\ No newline at end of file
+    services = db.query(models.Service).filter(models.Service.id.in_(list(ids.values()))).all()
+    by_id = {service.id: service for service in services}
+    return [by_id[i] for i in ids.values() if i in by_id]
@@ -0,0 +1,185 @@
+"""
+Sync vs async request path: p50/p99 latency and throughput at increasing concurrency.
+
+Each mode runs as its own uvicorn process on the same seeded SQLite file:
+    sync   app.main:app        (def endpoints on Starlette's threadpool)
+    async  app.async_main:app  (AsyncSession on aiosqlite)
+Searches geocode through a local stub that sleeps --geocoder-latency-ms per lookup
+(every request uses a new address, and the search cache is disabled, so each one
+reaches the geocoder and the database). The login scenario measures bcrypt.
+
+Usage:
+    python -m benchmarks.bench_async [--concurrency 10 100 500] [--requests 2000]
+                                     [--scenario search login] [--stores 5000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app import models  # noqa: E402
+from app.auth_utils import get_password_hash  # noqa: E402
+from app.services import importer  # noqa: E402
+from benchmarks.bench_import import write_csv  # noqa: E402
+
+MODES = {"sync": "app.main:app", "async": "app.async_main:app"}
+ADMIN_EMAIL, ADMIN_PASSWORD = "bench@example.com", "bench1234"
+
+
+# --- 1. FIXTURES ---
+def seed(db_url: str, stores: int, tmp: str):
+    engine = create_engine(db_url)
+    models.Base.metadata.create_all(engine)
+    csv_path = os.path.join(tmp, "stores.csv")
+    write_csv(csv_path, stores)
+    with sessionmaker(bind=engine)() as db, open(csv_path, encoding="utf-8") as f:
+        importer.import_stores(db, f)
+        role = models.Role(name="admin")
+        db.add(role)
+        db.flush()
+        db.add(models.User(email=ADMIN_EMAIL, password_hash=get_password_hash(ADMIN_PASSWORD), role_id=role.id))
+        db.commit()
+    engine.dispose()
+
+
+def start_stub_geocoder(latency: float, resolve=None) -> ThreadingHTTPServer:
+    """
+    Nominatim-shaped /search answering every query with a point in the seeded area,
+    or with resolve(q) -> (lat, lon) when given.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            lat, lon = resolve(parse_qs(urlparse(self.path).query).get("q", [""])[0]) if resolve else (40.0, -90.0)
+            body = json.dumps([{"lat": str(lat), "lon": str(lon)}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict, args=()) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning", *args],
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{app} did not start")
+
+
+# --- 2. LOAD ---
+def request_for(scenario: str, i: int):
+    if scenario == "login":
+        return "/api/auth/login", {"email": ADMIN_EMAIL, "role": ADMIN_PASSWORD}
+    return "/api/stores/search", {"address": f"{i} Bench St", "filters": {"radius_miles": 100}}
+
+
+async def load(base_url: str, scenario: str, concurrency: int, requests: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                path, body = request_for(scenario, i)
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body)
+                    if response.status_code != 200 or "error" in response.json():
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "rps": len(latencies) / elapsed,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--scenario", nargs="+", choices=["search", "login"], default=["search"])
+    parser.add_argument("--stores", type=int, default=5000)
+    parser.add_argument("--geocoder-latency-ms", type=float, default=50)
+    args = parser.parse_args(argv)
+
+    geocoder = start_stub_geocoder(args.geocoder_latency_ms / 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(db_url, args.stores, tmp)
+        env = {
+            "DATABASE_URL": db_url,
+            "GEOCODER_URL": f"http://127.0.0.1:{geocoder.server_address[1]}/search",
+            "GEOCODER_MAX_CONCURRENCY": "1000",
+            "SEARCH_CACHE_MAX_ENTRIES": "0",
+            "RATELIMIT_ENABLED": "false",
+        }
+
+        print(f"{'scenario':>8} {'mode':>6} {'conc':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'errors':>7}")
+        for mode, app in MODES.items():
+            port = free_port()
+            server = start_server(app, port, env)
+            try:
+                for scenario in args.scenario:
+                    for concurrency in args.concurrency:
+                        # login is ~100x slower per request (bcrypt); keep its runs short
+                        requests = args.requests if scenario == "search" else max(concurrency, args.requests // 20)
+                        r = asyncio.run(load(f"http://127.0.0.1:{port}", scenario, concurrency, requests))
+                        print(f"{scenario:>8} {mode:>6} {concurrency:>6} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                              f"{r['rps']:>8.0f} {r['errors']:>7}")
+            finally:
+                server.terminate()
+                server.wait()
+    geocoder.shutdown()
+
+
+if __name__ == "__main__":
+    main()
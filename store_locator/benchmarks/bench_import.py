@@ -0,0 +1,85 @@
+"""
+Import throughput: rows/sec for synthetic CSV files of increasing size.
+
+Each size is written to a temp CSV and imported into a fresh SQLite file
+through app.services.importer (half the rows are then re-imported as updates).
+
+Usage:
+    python -m benchmarks.bench_import [--rows 1000 100000 1000000] [--chunk-size 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app import models  # noqa: E402
+from app.services import importer  # noqa: E402
+
+HEADER = [
+    "store_id", "name", "store_type", "status", "latitude", "longitude", "address_street", "address_city",
+    "address_state", "address_postal_code", "address_country", "phone", "services",
+    "hours_mon", "hours_tue", "hours_wed", "hours_thu", "hours_fri", "hours_sat", "hours_sun",
+]
+SERVICES = ["wifi", "parking", "atm", "pharmacy", "drive-thru", "pickup", "restroom", "gas"]
+STATES = ["MA", "NY", "CA", "TX", "IL", "WA", "FL", "CO"]
+
+
+def write_csv(path: str, rows: int, seed: int = 1, start: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(HEADER) + "\n")
+        for i in range(start, start + rows):
+            services = "|".join(rng.sample(SERVICES, rng.randint(0, 3)))
+            f.write(
+                f"S{i:07d},Store {i},{rng.choice(['regular', 'flagship', 'outlet'])},active,"
+                f"{rng.uniform(25, 49):.6f},{rng.uniform(-124, -67):.6f},{i} Main St,Town {i % 500},"
+                f"{rng.choice(STATES)},{rng.randint(1000, 99999):05d},USA,555-{i % 10000:04d},{services},"
+                "08:00-20:00,08:00-20:00,08:00-20:00,08:00-20:00,08:00-22:00,10:00-18:00,closed\n"
+            )
+
+
+def run(path: str, db_url: str, chunk_size: int) -> dict:
+    engine = create_engine(db_url)
+    session = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        with open(path, encoding="utf-8") as f:
+            stats = importer.import_stores(session, f, chunk_size=chunk_size)
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'phase':>8} {'seconds':>9} {'rows/sec':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            models.Base.metadata.create_all(create_engine(db_url))
+
+            csv_path = os.path.join(tmp, "stores.csv")
+            write_csv(csv_path, rows)
+            created = run(csv_path, db_url, args.chunk_size)
+
+            # Second pass: half the file again (updates) plus as many new rows
+            write_csv(csv_path, rows, seed=2, start=rows // 2)
+            mixed = run(csv_path, db_url, args.chunk_size)
+
+        for phase, stats in (("insert", created), ("upsert", mixed)):
+            print(f"{rows:>10} {phase:>8} {stats['seconds']:>9.2f} {rows / stats['seconds']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+search_stores_logic on generated datasets (see benchmarks/conftest.py for sizes), for
+both backends. Every scenario runs against the same pre-built spatial index, so index
+builds are measured separately.
+
+Usage:
+    python -m pytest benchmarks/bench_search.py --benchmark-json=bench_search.json
+    BENCH_STORES=10000,100000,1000000 python -m pytest benchmarks/bench_search.py --benchmark-autosave
+    python -m pytest benchmarks/bench_search.py --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+import pytest
+from app.services import spatial_index
+from app.services.search import search_stores_logic
+
+BOSTON = (42.3601, -71.0589)
+CHICAGO = (41.8781, -87.6298)
+NEW_YORK = (40.7128, -74.0060)
+LOS_ANGELES = (34.0522, -118.2437)
+DALLAS = (32.7767, -96.7970)
+
+# name -> (center, search_stores_logic keyword arguments)
+SCENARIOS = {
+    "narrow_radius": (BOSTON, {"radius_miles": 5}),
+    "wide_radius": (CHICAGO, {"radius_miles": 100}),
+    "services_and": (NEW_YORK, {"radius_miles": 25, "services": ["wifi", "pharmacy"]}),
+    "open_now": (LOS_ANGELES, {"radius_miles": 25, "open_now": True}),
+    "deep_page": (DALLAS, {"radius_miles": 100, "page": 20, "limit": 20}),
+}
+BACKENDS = ["index", "sql"]
+
+
+def run_search(db, dataset, backend, center, cursor=None, **kwargs):
+    lat, lon = center
+    options = {"store_type": None, "services": None, "page": 1, "limit": 10, **kwargs}
+    return search_stores_logic(
+        db, lat, lon, options.pop("radius_miles"), options.pop("store_type"), options.pop("services"),
+        options.pop("page"), options.pop("limit"), backend=backend, index=dataset.index, cursor=cursor, **options
+    )
+
+
+def require_page(db, dataset, center, kwargs):
+    """Skips a page the dataset can't reach (e.g. page 20 of 20 with few stores near the center)."""
+    page, limit = kwargs.get("page", 1), kwargs.get("limit", 10)
+    total = run_search(db, dataset, "sql", center, **{**kwargs, "page": 1})["total"]
+    if total <= (page - 1) * limit:
+        pytest.skip(f"page {page} needs more than {(page - 1) * limit} stores in range, "
+                    f"the {dataset.count}-store dataset has {total}")
+
+
+def describe(benchmark, dataset, scenario, backend):
+    # Grouped per scenario and size, so both backends show up side by side
+    benchmark.group = f"{scenario} ({dataset.count} stores)"
+    benchmark.extra_info.update({"stores": dataset.count, "backend": backend})
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+def test_search(benchmark, db, dataset, scenario, backend):
+    center, kwargs = SCENARIOS[scenario]
+    require_page(db, dataset, center, kwargs)
+    describe(benchmark, dataset, scenario, backend)
+    result = benchmark(run_search, db, dataset, backend, center, **kwargs)
+
+    assert result["results"]
+    benchmark.extra_info["total"] = result["total"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_deep_page_cursor(benchmark, db, dataset, backend):
+    # The same page as deep_page, reached through the previous page's next_cursor
+    center, kwargs = SCENARIOS["deep_page"]
+    require_page(db, dataset, center, kwargs)
+    previous = run_search(db, dataset, backend, center, **{**kwargs, "page": kwargs["page"] - 1})
+    assert previous["next_cursor"]
+
+    describe(benchmark, dataset, "deep_page", f"{backend}+cursor")
+    result = benchmark(run_search, db, dataset, backend, center, cursor=previous["next_cursor"], **kwargs)
+    assert result["results"] == run_search(db, dataset, backend, center, **kwargs)["results"]
+    benchmark.extra_info["total"] = result["total"]
+
+
+def test_index_build(benchmark, db, dataset):
+    describe(benchmark, dataset, "index_build", "index")
+    index = benchmark.pedantic(spatial_index.build_index, args=(db,), rounds=3, iterations=1)
+    assert index.size == dataset.count
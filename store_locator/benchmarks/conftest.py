@@ -0,0 +1,70 @@
+"""
+Fixtures for the pytest-benchmark suites (bench_*.py), which are only collected when
+named explicitly: python -m pytest benchmarks/bench_search.py
+
+BENCH_STORES   comma-separated dataset sizes (default "10000,100000"; add 1000000 for the 1M run)
+BENCH_SEED     generator seed (default 1)
+BENCH_DATA_DIR where generated SQLite datasets are kept between runs (default benchmarks/.data)
+"""
+import os
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+import pytest  # noqa: E402
+import pytz  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.services import hours, search, spatial_index  # noqa: E402
+from benchmarks import generator  # noqa: E402
+
+SIZES = [int(n) for n in os.environ.get("BENCH_STORES", "10000,100000").split(",") if n.strip()]
+SEED = int(os.environ.get("BENCH_SEED", "1"))
+DATA_DIR = os.environ.get("BENCH_DATA_DIR", os.path.join(os.path.dirname(__file__), ".data"))
+
+# A Wednesday, 14:00 in New York: open_now results do not depend on when the suite runs
+FROZEN_NOW = datetime(2024, 5, 15, 18, 0, tzinfo=pytz.UTC)
+
+
+def dataset_path(count: int) -> str:
+    """SQLite file holding count generated stores, built on first use and then reused."""
+    path = os.path.join(DATA_DIR, f"stores_{count}_s{SEED}_v{generator.VERSION}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        partial = path + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        generator.load_database(f"sqlite:///{partial}", count, SEED)
+        os.replace(partial, path)
+    return path
+
+
+class Dataset:
+    def __init__(self, count: int):
+        self.count = count
+        self.engine = create_engine(f"sqlite:///{dataset_path(count)}")
+        self.Session = sessionmaker(bind=self.engine, autoflush=False)
+        with self.Session() as db:
+            self.index = spatial_index.build_index(db)
+
+
+@pytest.fixture(scope="session", params=SIZES, ids=lambda n: f"{n}")
+def dataset(request):
+    data = Dataset(request.param)
+    yield data
+    data.engine.dispose()
+
+
+@pytest.fixture
+def db(dataset):
+    with dataset.Session() as session:
+        yield session
+
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    monkeypatch.setattr(search, "WeekClock", lambda now=None: hours.WeekClock(now or FROZEN_NOW))
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    output_json["dataset"] = {"sizes": SIZES, "seed": SEED, "generator_version": generator.VERSION}
@@ -0,0 +1,152 @@
+"""
+Synthetic store datasets for benchmarks: stores clustered around US metros, with
+random services, store types and opening hours. Output is deterministic per seed.
+
+Usage:
+    python -m benchmarks.generator --stores 100000 --csv stores_100k.csv
+    python -m benchmarks.generator --stores 1000000 --db sqlite:///./stores_1m.db
+"""
+import argparse
+import csv
+import math
+import os
+import random
+import time
+from typing import Dict, Iterator
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app import models  # noqa: E402
+from app.services import importer  # noqa: E402
+from benchmarks.bench_import import HEADER  # noqa: E402
+
+# Bump when the generated data changes, so cached datasets are rebuilt
+VERSION = 1
+
+# --- 1. DISTRIBUTIONS ---
+# (city, state, lat, lon, metro population in millions); stores are spread around each
+# center in proportion to its population, with a radius that grows with it
+METROS = [
+    ("New York", "NY", 40.7128, -74.0060, 19.8), ("Los Angeles", "CA", 34.0522, -118.2437, 13.0),
+    ("Chicago", "IL", 41.8781, -87.6298, 9.4), ("Dallas", "TX", 32.7767, -96.7970, 7.6),
+    ("Houston", "TX", 29.7604, -95.3698, 7.1), ("Washington", "VA", 38.9072, -77.0369, 6.3),
+    ("Philadelphia", "PA", 39.9526, -75.1652, 6.2), ("Miami", "FL", 25.7617, -80.1918, 6.1),
+    ("Atlanta", "GA", 33.7490, -84.3880, 6.1), ("Boston", "MA", 42.3601, -71.0589, 4.9),
+    ("Phoenix", "AZ", 33.4484, -112.0740, 4.9), ("San Francisco", "CA", 37.7749, -122.4194, 4.7),
+    ("Detroit", "MI", 42.3314, -83.0458, 4.4), ("Seattle", "WA", 47.6062, -122.3321, 4.0),
+    ("Minneapolis", "MN", 44.9778, -93.2650, 3.7), ("San Diego", "CA", 32.7157, -117.1611, 3.3),
+    ("Tampa", "FL", 27.9506, -82.4572, 3.2), ("Denver", "CO", 39.7392, -104.9903, 3.0),
+    ("St. Louis", "MO", 38.6270, -90.1994, 2.8), ("Baltimore", "MD", 39.2904, -76.6122, 2.8),
+    ("Charlotte", "NC", 35.2271, -80.8431, 2.7), ("Orlando", "FL", 28.5383, -81.3792, 2.7),
+    ("San Antonio", "TX", 29.4241, -98.4936, 2.6), ("Portland", "OR", 45.5152, -122.6784, 2.5),
+    ("Austin", "TX", 30.2672, -97.7431, 2.4), ("Las Vegas", "NV", 36.1699, -115.1398, 2.3),
+    ("Kansas City", "MO", 39.0997, -94.5786, 2.2), ("Columbus", "OH", 39.9612, -82.9988, 2.1),
+    ("Indianapolis", "IN", 39.7684, -86.1581, 2.1), ("Nashville", "TN", 36.1627, -86.7816, 2.0),
+    ("Salt Lake City", "UT", 40.7608, -111.8910, 1.3),
+]
+RURAL_SHARE = 0.05  # spread uniformly over the contiguous US
+CONUS = (25.0, 49.0, -124.0, -67.0)  # min_lat, max_lat, min_lon, max_lon
+RURAL_STATES = ["KS", "NE", "IA", "MT", "WY", "ND", "SD", "NM", "OK", "AR"]
+
+STORE_TYPES = {"regular": 70, "outlet": 15, "express": 10, "flagship": 5}
+# Independent probability of each service; "wifi" AND "pharmacy" matches ~13% of stores
+SERVICES = {
+    "wifi": 0.6, "parking": 0.5, "pickup": 0.4, "restroom": 0.35, "atm": 0.3,
+    "pharmacy": 0.22, "drive-thru": 0.2, "returns": 0.15, "optical": 0.08, "gas": 0.05,
+}
+# Mon-Fri, Sat, Sun
+HOURS = {
+    "standard": (("09:00-21:00",) * 5 + ("10:00-20:00", "11:00-18:00"), 55),
+    "extended": (("07:00-23:00",) * 7, 20),
+    "office": (("09:00-17:00",) * 5 + ("closed", "closed"), 15),
+    "24h": (("00:00-24:00",) * 7, 10),
+}
+
+
+def _weighted(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+# --- 2. GENERATOR ---
+def generate_stores(count: int, seed: int = 1) -> Iterator[dict]:
+    """count store rows (dicts keyed like the import CSV header), deterministic per seed."""
+    rng = random.Random(seed)
+    metro_weights = [m[4] for m in METROS]
+    hours = {name: week for name, (week, _) in HOURS.items()}
+    hours_weights = {name: weight for name, (_, weight) in HOURS.items()}
+
+    for i in range(count):
+        if rng.random() < RURAL_SHARE:
+            city, state = f"Town {i % 1000}", rng.choice(RURAL_STATES)
+            lat, lon = rng.uniform(CONUS[0], CONUS[1]), rng.uniform(CONUS[2], CONUS[3])
+        else:
+            city, state, center_lat, center_lon, population = rng.choices(METROS, weights=metro_weights)[0]
+            sigma_miles = 6 + 4 * math.sqrt(population)
+            lat = center_lat + rng.gauss(0, sigma_miles) / 69.0
+            lon = center_lon + rng.gauss(0, sigma_miles) / (69.0 * math.cos(math.radians(center_lat)))
+
+        week = hours[_weighted(rng, hours_weights)]
+        yield {
+            "store_id": f"B{i:07d}",
+            "name": f"{city} Store {i}",
+            "store_type": _weighted(rng, STORE_TYPES),
+            "status": "active",
+            "latitude": f"{lat:.6f}",
+            "longitude": f"{lon:.6f}",
+            "address_street": f"{rng.randint(1, 9999)} Main St",
+            "address_city": city,
+            "address_state": state,
+            "address_postal_code": f"{rng.randint(1000, 99999):05d}",
+            "address_country": "USA",
+            "phone": f"555-{rng.randint(0, 9999):04d}",
+            "services": "|".join(name for name, p in SERVICES.items() if rng.random() < p),
+            **dict(zip(importer.HOURS_COLUMNS, week)),
+        }
+
+
+# --- 3. OUTPUTS ---
+def write_csv(path: str, count: int, seed: int = 1):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=HEADER)
+        writer.writeheader()
+        writer.writerows(generate_stores(count, seed))
+
+
+def load_database(db_url: str, count: int, seed: int = 1, chunk_size: int = 5000) -> dict:
+    """Creates the schema and writes the stores through the importer (no CSV round trip)."""
+    engine = create_engine(db_url)
+    models.Base.metadata.create_all(engine)
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "errors": 0}
+    try:
+        with sessionmaker(bind=engine)() as db:
+            for rows in importer.chunked(generate_stores(count, seed), chunk_size):
+                importer.write_chunk(db, rows, stats)
+            db.commit()
+    finally:
+        engine.dispose()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--csv", help="write an import CSV to this path")
+    target.add_argument("--db", help="create and fill this database URL")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.csv:
+        write_csv(args.csv, args.stores, args.seed)
+        print(f"wrote {args.stores} stores to {args.csv}")
+    else:
+        stats = load_database(args.db, args.stores, args.seed)
+        print(f"loaded {stats['created']} stores into {args.db}")
+    print(f"{time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+End-to-end load test of the deployed app: uvicorn workers, rate limiter, auth and DB together.
+
+Boots `uvicorn app.main:app` on a seeded database (a temp SQLite file of generated
+stores, or --database-url, seeded if it has no stores), with the geocoder replaced by a
+local stub, then replays a weighted mix of search, login and admin requests at a fixed
+arrival rate. Arrivals are open-loop: latency is measured from each request's scheduled
+start, so a saturated server shows up as queueing delay instead of a lower send rate.
+Each request comes from one of --clients addresses (X-Forwarded-For, trusted from
+127.0.0.1 by uvicorn), so the per-IP rate limit applies as it would in production.
+
+Usage:
+    python -m benchmarks.loadtest --rps 200 --duration 60 --workers 2
+    python -m benchmarks.loadtest --mix search=70,login=10,admin_update=20 --json load.json
+    python -m benchmarks.loadtest --database-url postgresql://user:pw@localhost/stores --env SEARCH_BACKEND=sql
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+from collections import Counter, defaultdict
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app import models  # noqa: E402
+from app.auth_utils import get_password_hash  # noqa: E402
+from benchmarks import generator  # noqa: E402
+from benchmarks.bench_async import free_port, start_server, start_stub_geocoder  # noqa: E402
+
+ADMIN_EMAIL, ADMIN_PASSWORD = "loadtest@example.com", "loadtest1234"
+DEFAULT_MIX = "search=85,login=3,admin_get=7,admin_update=2,admin_users=3"
+
+
+# --- 1. FIXTURES ---
+def seed(db_url: str, stores: int) -> list:
+    """Loads generated stores unless the database already has some; returns a sample of store ids."""
+    engine = create_engine(db_url)
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        empty = not db.scalar(select(func.count()).select_from(models.Store))
+    if empty:
+        generator.load_database(db_url, stores)
+
+    with Session() as db:
+        if not db.scalar(select(models.User.id).where(models.User.email == ADMIN_EMAIL)):
+            role = db.scalar(select(models.Role).where(models.Role.name == "admin"))
+            if role is None:
+                role = models.Role(name="admin")
+                db.add(role)
+                db.flush()
+            db.add(models.User(email=ADMIN_EMAIL, password_hash=get_password_hash(ADMIN_PASSWORD), role_id=role.id))
+            db.commit()
+        store_ids = db.scalars(select(models.Store.store_id).order_by(func.random()).limit(1000)).all()
+    engine.dispose()
+    return store_ids
+
+
+def resolve_address(query: str):
+    """Stub geocoding: the metro named in the address, offset by up to ~10 miles per address."""
+    metro = next((m for m in generator.METROS if m[0] in query), generator.METROS[0])
+    digest = hashlib.sha256(query.encode("utf-8")).digest()
+    return metro[2] + (digest[0] - 128) / 128 / 7, metro[3] + (digest[1] - 128) / 128 / 7
+
+
+def address_pool(rng: random.Random, size: int) -> list:
+    """Distinct search addresses, drawn per metro population so caches see a realistic skew."""
+    weights = [m[4] for m in generator.METROS]
+    return [f"{rng.randint(1, 9999)} Main St, {rng.choices(generator.METROS, weights=weights)[0][0]}"
+            for _ in range(size)]
+
+
+# --- 2. TRAFFIC ---
+class Traffic:
+    """Builds requests for each endpoint name in the mix: (method, path, json body, needs admin token)."""
+
+    def __init__(self, rng: random.Random, addresses: list, store_ids: list):
+        self.rng = rng
+        self.addresses = addresses
+        self.store_ids = store_ids
+
+    def search(self):
+        rng = self.rng
+        filters = {"radius_miles": rng.choice([5, 10, 25, 50])}
+        if rng.random() < 0.2:
+            filters["services"] = rng.sample(list(generator.SERVICES)[:6], rng.randint(1, 2))
+        if rng.random() < 0.1:
+            filters["open_now"] = True
+        body = {"address": rng.choice(self.addresses), "filters": filters, "page": rng.choice([1, 1, 1, 2, 3])}
+        return "POST", "/api/stores/search", body, False
+
+    def login(self):
+        return "POST", "/api/auth/login", {"email": ADMIN_EMAIL, "role": ADMIN_PASSWORD}, False
+
+    def admin_get(self):
+        return "GET", f"/api/admin/stores/{self.rng.choice(self.store_ids)}", None, True
+
+    def admin_update(self):
+        body = {"phone": f"555-{self.rng.randint(0, 9999):04d}"}
+        return "PATCH", f"/api/admin/stores/{self.rng.choice(self.store_ids)}", body, True
+
+    def admin_users(self):
+        return "GET", "/api/admin/users", None, True
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Traffic, name) or name.startswith("_"):
+            raise argparse.ArgumentTypeError(f"unknown endpoint in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- 3. LOAD ---
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.dropped = 0  # not sent: the client already had --max-inflight requests open
+
+    def record(self, latency: float, status):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+
+    def summary(self, seconds: float) -> dict:
+        ordered = sorted(self.latencies)
+        sent = len(ordered)
+        ok = sum(n for status, n in self.statuses.items() if isinstance(status, int) and status < 400)
+        limited = self.statuses[429]
+        return {
+            "requests": sent,
+            "rps": round(sent / seconds, 1),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "error_rate": round((sent - ok - limited) / sent, 4) if sent else 0.0,
+            "rate_limited": limited,
+            "dropped": self.dropped,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+        }
+
+
+def percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * p / 100) - 1))]
+
+
+async def run_load(base_url: str, traffic: Traffic, mix: dict, rps: float, duration: float,
+                   max_inflight: int, clients: int, token: str) -> dict:
+    rng = traffic.rng
+    names, weights = list(mix), list(mix.values())
+    stats = defaultdict(EndpointStats)
+    inflight = 0
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def send(name, scheduled, method, path, body, admin, client_ip):
+            nonlocal inflight
+            headers = {"X-Forwarded-For": client_ip}
+            if admin:
+                headers["Authorization"] = f"Bearer {token}"
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            finally:
+                inflight -= 1
+            stats[name].record(loop.time() - scheduled, status)
+
+        loop = asyncio.get_running_loop()
+        tasks = []
+        started = loop.time()
+        for i in range(int(rps * duration)):
+            scheduled = started + i / rps
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = rng.choices(names, weights=weights)[0]
+            if inflight >= max_inflight:
+                stats[name].dropped += 1
+                continue
+            inflight += 1
+            source = rng.randrange(clients)
+            client_ip = f"10.{source // 65536 % 256}.{source // 256 % 256}.{source % 256}"
+            tasks.append(asyncio.create_task(send(name, scheduled, *getattr(traffic, name)(), client_ip)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+    report = {name: stats[name].summary(elapsed) for name in names if name in stats}
+    total = EndpointStats()
+    for s in stats.values():
+        total.latencies += s.latencies
+        total.statuses.update(s.statuses)
+        total.dropped += s.dropped
+    report["total"] = total.summary(elapsed)
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'endpoint':>13} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'429s':>6} {'dropped':>8}")
+    for name, r in report.items():
+        print(f"{name:>13} {r['requests']:>9} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['error_rate']:>7.1%} {r['rate_limited']:>6} {r['dropped']:>8}")
+
+
+def login(base_url: str) -> str:
+    response = httpx.post(f"{base_url}/api/auth/login", json={"email": ADMIN_EMAIL, "role": ADMIN_PASSWORD}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="use this database (seeded if it has no stores) instead of a temp SQLite file")
+    parser.add_argument("--stores", type=int, default=10000, help="generated stores for an empty database")
+    parser.add_argument("--rps", type=float, default=100, help="target arrival rate")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"endpoint=weight,... ({DEFAULT_MIX})")
+    parser.add_argument("--max-inflight", type=int, default=500, help="client-side cap on open requests")
+    parser.add_argument("--clients", type=int, default=1000, help="distinct client IPs (rate limiting is per IP)")
+    parser.add_argument("--addresses", type=int, default=500, help="distinct search addresses")
+    parser.add_argument("--geocoder-latency-ms", type=float, default=50)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app settings")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    geocoder = start_stub_geocoder(args.geocoder_latency_ms / 1000, resolve_address)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        store_ids = seed(db_url, args.stores)
+        env = {
+            "DATABASE_URL": db_url,
+            "GEOCODER_URL": f"http://127.0.0.1:{geocoder.server_address[1]}/search",
+            **dict(item.split("=", 1) for item in args.env),
+        }
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(args.app, port, env, ["--workers", str(args.workers)])
+        try:
+            traffic = Traffic(rng, address_pool(rng, args.addresses), store_ids)
+            token = login(base_url)
+            load = (base_url, traffic, args.mix, args.rps)
+            if args.warmup > 0:
+                asyncio.run(run_load(*load, args.warmup, args.max_inflight, args.clients, token))
+            report = asyncio.run(run_load(*load, args.duration, args.max_inflight, args.clients, token))
+        finally:
+            server.terminate()
+            server.wait()
+    geocoder.shutdown()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "app": args.app, "workers": args.workers, "target_rps": args.rps, "duration": args.duration,
+                "stores": args.stores, "mix": args.mix, "endpoints": report,
+                "env": {**env, "DATABASE_URL": make_url(db_url).render_as_string(hide_password=True)},
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
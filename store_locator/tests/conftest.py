@@ -1,13 +1,18 @@
+import os
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from sqlalchemy.pool import StaticPool
 
+# Settings are read when the app is imported; /metrics is off by default
+os.environ.setdefault("METRICS_ENABLED", "true")
+
 # Correct Absolute Imports
 from app import main
 from app import models
 from app import auth_utils
+from app.services.service_registry import service_registry
 
 # 1. Use an In-Memory SQLite Database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -63,6 +68,7 @@ def db_session():
     # Cleanup
     db.close()
     models.Base.metadata.drop_all(bind=engine)
+    service_registry.reset()  # cached ids refer to the dropped tables
 
 
 # 3. Client Fixture
@@ -74,6 +80,19 @@ def client(db_session):
         finally:
             pass
 
+    # Put back whatever override was there (test_main installs its own at import time)
+    previous = main.app.dependency_overrides.get(main.get_db)
     main.app.dependency_overrides[main.get_db] = override_get_db
     with TestClient(main.app) as c:
-        yield c
\ No newline at end of file
+        yield c
+    if previous is None:
+        main.app.dependency_overrides.pop(main.get_db, None)
+    else:
+        main.app.dependency_overrides[main.get_db] = previous
+
+
+# 4. Helpers
+def admin_headers(client):
+    """Authorization header for the seeded admin user."""
+    token = client.post("/api/auth/login", json={"email": "admin@test.com", "role": "test1234"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,148 @@
+import asyncio
+from unittest.mock import patch
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import async_main, auth_utils, models
+from app.database import async_database_url, get_async_db
+from app.services import spatial_index
+from app.services.search import reset_search_cache
+
+
+@pytest.fixture
+def async_db(tmp_path):
+    """A file database seeded like conftest's, plus an AsyncSession factory on it."""
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        role = models.Role(name="admin")
+        db.add(role)
+        db.flush()
+        db.add(models.User(email="admin@test.com", password_hash=auth_utils.get_password_hash("test1234"), role_id=role.id))
+        db.add(models.Store(store_id="TEST01", name="Test Store", store_type="regular", status="active",
+                            latitude=42.0, longitude=-71.0, address_city="Test City"))
+        db.commit()
+    engine.dispose()
+
+    # NullPool: aiosqlite connections must not outlive the event loop that opened them
+    async_engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+    factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with factory() as db:
+            yield db
+
+    async_main.app.dependency_overrides[get_async_db] = override_get_async_db
+    reset_search_cache()
+    spatial_index.reset_index()
+    yield factory
+    async_main.app.dependency_overrides.pop(get_async_db, None)
+
+
+@pytest.fixture
+def async_client(async_db):
+    with TestClient(async_main.app) as c:
+        yield c
+
+
+def login(client):
+    response = client.post("/api/auth/login", json={"email": "admin@test.com", "role": "test1234"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_async_database_url():
+    assert async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_database_url("postgresql://u:p@db:5432/stores") == "postgresql+asyncpg://u:p@db:5432/stores"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/stores")
+
+
+@patch("app.async_main.get_lat_lon_async")
+def test_async_search(mock_geo, async_client):
+    mock_geo.return_value = (42.0, -71.0)
+    response = async_client.post("/api/stores/search", json={"zip_code": "02101", "filters": {"radius_miles": 5}})
+
+    assert response.status_code == 200
+    assert [r["store_id"] for r in response.json()["results"]] == ["TEST01"]
+    assert response.json()["results"][0]["distance"] == 0.0
+
+
+@patch("app.async_main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_async_search_selects_page_off_the_loop(_, async_client):
+    loops = []
+    real_select = async_main.select_index_page
+
+    def recording_select(*args, **kwargs):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)  # a worker thread
+        return real_select(*args, **kwargs)
+
+    with patch("app.async_main.select_index_page", recording_select):
+        response = async_client.post("/api/stores/search", json={"address": "Boston", "filters": {"radius_miles": 5}})
+
+    assert [r["store_id"] for r in response.json()["results"]] == ["TEST01"]
+    assert loops == [None]
+
+
+@patch("app.async_main.get_lat_lon_async", return_value=(42.3, -71.1))
+def test_async_auth_and_admin(_, async_client):
+    headers = login(async_client)
+    assert async_client.post("/api/auth/login", json={"email": "admin@test.com", "role": "wrong"}).status_code == 400
+
+    store = {"store_id": "NEW01", "name": "New", "store_type": "regular", "address_postal_code": "02101",
+             "services": ["wifi", "ATM"]}
+    created = async_client.post("/api/admin/stores", json=store, headers=headers)
+    assert created.status_code == 201
+    assert (created.json()["latitude"], created.json()["longitude"]) == (42.3, -71.1)
+    assert sorted(created.json()["services"]) == ["atm", "wifi"]
+    assert async_client.post("/api/admin/stores", json=store, headers=headers).status_code == 400
+
+    patched = async_client.patch("/api/admin/stores/NEW01", json={"name": "Renamed", "services": ["parking"]}, headers=headers)
+    assert (patched.json()["name"], patched.json()["services"]) == ("Renamed", ["parking"])
+    assert async_client.get("/api/admin/stores/NOPE", headers=headers).status_code == 404
+
+    user = async_client.post("/api/admin/users", json={"email": "m@test.com", "password": "pw"}, headers=headers).json()
+    assert async_client.put(f"/api/admin/users/{user['id']}", json={"is_active": False}, headers=headers).json()["is_active"] is False
+    assert {u["email"] for u in async_client.get("/api/admin/users", headers=headers).json()} == {"admin@test.com", "m@test.com"}
+    assert async_client.delete(f"/api/admin/users/{user['id']}", headers=headers).status_code == 204
+
+    assert async_client.get("/api/admin/users").status_code == 401
+
+
+def test_routes_without_async_version_use_sync_handlers(async_client):
+    assert async_client.get("/").json()["status"] == "ok"
+    route = next(r for r in async_main.app.routes if getattr(r, "path", None) == "/api/admin/stores/import")
+    assert route.endpoint is async_main.main.import_stores
+
+
+def test_concurrent_searches_share_one_index_build(async_db):
+    # Every request finds the index stale; they must wait on each other without blocking the loop
+    builds = []
+    real_build = spatial_index.build_index
+
+    def counting_build(db):
+        builds.append(1)
+        return real_build(db)
+
+    async def run():
+        transport = httpx.ASGITransport(app=async_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"filters": {"radius_miles": 5}}
+            with patch("app.async_main.get_lat_lon_async", return_value=(42.0, -71.0)):
+                return await asyncio.wait_for(asyncio.gather(*[
+                    client.post("/api/stores/search", json={**body, "address": f"addr {i}"}) for i in range(10)
+                ]), timeout=10)
+
+    with patch.object(spatial_index, "build_index", counting_build):
+        responses = asyncio.run(run())
+
+    assert all(r.json()["total"] == 1 for r in responses)
+    assert len(builds) == 1
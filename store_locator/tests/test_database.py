@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+from app.database import configure_sqlite, engine_options
+from app.services.pool_metrics import PoolMetrics, instrument, instrumented
+from tests.conftest import admin_headers
+
+
+def make_engine(url, metrics, **kwargs):
+    engine = create_engine(url, poolclass=instrumented(QueuePool, metrics), **kwargs)
+    instrument(engine, metrics)
+    return engine
+
+
+def test_pool_metrics_count_checkouts_and_timeouts(tmp_path):
+    metrics = PoolMetrics()
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}", metrics, pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = metrics.stats()
+    assert (stats["checkouts"], stats["timeouts"], stats["in_use"], stats["in_use_peak"]) == (1, 1, 1, 1)
+    assert stats["wait_ms_max"] >= 50
+
+    held.close()
+    assert metrics.stats()["in_use"] == 0
+
+
+def test_pool_metrics_follow_dispose(tmp_path):
+    metrics = PoolMetrics()
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}", metrics, pool_size=1, max_overflow=1)
+    with engine.connect(), engine.connect():
+        assert metrics.stats()["overflow_peak"] == 1
+
+    engine.dispose()
+    assert metrics.pool is engine.pool
+    with engine.connect():
+        pass
+    assert (metrics.stats()["checkouts"], metrics.stats()["connects"]) == (3, 3)
+
+
+def test_sqlite_file_uses_wal(tmp_path):
+    url, options = engine_options(f"sqlite:///{tmp_path / 'wal.db'}", QueuePool, PoolMetrics())
+    engine = create_engine(url, **options)
+    configure_sqlite(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_sqlite_memory_is_shared_between_pooled_connections():
+    url, options = engine_options("sqlite:///:memory:", QueuePool, PoolMetrics())
+    engine = create_engine(url, **options)
+    configure_sqlite(engine)
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("CREATE TABLE shared_check (x INTEGER)"))
+        first.execute(text("INSERT INTO shared_check VALUES (1)"))
+        first.commit()
+        assert second.execute(text("SELECT x FROM shared_check")).scalar() == 1
+        first.execute(text("DROP TABLE shared_check"))
+        first.commit()
+
+
+def test_metrics_endpoint_is_admin_only(client):
+    assert client.get("/api/admin/metrics").status_code == 401
+    body = client.get("/api/admin/metrics", headers=admin_headers(client)).json()
+    assert set(body) == {"db_pool", "geocoder", "search_cache"}
+    assert {"in_use", "wait_ms_avg", "timeouts", "overflow"} <= set(body["db_pool"]["sync"])
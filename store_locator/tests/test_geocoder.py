@@ -0,0 +1,429 @@
+import asyncio
+import csv
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from geopy.exc import GeocoderTimedOut
+from app.config import settings
+from app import models
+from app.services import batch_geocoder, geocoder, gazetteer
+from app.services.breaker import CircuitBreaker
+from app.services.cache import LRUCache
+from app.services.gazetteer import ZipGazetteer
+from app.scripts import load_zip_gazetteer
+from tests.conftest import admin_headers
+
+
+# --- 1. Cache ---
+def test_cache_snapshot_reloaded_on_startup(tmp_path, monkeypatch):
+    path = str(tmp_path / "geocode_cache.sqlite3")
+    snapshot = LRUCache(max_entries=10, ttl_seconds=60)
+    snapshot.set(geocoder.cache_key("Boston, MA"), (42.36, -71.06))
+    snapshot.save(path)
+
+    monkeypatch.setattr(settings, "GEOCODE_CACHE_PATH", path)
+    geocoder.start_geocode_cache()
+    try:
+        with patch("app.services.geocoder.Nominatim") as nominatim:
+            assert geocoder.get_lat_lon("boston, ma ") == (42.36, -71.06)
+            nominatim.assert_not_called()
+    finally:
+        geocoder.stop_geocode_cache()
+
+
+# --- 2. ZIP Gazetteer ---
+CENSUS_SAMPLE = (
+    "GEOID\tALAND\tAWATER\tALAND_SQMI\tAWATER_SQMI\tINTPTLAT\tINTPTLONG                                 \n"
+    "02101\t1\t0\t0\t0\t42.370567\t-71.026964\n"
+    "10001\t1\t0\t0\t0\t40.750633\t-73.997177\n"
+    "00601\t1\t0\t0\t0\t18.180555\t-66.749961\n"
+)
+
+
+def write_gazetteer(tmp_path):
+    source = tmp_path / "2023_Gaz_zcta_national.txt"
+    source.write_text(CENSUS_SAMPLE)
+    output = str(tmp_path / "zip_centroids.csv")
+    assert load_zip_gazetteer.main([str(source), "--output", output]) == 0
+    return output
+
+
+def test_loader_normalizes_census_file(tmp_path):
+    table = ZipGazetteer.from_csv(write_gazetteer(tmp_path))
+
+    assert len(table) == 3
+    assert table.lookup("10001") == (40.750633, -73.997177)
+    assert table.lookup("00601-1234") == (18.180555, -66.749961)
+    assert table.lookup("99999") is None
+    assert table.lookup("Boston, MA") is None
+
+
+def test_loader_accepts_generic_csv(tmp_path):
+    source = tmp_path / "zips.csv"
+    source.write_text("Zip;City;Latitude;Longitude\n2101;Boston;42.37;-71.03\n")
+    output = str(tmp_path / "out.csv")
+
+    assert load_zip_gazetteer.main([str(source), "--output", output]) == 0
+    assert ZipGazetteer.from_csv(output).lookup("02101") == (42.37, -71.03)
+
+
+def test_zip_search_skips_nominatim(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_GAZETTEER_PATH", write_gazetteer(tmp_path))
+    try:
+        with patch("app.services.geocoder.Nominatim") as nominatim:
+            assert geocoder.get_lat_lon("02101") == (42.370567, -71.026964)
+            nominatim.assert_not_called()
+    finally:
+        monkeypatch.undo()
+        gazetteer.load_gazetteer()
+
+
+# --- 3. Request Coalescing ---
+class SlowNominatim:
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def geocode(self, query, timeout=None):
+        SlowNominatim.calls += 1
+        time.sleep(0.2)
+        return SimpleNamespace(latitude=41.88, longitude=-87.63)
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    SlowNominatim.calls = 0
+    before = geocoder.geocode_stats()["coalesced"]
+    results = []
+
+    with patch("app.services.geocoder.Nominatim", SlowNominatim):
+        threads = [
+            threading.Thread(target=lambda: results.append(geocoder.get_lat_lon("233 S Wacker Dr, Chicago")))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert SlowNominatim.calls == 1
+    assert results == [(41.88, -87.63)] * 8
+    assert geocoder.geocode_stats()["coalesced"] - before == 7
+
+
+# --- 4. Negative Cache + Circuit Breaker ---
+class FakeNominatim:
+    """Local stand-in for the upstream geocoder: answers from `results`, raises for "down"."""
+    calls = 0
+    results = {}
+    down = False
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def geocode(self, query, timeout=None):
+        FakeNominatim.calls += 1
+        if FakeNominatim.down:
+            raise GeocoderTimedOut("fake timeout")
+        coords = FakeNominatim.results.get(query)
+        return SimpleNamespace(latitude=coords[0], longitude=coords[1]) if coords else None
+
+
+@pytest.fixture
+def fake_geocoder(monkeypatch):
+    FakeNominatim.calls, FakeNominatim.results, FakeNominatim.down = 0, {}, False
+    monkeypatch.setattr(geocoder, "Nominatim", FakeNominatim)
+    monkeypatch.setattr(geocoder, "_breaker", CircuitBreaker(failure_threshold=3, cooldown_seconds=60))
+    geocoder._geocode_cache.clear()
+    yield FakeNominatim
+    geocoder._geocode_cache.clear()
+
+
+def test_misses_are_cached(fake_geocoder):
+    assert geocoder.get_lat_lon("1 Nowhere Lane") == (None, None)
+    assert geocoder.get_lat_lon("1 nowhere lane") == (None, None)
+    assert fake_geocoder.calls == 1
+
+
+def test_errors_are_cached_briefly(fake_geocoder):
+    fake_geocoder.down = True
+    assert geocoder.get_lat_lon("Boston, MA") == (None, None)
+    assert geocoder.get_lat_lon("Boston, MA") == (None, None)
+    assert fake_geocoder.calls == 1
+
+    assert geocoder._geocode_cache._data[geocoder.cache_key("Boston, MA")][1] - time.time() <= 30
+
+    # Once the error entry expires the address is retried
+    geocoder._geocode_cache.clear()
+    fake_geocoder.down = False
+    fake_geocoder.results["Boston, MA, USA"] = (42.36, -71.06)
+    assert geocoder.get_lat_lon("Boston, MA") == (42.36, -71.06)
+
+
+def test_breaker_fails_fast_then_recovers(fake_geocoder):
+    fake_geocoder.down = True
+    for i in range(3):
+        geocoder.get_lat_lon(f"{i} Main St")
+    assert geocoder.geocode_stats()["breaker"]["state"] == "open"
+
+    # Open: no upstream call at all
+    assert geocoder.get_lat_lon("99 Main St") == (None, None)
+    assert fake_geocoder.calls == 3
+    assert geocoder.geocode_stats()["breaker"]["rejected"] == 1
+
+    # After the cooldown one trial call goes through and closes the circuit
+    geocoder._breaker._opened_at -= 60
+    assert geocoder._breaker.state == "half_open"
+    fake_geocoder.down = False
+    fake_geocoder.results["100 Main St, USA"] = (40.0, -75.0)
+    assert geocoder.get_lat_lon("100 Main St") == (40.0, -75.0)
+    assert geocoder.geocode_stats()["breaker"]["state"] == "closed"
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    breaker._opened_at -= 60
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe while half-open
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats()["trips"] == 2
+
+
+# --- 5. Async Geocoder ---
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """Nominatim-style /search stub: answers every query with `matches` (HTTP `status`) after `delay` seconds."""
+    delay = 0.0
+    status = 200
+    matches = [{"lat": "41.88", "lon": "-87.63"}]
+    in_flight = 0
+    max_in_flight = 0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = StubGeocoderHandler
+        with cls.lock:
+            cls.requests += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(cls.delay)
+            body = json.dumps(cls.matches).encode()
+            self.send_response(cls.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_geocoder(monkeypatch):
+    cls = StubGeocoderHandler
+    cls.delay, cls.in_flight, cls.max_in_flight, cls.requests = 0.0, 0, 0, 0
+    cls.status, cls.matches = 200, [{"lat": "41.88", "lon": "-87.63"}]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), cls)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(settings, "GEOCODER_URL", f"http://127.0.0.1:{server.server_port}/search")
+    monkeypatch.setattr(geocoder, "_breaker", CircuitBreaker(failure_threshold=3, cooldown_seconds=60))
+    geocoder._geocode_cache.clear()
+    yield cls
+    server.shutdown()
+    server.server_close()
+    geocoder._geocode_cache.clear()
+
+
+def test_async_lookup_hits_stub_and_caches(stub_geocoder):
+    async def run():
+        first = await geocoder.get_lat_lon_async("233 S Wacker Dr")
+        second = await geocoder.get_lat_lon_async("233 s wacker dr")
+        await geocoder.close_geocoder_client()
+        return first, second
+
+    assert asyncio.run(run()) == ((41.88, -87.63), (41.88, -87.63))
+    assert stub_geocoder.requests == 1
+
+
+def test_async_lookup_respects_deadline(stub_geocoder):
+    stub_geocoder.delay = 1.0
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(geocoder.GeocoderUnavailable):
+            await geocoder.get_lat_lon_async("Slow Address", timeout=0.2)
+        elapsed = time.monotonic() - started
+        await geocoder.close_geocoder_client()
+        return elapsed
+
+    assert asyncio.run(run()) < 0.5
+
+
+def test_async_lookups_are_bounded(stub_geocoder, monkeypatch):
+    monkeypatch.setattr(settings, "GEOCODER_MAX_CONCURRENCY", 2)
+    stub_geocoder.delay = 0.1
+
+    async def run():
+        await geocoder.close_geocoder_client()
+        results = await asyncio.gather(*[geocoder.get_lat_lon_async(f"{i} State St") for i in range(6)])
+        await geocoder.close_geocoder_client()
+        return results
+
+    assert asyncio.run(run()) == [(41.88, -87.63)] * 6
+    assert stub_geocoder.requests == 6
+    assert stub_geocoder.max_in_flight == 2
+
+
+def test_search_endpoint_uses_async_geocoder(stub_geocoder, client):
+    response = client.post("/api/stores/search", json={"address": "Somewhere, MA", "filters": {"radius_miles": 5}})
+
+    assert response.status_code == 200
+    assert stub_geocoder.requests == 1
+    assert response.json()["total"] == 0
+
+
+def test_search_tells_geocoder_outage_from_unknown_address(stub_geocoder, client, monkeypatch):
+    body = {"address": "Slow Address", "filters": {"radius_miles": 5}}
+
+    # Out of time budget: 503, not "not found"
+    monkeypatch.setattr(settings, "SEARCH_DEADLINE_SECONDS", 0.3)
+    stub_geocoder.delay = 0.5
+    response = client.post("/api/stores/search", json=body)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    time.sleep(0.5)  # let the abandoned lookup finish in the background
+
+    # Upstream error: 503, and the cached failure keeps answering 503 without a new request
+    stub_geocoder.delay, stub_geocoder.status = 0.0, 500
+    for _ in range(2):
+        response = client.post("/api/stores/search", json={**body, "address": "Broken Address"})
+        assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.GEOCODE_ERROR_TTL_SECONDS)
+    requests = stub_geocoder.requests
+
+    # A real "no match" is the only 404
+    stub_geocoder.status, stub_geocoder.matches = 200, []
+    response = client.post("/api/stores/search", json={**body, "address": "1 Nowhere Lane"})
+    assert response.status_code == 404
+    assert stub_geocoder.requests == requests + 1
+
+
+# --- 6. Batch Geocoding (import) ---
+class StubCensusHandler(BaseHTTPRequestHandler):
+    """Census addressbatch stub: matches any address on "Main St", one response line per input line."""
+    requests = 0
+    lines = 0
+
+    def do_POST(self):
+        StubCensusHandler.requests += 1
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for line in csv.reader(io.StringIO(body)):
+            if len(line) != 5 or not line[0].isdigit():
+                continue  # multipart boundaries and form fields
+            StubCensusHandler.lines += 1
+            if "Main St" in line[1]:
+                writer.writerow([line[0], ", ".join(line[1:]), "Match", "Exact", line[1].upper(), "-71.05,42.35", "1", "L"])
+            else:
+                writer.writerow([line[0], ", ".join(line[1:]), "No_Match"])
+
+        payload = out.getvalue().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_census(monkeypatch):
+    StubCensusHandler.requests, StubCensusHandler.lines = 0, 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCensusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(settings, "GEOCODE_BATCH_URL", f"http://127.0.0.1:{server.server_port}/addressbatch")
+    monkeypatch.setattr(settings, "ZIP_GAZETTEER_PATH", "")
+    geocoder._geocode_cache.clear()
+    yield StubCensusHandler
+    server.shutdown()
+    server.server_close()
+    geocoder._geocode_cache.clear()
+
+
+def test_batch_dedupes_and_reuses_cache(stub_census):
+    main_st = ("1 Main St", "Boston", "MA", "02101")
+    unknown = ("9 Nowhere Rd", "Boston", "MA", "02101")
+
+    first = batch_geocoder.geocode_addresses([main_st, unknown, main_st])
+    assert first[main_st] == ((42.35, -71.05), "geocoded")
+    assert first[unknown] == ((None, None), "failed")
+    assert (stub_census.requests, stub_census.lines) == (1, 2)
+
+    # Both answers (the miss too) are cached, so a re-import makes no upstream call
+    second = batch_geocoder.geocode_addresses([main_st, unknown])
+    assert second[main_st] == ((42.35, -71.05), "cached")
+    assert stub_census.requests == 1
+
+
+def test_pooled_lookups_without_batch_url(fake_geocoder, monkeypatch):
+    monkeypatch.setattr(settings, "GEOCODE_BATCH_URL", "")
+    monkeypatch.setattr(settings, "GEOCODE_BATCH_RATE_PER_SECOND", 1000)
+    fake_geocoder.results["1 Main St, Boston, MA 02101, USA"] = (42.35, -71.05)
+
+    rows = [
+        {"store_id": "A", "latitude": "", "longitude": "", "address_street": "1 Main St",
+         "address_city": "Boston", "address_state": "MA", "address_postal_code": "02101"},
+        {"store_id": "B", "latitude": "0", "longitude": "0", "address_street": "1 Main St",
+         "address_city": "Boston", "address_state": "MA", "address_postal_code": "02101"},
+        {"store_id": "C", "latitude": "40.7", "longitude": "-74.0"},
+    ]
+    stats = batch_geocoder.fill_missing_coordinates(rows)
+
+    assert stats == {"geocoded": 2, "cached": 0, "zip_centroid": 0, "failed": 0}
+    assert fake_geocoder.calls == 1
+    assert (rows[1]["latitude"], rows[1]["longitude"]) == (42.35, -71.05)
+    assert rows[2]["latitude"] == "40.7"
+
+
+def test_import_geocodes_rows_without_coordinates(stub_census, client, db_session):
+    header = "store_id,name,store_type,status,latitude,longitude,address_street,address_city,address_state,address_postal_code,address_country,phone,services"
+    csv_content = "\n".join([
+        header,
+        "S1,One,retail,active,,,1 Main St,Boston,MA,02101,USA,555,",
+        "S2,Two,retail,active,,,1 Main St,Boston,MA,02101,USA,555,",
+        "S3,Three,retail,active,bad,bad,9 Nowhere Rd,Boston,MA,02101,USA,555,",
+        "S4,Four,retail,active,40.7,-74.0,5 Elm St,New York,NY,10001,USA,555,",
+    ])
+    response = client.post(
+        "/api/admin/stores/import",
+        files={"file": ("stores.csv", io.BytesIO(csv_content.encode()), "text/csv")},
+        headers=admin_headers(client),
+    )
+
+    stats = response.json()["stats"]
+    assert stats["created"] == 4
+    assert stats["geocoding"] == {"geocoded": 2, "cached": 0, "zip_centroid": 0, "failed": 1}
+    assert stub_census.requests == 1
+
+    s1 = db_session.query(models.Store).filter_by(store_id="S1").one()
+    assert (s1.latitude, s1.longitude) == (42.35, -71.05)
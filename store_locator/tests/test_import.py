@@ -0,0 +1,286 @@
+import io
+from sqlalchemy import create_engine, inspect, text
+from app import models
+from app.config import settings
+from app.migrations import upgrade_schema
+from app.services import import_jobs, importer, store_events
+from app.services.search import search_stores_logic
+from app.services.service_registry import ServiceRegistry, service_registry
+from app.utils import process_services
+from tests.conftest import admin_headers
+from tests.test_search import StatementCounter
+
+HEADER = "store_id,name,store_type,status,latitude,longitude,address_street,address_city,address_state,address_postal_code,address_country,phone,services"
+
+
+def csv_lines(*rows):
+    return [HEADER + "\n"] + [row + "\n" for row in rows]
+
+
+def store_row(store_id, lat=42.0, lon=-71.0, services="", name=None):
+    return f"{store_id},{name or 'Store ' + store_id},regular,active,{lat},{lon},1 Main St,Boston,MA,02101,USA,555,{services}"
+
+
+def services_of(db, store_id):
+    db.expire_all()
+    return sorted(s.name for s in db.get(models.Store, store_id).services)
+
+
+# --- 1. Set-Based Upsert ---
+def test_import_creates_and_updates(db_session):
+    lines = csv_lines(
+        store_row("TEST01", 42.5, -71.5, "wifi|Parking", name="Renamed"),
+        store_row("NEW01", 42.1, -71.1, "wifi"),
+        store_row("NEW02", 42.2, -71.2),
+    )
+    stats = importer.import_stores(db_session, lines)
+
+    assert (stats["created"], stats["updated"], stats["errors"]) == (2, 1, 0)
+    test01 = db_session.get(models.Store, "TEST01")
+    assert (test01.name, test01.latitude, test01.longitude) == ("Renamed", 42.5, -71.5)
+    assert services_of(db_session, "TEST01") == ["parking", "wifi"]
+    assert services_of(db_session, "NEW01") == ["wifi"]
+    assert db_session.get(models.Store, "NEW02").timezone == "America/New_York"
+
+
+def test_reimport_replaces_services(db_session):
+    importer.import_stores(db_session, csv_lines(store_row("NEW01", services="wifi|atm")))
+    stats = importer.import_stores(db_session, csv_lines(store_row("NEW01", services='"atm, Drive-Thru"')))
+
+    assert (stats["created"], stats["updated"]) == (0, 1)
+    assert services_of(db_session, "NEW01") == ["atm", "drive-thru"]
+    assert db_session.query(models.Service).count() == 3
+
+
+def test_statement_count_does_not_grow_with_rows(db_session):
+    def run(prefix, n):
+        lines = csv_lines(*[store_row(f"{prefix}{i}", 42.0 + i / 1000, -71.0, "wifi|atm") for i in range(n)])
+        with StatementCounter(db_session.get_bind()) as counter:
+            importer.import_stores(db_session, lines, chunk_size=1000)
+        return counter.count
+
+    run("WARM", 1)  # creates the services
+    assert run("A", 10) == run("B", 500)
+
+
+def test_duplicate_ids_and_bad_rows(db_session):
+    lines = [
+        "store_id,name,latitude,longitude,services\n",
+        "DUP,First,42.0,-71.0,wifi\n",
+    ]
+    stats = importer.import_stores(db_session, lines)
+    assert stats["errors"] == 1  # header lacks store_type and address columns
+
+    lines = csv_lines(store_row("DUP", name="First"), store_row("DUP", name="Second"), store_row(""))
+    stats = importer.import_stores(db_session, lines, chunk_size=1)
+
+    assert (stats["created"], stats["updated"], stats["errors"]) == (1, 1, 0)
+    assert db_session.get(models.Store, "DUP").name == "Second"
+
+
+def test_import_refreshes_search(db_session):
+    assert search_stores_logic(db_session, 42.0, -71.0, 5, None, [], 1, 10)["total"] == 1
+    version = store_events.current_version()
+
+    importer.import_stores(db_session, csv_lines(store_row("NEAR", 42.01, -71.0)))
+
+    assert store_events.current_version() > version
+    assert search_stores_logic(db_session, 42.0, -71.0, 5, None, [], 1, 10)["total"] == 2
+
+
+# --- 2. Change Detection ---
+def test_reimport_skips_unchanged_rows(db_session):
+    lines = csv_lines(store_row("H1", services="wifi|atm"), store_row("H2"))
+    importer.import_stores(db_session, lines)
+    version = store_events.current_version()
+
+    # Same content, different spacing and service order
+    lines = csv_lines(store_row("H1", services="atm| WiFi "), store_row("H2", lat=43.0))
+    stats = importer.import_stores(db_session, lines)
+
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (0, 1, 1)
+    assert db_session.get(models.Store, "H2").latitude == 43.0
+    assert store_events.current_version() > version
+
+    version = store_events.current_version()
+    stats = importer.import_stores(db_session, lines)
+    assert (stats["updated"], stats["unchanged"]) == (0, 2)
+    assert store_events.current_version() == version  # nothing written, caches stay valid
+
+
+def test_reimport_writes_every_hashed_column(db_session):
+    def lines(street, hours):
+        return [
+            HEADER + ",hours_mon\n",
+            f'A1,Store A1,regular,active,42.0,-71.0,{street},Boston,MA,02101,USA,555,,"{hours}"\n',
+        ]
+
+    importer.import_stores(db_session, lines("1 Main St", "09:00-17:00"))
+    stats = importer.import_stores(db_session, lines("2 Elm St", "10:00-18:00"))
+
+    assert (stats["updated"], stats["unchanged"]) == (1, 0)
+    db_session.expire_all()
+    store = db_session.get(models.Store, "A1")
+    assert (store.address_street, store.hours_mon) == ("2 Elm St", "10:00-18:00")
+
+    stats = importer.import_stores(db_session, lines("2 Elm St", "10:00-18:00"))
+    assert (stats["updated"], stats["unchanged"]) == (0, 1)
+
+
+def test_api_edit_invalidates_content_hash(db_session):
+    importer.import_stores(db_session, csv_lines(store_row("H1")))
+    store = db_session.get(models.Store, "H1")
+    assert store.content_hash
+
+    store.name = "Edited in admin"
+    db_session.commit()
+    assert store.content_hash is None
+
+    stats = importer.import_stores(db_session, csv_lines(store_row("H1")))
+    assert (stats["updated"], stats["unchanged"]) == (1, 0)
+    db_session.expire_all()
+    assert db_session.get(models.Store, "H1").name == "Store H1"
+
+
+def test_upgrade_schema_adds_new_columns(tmp_path):
+    # A database created before content_hash and the store_services index existed
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE stores DROP COLUMN content_hash"))
+        conn.execute(text("DROP INDEX idx_store_services_store"))
+
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    assert "content_hash" in {c["name"] for c in inspect(engine).get_columns("stores")}
+    assert "idx_store_services_store" in {i["name"] for i in inspect(engine).get_indexes("store_services")}
+
+
+# --- 3. Service Registry ---
+def test_registry_caches_committed_ids(db_session):
+    ids = service_registry.resolve(db_session, ["WiFi", " atm", "wifi", ""])
+    assert list(ids) == ["wifi", "atm"]
+    db_session.commit()
+
+    with StatementCounter(db_session.get_bind()) as counter:
+        assert service_registry.resolve(db_session, ["atm", "wifi"]) == {"atm": ids["atm"], "wifi": ids["wifi"]}
+    assert counter.count == 0
+
+
+def test_process_services_joins_callers_transaction(db_session):
+    services = process_services(db_session, "coffee|Parking")
+    assert [s.name for s in services] == ["coffee", "parking"]
+
+    db_session.rollback()
+    assert db_session.query(models.Service).count() == 0
+    assert process_services(db_session, ["coffee"])[0].name == "coffee"  # not served from a stale cache
+
+
+def test_registry_tolerates_concurrent_insert(db_session, monkeypatch):
+    # Another writer commits "wifi" between our SELECT and our INSERT
+    db_session.add(models.Service(name="wifi"))
+    db_session.commit()
+    existing_id = db_session.query(models.Service).filter_by(name="wifi").one().id
+
+    real_select = ServiceRegistry._select
+    calls = []
+
+    def racing_select(db, names):
+        calls.append(names)
+        return {} if len(calls) == 1 else real_select(db, names)
+
+    monkeypatch.setattr(ServiceRegistry, "_select", staticmethod(racing_select))
+    assert service_registry.resolve(db_session, ["wifi"]) == {"wifi": existing_id}
+    assert db_session.query(models.Service).count() == 1
+
+
+# --- 4. Background Import Jobs ---
+def post_job(client, headers, lines):
+    body = "".join(lines).encode()
+    return client.post(
+        "/api/admin/stores/import?background=true",
+        files={"file": ("stores.csv", io.BytesIO(body), "text/csv")},
+        headers=headers,
+    )
+
+
+def test_background_import_reports_progress(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    headers = admin_headers(client)
+    lines = csv_lines(store_row("J1"), store_row("J2"), store_row("TEST01", name="Renamed"), "J3,Short row")
+
+    response = post_job(client, headers, lines)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    # TestClient runs background tasks before returning, so the job is done here
+    status = client.get(f"/api/admin/stores/import/{job_id}", headers=headers).json()
+    assert status["status"] == "succeeded"
+    assert status["progress"] == 1.0
+    assert status["rows_staged"] == 3
+    assert (status["stats"]["created"], status["stats"]["updated"], status["stats"]["errors"]) == (2, 1, 1)
+    assert status["error_details"] == [{"row": 4, "error": "empty store_type"}]
+    assert db_session.get(models.Store, "TEST01").name == "Renamed"
+    assert db_session.query(models.StoreImportRow).count() == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_background_import_records_row_errors(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    headers = admin_headers(client)
+
+    job_id = post_job(client, headers, ["store_id,name\n", "X1,No type\n", "X2,No type\n"]).json()["job_id"]
+    status = client.get(f"/api/admin/stores/import/{job_id}", headers=headers).json()
+
+    assert status["status"] == "succeeded"
+    assert status["stats"]["errors"] == 2
+    assert [e["row"] for e in status["error_details"]] == [1, 2]
+    assert "store_type" in status["error_details"][0]["error"]
+
+
+def test_background_import_is_all_or_nothing(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 1)
+    real_write_chunk = importer.write_chunk
+    calls = []
+
+    def failing_write_chunk(db, rows, stats):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        real_write_chunk(db, rows, stats)
+
+    monkeypatch.setattr(importer, "write_chunk", failing_write_chunk)
+    headers = admin_headers(client)
+    job_id = post_job(client, headers, csv_lines(store_row("F1"), store_row("F2"))).json()["job_id"]
+    status = client.get(f"/api/admin/stores/import/{job_id}", headers=headers).json()
+
+    assert status["status"] == "failed"
+    assert status["message"] == "disk full"
+    db_session.expire_all()
+    assert db_session.get(models.Store, "F1") is None
+    assert db_session.query(models.StoreImportRow).count() == 0
+
+
+def test_interrupted_jobs_are_failed_at_startup(db_session, tmp_path):
+    spool = tmp_path / "j.csv"
+    spool.write_text(HEADER)
+    db_session.add_all([
+        models.ImportJob(id="stuck", status="staging", spool_path=str(spool)),
+        models.ImportJob(id="done", status="succeeded"),
+        models.StoreImportRow(job_id="stuck", row_number=1, store_id="S1", name="S1", store_type="regular"),
+    ])
+    db_session.commit()
+
+    assert import_jobs.recover_interrupted_jobs(db_session.get_bind()) == 1
+    db_session.expire_all()
+    assert db_session.get(models.ImportJob, "stuck").status == "failed"
+    assert db_session.get(models.ImportJob, "done").status == "succeeded"
+    assert db_session.query(models.StoreImportRow).count() == 0
+    assert not spool.exists()
+
+
+def test_import_job_not_found(client):
+    assert client.get("/api/admin/stores/import/nope", headers=admin_headers(client)).status_code == 404
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+from app.config import settings
+from app.services import metrics
+from app.services.metrics import Counter, Histogram, SEARCH_STAGES, search_request, stage
+from app.services.search import reset_search_cache, search_cache_stats
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, "sql")
+
+    lines = h.render()
+    assert 'demo_seconds_bucket{stage="sql",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="sql",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{stage="sql",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{stage="sql"} 4.05' in lines
+    assert 'demo_seconds_count{stage="sql"} 4' in lines
+
+
+def test_counter_escapes_label_values():
+    c = Counter("demo_total", "Demo.", ("path",))
+    c.inc('a"b')
+    c.inc('a"b', amount=2)
+    assert c.render()[-1] == 'demo_total{path="a\\"b"} 3'
+
+
+def test_stage_is_observed_once_per_search():
+    metrics.reset_metrics()
+    with search_request():
+        for _ in range(3):
+            with stage("sql"):
+                pass
+    assert SEARCH_STAGES.count("sql") == 1
+
+    # Outside a search, every block is its own observation
+    with stage("sql"):
+        pass
+    assert SEARCH_STAGES.count("sql") == 2
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_metrics_endpoint(_, client):
+    metrics.reset_metrics()
+    reset_search_cache()
+    body = {"address": "Boston", "filters": {"radius_miles": 5, "open_now": True}}
+    assert client.post("/api/stores/search", json=body).status_code == 200
+    assert client.post("/api/stores/search", json=body).status_code == 200  # cached
+    assert client.get("/api/admin/stores/NOPE").status_code == 401
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    assert 'http_requests_total{method="POST",endpoint="/api/stores/search",status="200"} 2' in text
+    # Labelled by route template, not by the concrete path
+    assert 'http_requests_total{method="GET",endpoint="/api/admin/stores/{store_id}",status="401"} 1' in text
+    for name in ("cache", "geocode", "filter", "open_now", "sql", "serialize", "encode"):
+        assert f'search_stage_seconds_count{{stage="{name}"}}' in text
+    assert SEARCH_STAGES.count("cache") == 2 and SEARCH_STAGES.count("sql") == 1
+    stats = search_cache_stats()  # counted since startup, across tests
+    assert f'cache_hit_ratio{{cache="search"}} {stats["hits"] / (stats["hits"] + stats["misses"])!r}' in text
+    assert 'cache_hits_total{cache="geocode"}' in text
+    assert 'db_pool_size{pool="sync"}' in text
+
+
+@patch("app.main.search_stores_logic", side_effect=RuntimeError("boom"))
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_failed_search_is_a_logged_500(_, __, client, caplog):
+    metrics.reset_metrics()
+    reset_search_cache()
+    response = client.post("/api/stores/search", json={"address": "Boston", "filters": {"radius_miles": 5}})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Search failed"}  # no internals in the body
+    assert "boom" in caplog.text and "Traceback" in caplog.text
+    assert metrics.SEARCH_ERRORS.value() == 1
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="POST",endpoint="/api/stores/search",status="500"} 1' in text
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 404
@@ -0,0 +1,92 @@
+import time
+from unittest.mock import patch
+import pytest
+from app import models
+from app.config import settings
+from app.services import profiling
+from tests.conftest import admin_headers
+
+SEARCH = {"address": "Boston", "filters": {"radius_miles": 5}}
+
+
+@pytest.fixture(autouse=True)
+def clean_profiles():
+    profiling.reset_profiles()
+    yield
+    profiling.reset_profiles()
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_records_folded_stacks():
+    profile = profiling.RequestProfile("GET", "/", "requested", interval=0.001)
+    profile.start()
+    busy_wait(0.1)
+    profile.stop()
+
+    folded = profile.folded().splitlines()
+    assert any("busy_wait (tests/test_profiling.py:" in line for line in folded)
+    stack, count = folded[0].rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and int(count) > 0
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_admin_can_profile_a_request(_, client):
+    headers = admin_headers(client)
+    response = client.post("/api/stores/search", json=SEARCH, headers={**headers, "X-Profile": "1"})
+    assert response.json()["total"] == 1
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/api/admin/profiles/{profile_id}", headers=headers).json()
+    assert (profile["method"], profile["path"], profile["status"], profile["reason"]) == \
+        ("POST", "/api/stores/search", 200, "requested")
+    assert profile["sql_count"] == len(profile["sql"]) > 0
+    assert any("FROM stores" in s["statement"] for s in profile["sql"])
+    assert all(s["duration_ms"] >= 0 for s in profile["sql"])
+
+    assert [p["id"] for p in client.get("/api/admin/profiles", headers=headers).json()] == [profile_id]
+    folded = client.get(f"/api/admin/profiles/{profile_id}/folded", headers=headers)
+    assert folded.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/admin/profiles/0123", headers=headers).status_code == 404
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_profile_flag_needs_an_admin_token(_, client):
+    assert "X-Profile-Id" not in client.post("/api/stores/search?profile=1", json=SEARCH).headers
+    forged = {"Authorization": "Bearer not-a-token", "X-Profile": "1"}
+    assert "X-Profile-Id" not in client.post("/api/stores/search", json=SEARCH, headers=forged).headers
+    assert profiling.list_profiles() == []
+    assert client.get("/api/admin/profiles").status_code == 401
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_deactivated_admin_token_cannot_profile(_, client, db_session):
+    headers = admin_headers(client)
+    admin = db_session.query(models.User).filter(models.User.email == "admin@test.com").one()
+    admin.is_active = False
+    db_session.commit()
+
+    response = client.post("/api/stores/search", json=SEARCH, headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert profiling.list_profiles() == []
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_sampled_requests_are_stored_without_a_header(_, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    response = client.post("/api/stores/search", json=SEARCH)
+    assert "X-Profile-Id" not in response.headers
+
+    [summary] = profiling.list_profiles()
+    assert summary["reason"] == "sampled"
+    assert (tmp_path / f"{summary['id']}.folded").exists()
+
+    # Another worker finds it through PROFILE_DIR
+    profiling.reset_profiles()
+    assert profiling.get_profile(summary["id"])["path"] == "/api/stores/search"
@@ -0,0 +1,448 @@
+import os
+import random
+from unittest.mock import patch
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.services import spatial_index
+from app.services.search import InvalidCursor, encode_cursor, search_fingerprint, search_stores_logic, calculate_distance, bounding_box_filter
+from app.services.spatial_index import SpatialIndex, nearest
+from tests.conftest import admin_headers
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def add_store(db, store_id, lat, lon, **kwargs):
+    store = models.Store(
+        store_id=store_id,
+        name=kwargs.pop("name", f"Store {store_id}"),
+        store_type=kwargs.pop("store_type", "regular"),
+        status="active",
+        latitude=lat,
+        longitude=lon,
+        **kwargs
+    )
+    db.add(store)
+    return store
+
+
+# --- 1. Spatial Index ---
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    points = [(f"S{i}", rng.uniform(25, 49), rng.uniform(-125, -67)) for i in range(2000)]
+    index = SpatialIndex.from_rows(points, cell_degrees=0.5)
+
+    center = (40.7128, -74.0060)
+    expected = {sid for sid, lat, lon in points if calculate_distance(*center, lat, lon) <= 150}
+    found = {sid for sid, _ in index.within(*center, 150)}
+
+    assert found == expected
+    assert index.size == 2000
+
+
+def test_index_wraps_antimeridian():
+    index = SpatialIndex.from_rows([
+        ("EAST", 0.0, 179.9),
+        ("WEST", 0.0, -179.9),
+        ("FAR", 0.0, 170.0),
+    ])
+
+    found = dict(index.within(0.0, 179.95, 20))
+
+    assert set(found) == {"EAST", "WEST"}
+
+
+def test_index_near_pole():
+    index = SpatialIndex.from_rows([("POLE_A", 89.9, 10.0), ("POLE_B", 89.9, -170.0)])
+
+    found = {sid for sid, _ in index.within(89.95, 100.0, 50)}
+
+    assert found == {"POLE_A", "POLE_B"}
+
+
+def test_vectorized_distances_match_scalar():
+    rng = random.Random(11)
+    points = [(f"S{i}", rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(200)]
+    index = SpatialIndex.from_rows(points)
+
+    dist = index.distances(40.7128, -74.0060, np.arange(index.size))
+
+    for (sid, lat, lon), d in zip(points, dist):
+        assert abs(calculate_distance(40.7128, -74.0060, lat, lon) - d) < 1e-6
+
+
+def test_nearest_orders_by_distance_then_id():
+    ids = np.array(["D", "C", "B", "A", "E"], dtype=object)
+    dist = np.array([4.0, 1.0, 2.0, 2.0, 0.5])
+
+    assert [ids[i] for i in nearest(ids, dist, 3)] == ["E", "C", "A"]
+    assert [ids[i] for i in nearest(ids, dist, 10)] == ["E", "C", "A", "B", "D"]
+    assert nearest(ids, dist, 0) == []
+
+
+# --- 2. Search Logic ---
+def test_search_uses_radius(db_session):
+    add_store(db_session, "NYC", 40.7580, -73.9855)
+    add_store(db_session, "PHL", 39.9526, -75.1652)
+    db_session.commit()
+
+    result = search_stores_logic(db_session, 40.7128, -74.0060, 10, None, [], 1, 10)
+
+    assert [r["store_id"] for r in result["results"]] == ["NYC"]
+    assert result["total"] == 1
+
+
+def test_search_sees_new_stores(db_session):
+    first = search_stores_logic(db_session, 42.0, -71.0, 5, None, [], 1, 10)
+    assert first["total"] == 1  # TEST01 from the fixture
+
+    add_store(db_session, "NEAR", 42.01, -71.01)
+    db_session.commit()
+
+    second = search_stores_logic(db_session, 42.0, -71.0, 5, None, [], 1, 10)
+    assert second["total"] == 2
+    assert second["results"][0]["store_id"] == "TEST01"
+
+
+def test_search_applies_type_filter_to_index_candidates(db_session):
+    add_store(db_session, "OUT", 42.01, -71.01, store_type="outlet")
+    db_session.commit()
+
+    result = search_stores_logic(db_session, 42.0, -71.0, 5, "outlet", [], 1, 10)
+
+    assert [r["store_id"] for r in result["results"]] == ["OUT"]
+
+
+def test_search_pages_are_disjoint(db_session):
+    for i in range(25):
+        add_store(db_session, f"P{i:02d}", 42.0 + i * 0.001, -71.0)
+    db_session.commit()
+
+    pages = [search_stores_logic(db_session, 42.0, -71.0, 10, None, [], p, 10) for p in (1, 2, 3)]
+    seen = [r["store_id"] for page in pages for r in page["results"]]
+
+    assert pages[0]["total"] == 26
+    assert len(seen) == 26 and len(set(seen)) == 26
+    assert seen[:2] == ["P00", "TEST01"]  # equal distance, tie broken by store_id
+
+
+def test_services_filter_is_and(db_session):
+    wifi, parking = models.Service(name="wifi"), models.Service(name="parking")
+    add_store(db_session, "BOTH", 42.01, -71.0, services=[wifi, parking])
+    add_store(db_session, "WIFI", 42.02, -71.0, services=[wifi])
+    db_session.commit()
+
+    for backend in ("index", "sql"):
+        both = search_stores_logic(db_session, 42.0, -71.0, 10, None, ["WiFi", "parking"], 1, 10, backend=backend)
+        one = search_stores_logic(db_session, 42.0, -71.0, 10, None, ["wifi"], 1, 10, backend=backend)
+
+        assert [r["store_id"] for r in both["results"]] == ["BOTH"]
+        assert [r["store_id"] for r in one["results"]] == ["BOTH", "WIFI"]
+        assert set(one["results"][0]["services"]) == {"wifi", "parking"}
+
+
+def test_index_type_and_services_masks():
+    # More than 64 distinct services, so the bitmasks span two words
+    names = [f"svc{i}" for i in range(70)]
+    index = SpatialIndex(
+        ["A", "B", "C"], [42.0] * 3, [-71.0] * 3,
+        store_types=["Regular", "outlet", None],
+        services=[names, ["SVC1", "svc69"], []],
+    )
+    positions = np.arange(3)
+
+    assert index.type_mask(positions, " REGULAR ").tolist() == [True, False, False]
+    assert index.type_mask(positions, "flagship").tolist() == [False, False, False]
+    assert index.services_mask(positions, ["svc69", "Svc1"]).tolist() == [True, True, False]
+    assert index.services_mask(positions, ["svc0"]).tolist() == [True, False, False]
+    assert index.services_mask(positions, ["unknown", "svc1"]).tolist() == [False, False, False]
+    assert index.services_mask(positions, [" "]).tolist() == [True, True, True]
+
+
+def test_type_filter_matches_on_both_backends(db_session):
+    add_store(db_session, "OUT", 42.01, -71.0, store_type="Outlet")
+    db_session.commit()
+
+    for backend in ("index", "sql"):
+        result = search_stores_logic(db_session, 42.0, -71.0, 10, "outlet", [], 1, 10, backend=backend)
+        assert [r["store_id"] for r in result["results"]] == ["OUT"]
+        everything = search_stores_logic(db_session, 42.0, -71.0, 10, "all", [], 1, 10, backend=backend)
+        assert [r["store_id"] for r in everything["results"]] == ["TEST01", "OUT"]
+
+
+def test_search_statement_count_is_fixed(db_session):
+    wifi = models.Service(name="wifi")
+    for i in range(40):
+        add_store(db_session, f"N{i:02d}", 42.0 + i * 0.001, -71.0, services=[wifi])
+    db_session.commit()
+    engine = db_session.get_bind()
+
+    counts = {}
+    for backend in ("index", "sql"):
+        search_stores_logic(db_session, 42.0, -71.0, 10, None, ["wifi"], 1, 5, backend=backend)  # warm the index
+        for limit in (5, 40):
+            db_session.expire_all()
+            with StatementCounter(engine) as counter:
+                result = search_stores_logic(db_session, 42.0, -71.0, 10, None, ["wifi"], 1, limit, backend=backend)
+            assert all(r["services"] == ["wifi"] for r in result["results"])
+            counts[(backend, limit)] = counter.count
+
+    assert counts[("index", 5)] == counts[("index", 40)] <= 2  # filters run on the snapshot
+    assert counts[("sql", 5)] == counts[("sql", 40)] <= 3
+
+
+def test_sql_backend_loads_only_the_page(db_session):
+    for i in range(40):
+        add_store(db_session, f"N{i:02d}", 42.0 + i * 0.001, -71.0)
+    db_session.commit()
+
+    loaded = []
+    record = lambda target, context: loaded.append(target.store_id)  # noqa: E731
+    event.listen(models.Store, "load", record)
+    try:
+        result = search_stores_logic(db_session, 42.0, -71.0, 10, None, [], 2, 5, backend="sql")
+    finally:
+        event.remove(models.Store, "load", record)
+
+    assert result["total"] == 41
+    assert [r["store_id"] for r in result["results"]] == ["N04", "N05", "N06", "N07", "N08"]
+    assert sorted(loaded) == ["N04", "N05", "N06", "N07", "N08"]
+
+
+def test_search_without_location_pages_by_store_id(db_session):
+    always = {f"hours_{d}": "00:00-24:00" for d in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")}
+    never = {f"hours_{d}": "closed" for d in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")}
+    for store_id in ("C", "A", "B"):
+        add_store(db_session, store_id, 10.0, 10.0, **always)
+    add_store(db_session, "AA", 10.0, 10.0, **never)
+    db_session.commit()
+
+    page = search_stores_logic(db_session, None, None, 10, None, [], 2, 2)
+    assert (page["total"], [r["store_id"] for r in page["results"]]) == (5, ["B", "C"])
+    assert all(r["distance"] is None for r in page["results"])
+
+    open_page = search_stores_logic(db_session, None, None, 10, None, [], 2, 2, open_now=True)
+    assert [r["store_id"] for r in open_page["results"]] == ["C"]
+    assert open_page["total"] == 3
+
+
+def test_open_now_filter(db_session):
+    always = {f"hours_{d}": "00:00-24:00" for d in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")}
+    never = {f"hours_{d}": "closed" for d in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")}
+    add_store(db_session, "OPEN", 42.01, -71.0, address_state="MA", **always)
+    add_store(db_session, "SHUT", 42.02, -71.0, address_state="MA", **never)
+    db_session.commit()
+
+    for backend in ("index", "sql"):
+        result = search_stores_logic(db_session, 42.0, -71.0, 10, None, [], 1, 10, open_now=True, backend=backend)
+
+        assert [r["store_id"] for r in result["results"]] == ["OPEN"]
+        assert result["results"][0]["is_open"] is True
+
+
+@patch("app.main.get_lat_lon_async")
+def test_search_cache_serves_repeat_queries(mock_geo, client, db_session):
+    mock_geo.return_value = (42.0, -71.0)
+    body = {"zip_code": "02101", "filters": {"radius_miles": 5, "services": ["b", "a"]}}
+    client.post("/api/stores/search", json=body)
+
+    same = {"zip_code": " 02101 ", "filters": {"radius_miles": 5, "services": ["A", "b"]}}
+    with StatementCounter(db_session.get_bind()) as counter:
+        second = client.post("/api/stores/search", json=same)
+
+    assert second.status_code == 200
+    assert counter.count == 0
+    assert mock_geo.call_count == 1
+
+    # A store write makes the cached entry unreachable
+    add_store(db_session, "NEAR", 42.01, -71.0)
+    db_session.commit()
+    client.post("/api/stores/search", json=body)
+    assert mock_geo.call_count == 2
+
+
+@patch("app.main.get_lat_lon_async", return_value=(None, None))
+def test_unresolved_location_is_not_an_unfiltered_listing(mock_geo, client):
+    body = {"address": "1 Nowhere Lane", "filters": {"radius_miles": 5}}
+    for _ in range(2):
+        response = client.post("/api/stores/search", json=body)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Location not found"}
+    assert mock_geo.call_count == 2  # not served from the search cache
+
+
+@patch("app.main.get_lat_lon", return_value=(42.02, -71.02))
+@patch("app.main.get_lat_lon_async")
+def test_snapshot_refreshes_after_create_store(mock_geo, _, client):
+    mock_geo.return_value = (42.02, -71.02)
+    headers = admin_headers(client)
+
+    before = client.post("/api/stores/search", json={"zip_code": "02101", "filters": {"radius_miles": 5}})
+    assert before.json()["total"] == 1
+
+    store = {"store_id": "NEW01", "name": "New", "store_type": "regular", "address_postal_code": "02101"}
+    assert client.post("/api/admin/stores", json=store, headers=headers).status_code == 201
+
+    after = client.post("/api/stores/search", json={"zip_code": "02101", "filters": {"radius_miles": 5}})
+    assert {r["store_id"] for r in after.json()["results"]} == {"TEST01", "NEW01"}
+
+
+def test_index_rebuilt_after_reset(db_session):
+    spatial_index.reset_index()
+    index = spatial_index.get_index(db_session)
+
+    assert index.size == 1
+    assert spatial_index.get_index(db_session) is index
+
+
+# --- 3. SQL Bounding Box Backend ---
+def explain(db, query):
+    sql = str(query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if db.get_bind().dialect.name == "sqlite" else "EXPLAIN "
+    return " ".join(str(row[-1]) for row in db.execute(text(prefix + sql)))
+
+
+def test_sql_backend_matches_index(db_session):
+    rng = random.Random(3)
+    for i in range(300):
+        add_store(db_session, f"R{i}", rng.uniform(41, 43), rng.uniform(-72, -70))
+    db_session.commit()
+
+    by_sql = search_stores_logic(db_session, 42.0, -71.0, 25, None, [], 1, 500, backend="sql")
+    by_index = search_stores_logic(db_session, 42.0, -71.0, 25, None, [], 1, 500, backend="index")
+
+    assert by_sql["total"] == by_index["total"] > 0
+    assert [r["store_id"] for r in by_sql["results"]] == [r["store_id"] for r in by_index["results"]]
+
+
+def test_sql_backend_across_antimeridian(db_session):
+    add_store(db_session, "FIJI_E", -17.0, 179.9)
+    add_store(db_session, "FIJI_W", -17.0, -179.9)
+    db_session.commit()
+
+    result = search_stores_logic(db_session, -17.0, 179.95, 20, None, [], 1, 10, backend="sql")
+
+    assert {r["store_id"] for r in result["results"]} == {"FIJI_E", "FIJI_W"}
+
+
+def test_bounding_box_uses_index_sqlite(db_session):
+    query = db_session.query(models.Store).filter(bounding_box_filter(42.0, -71.0, 10))
+
+    assert "idx_lat_lon" in explain(db_session, query)
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL not set")
+def test_bounding_box_uses_index_postgres():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        # Tiny tables are always seq-scanned; disable that to prove the index is usable
+        db.execute(text("SET enable_seqscan = off"))
+        query = db.query(models.Store).filter(bounding_box_filter(42.0, -71.0, 10))
+
+        assert "idx_lat_lon" in explain(db, query)
+    finally:
+        db.close()
+        models.Base.metadata.drop_all(bind=engine)
+
+
+# --- 4. Cursor Pagination ---
+def walk(db, cursor_pages: bool, limit=3, **kwargs):
+    """Every result id, page by page, following next_cursor or incrementing page."""
+    ids, page, cursor = [], 1, None
+    while True:
+        result = search_stores_logic(db, page=page, limit=limit, cursor=cursor, **kwargs)
+        ids += [r["store_id"] for r in result["results"]]
+        if not result["next_cursor"]:
+            return ids
+        if cursor_pages:
+            cursor = result["next_cursor"]
+        else:
+            page += 1
+
+
+def test_cursor_walk_matches_page_walk(db_session):
+    always = {f"hours_{d}": "00:00-24:00" for d in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")}
+    for i in range(10):
+        # Pairs at equal distance exercise the store_id tie-break across page boundaries
+        add_store(db_session, f"S{i}", 42.0 + (i // 2) * 0.01, -71.0, address_state="MA", **always)
+    db_session.commit()
+
+    searches = [
+        dict(lat=42.0, lon=-71.0, radius_miles=50, backend="index"),
+        dict(lat=42.0, lon=-71.0, radius_miles=50, backend="sql"),
+        dict(lat=None, lon=None, radius_miles=50),
+        dict(lat=None, lon=None, radius_miles=50, open_now=True),
+    ]
+    for search in searches:
+        search = {"store_type": None, "services": [], **search}
+        everything = [r["store_id"] for r in search_stores_logic(db_session, page=1, limit=100, **search)["results"]]
+        assert walk(db_session, True, **search) == walk(db_session, False, **search) == everything
+
+
+def test_cursor_resumes_after_inserts(db_session):
+    for i in range(6):
+        add_store(db_session, f"S{i}", 42.0 + (i + 1) * 0.01, -71.0)
+    db_session.commit()
+    search = dict(lat=42.0, lon=-71.0, radius_miles=50, store_type=None, services=[], limit=3)
+
+    first = search_stores_logic(db_session, page=1, **search)
+    assert [r["store_id"] for r in first["results"]] == ["TEST01", "S0", "S1"]
+
+    # A store nearer than the cursor appears: an offset page would repeat S1
+    add_store(db_session, "CLOSER", 42.001, -71.0)
+    db_session.commit()
+
+    after_cursor = search_stores_logic(db_session, page=1, cursor=first["next_cursor"], **search)
+    assert [r["store_id"] for r in after_cursor["results"]] == ["S2", "S3", "S4"]
+    assert after_cursor["page"] is None
+    assert [r["store_id"] for r in search_stores_logic(db_session, page=2, **search)["results"]] == ["S1", "S2", "S3"]
+
+
+def test_cursor_is_bound_to_its_search(db_session, client):
+    for i in range(4):
+        add_store(db_session, f"S{i}", 42.0 + i * 0.01, -71.0)
+    db_session.commit()
+    cursor = search_stores_logic(db_session, 42.0, -71.0, 50, None, [], 1, 2)["next_cursor"]
+
+    with pytest.raises(InvalidCursor):
+        search_stores_logic(db_session, 42.0, -71.0, 25, None, [], 1, 2, cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        search_stores_logic(db_session, 42.0, -71.0, 50, None, [], 1, 2, cursor="not-a-cursor")
+
+    response = client.post("/api/stores/search", json={"filters": {}, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_forged_cursor_position_is_rejected(_, db_session, client):
+    # The fingerprint is public, so a well-formed cursor can carry any distance
+    near = search_fingerprint(42.0, -71.0, 50, None, [], False)
+    anywhere = search_fingerprint(None, None, 50, None, [], False)
+    for distance, fingerprint, lat, lon in [
+        (None, near, 42.0, -71.0), (float("nan"), near, 42.0, -71.0), (1.5, anywhere, None, None),
+    ]:
+        for backend in ("index", "sql"):
+            with pytest.raises(InvalidCursor):
+                search_stores_logic(db_session, lat, lon, 50, None, [], 1, 2, backend=backend,
+                                    cursor=encode_cursor(distance, "A", fingerprint))
+
+    body = {"zip_code": "02101", "filters": {"radius_miles": 50}, "cursor": encode_cursor(None, "A", near)}
+    assert client.post("/api/stores/search", json=body).status_code == 400
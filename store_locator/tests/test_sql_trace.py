@@ -0,0 +1,57 @@
+import json
+import logging
+from unittest.mock import patch
+from sqlalchemy import text
+from app.config import settings
+from app.database import engine
+from app.services.sql_trace import SQLStats, bind_shape, normalize_sql, track
+
+
+def test_normalize_sql_groups_statements_by_shape():
+    a = normalize_sql("SELECT * FROM stores\n  WHERE id IN (?, ?, ?) AND name = 'O''Brien' AND radius > 2.5")
+    b = normalize_sql("SELECT * FROM stores WHERE id IN (?) AND name = 'x' AND radius > 10")
+    assert a == b == "SELECT * FROM stores WHERE id IN (...) AND name = ? AND radius > ?"
+    assert normalize_sql("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == \
+        "INSERT INTO t (a, b) VALUES (...), ..."
+    # Digits inside identifiers are kept
+    assert normalize_sql("SELECT anon_1.x FROM t1 AS anon_1") == "SELECT anon_1.x FROM t1 AS anon_1"
+
+
+def test_bind_shape_has_types_not_values():
+    assert bind_shape(("a", "b", "c", 1, None)) == ["str*3", "int", "null"]
+    assert bind_shape({"email": "x@example.com", "limit": 5}) == {"email": "str", "limit": "int"}
+    assert bind_shape([("a", 1.0), ("b", 2.0)], executemany=True) == {"rows": 2, "params": ["str", "float"]}
+
+
+def test_slow_statements_are_logged_and_tracked(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    stats = SQLStats(keep=1)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"), track(stats), engine.connect() as conn:
+        conn.execute(text("SELECT :name, 42"), {"name": "secret"})
+        conn.execute(text("SELECT 1"))
+
+    assert (stats.count, stats.slow, len(stats.statements)) == (2, 2, 1)
+    entry = json.loads(caplog.records[0].getMessage())
+    assert entry["sql"] == "SELECT ?, ?"
+    assert entry["binds"] == ["str"]
+    assert "secret" not in caplog.text
+    assert entry["caller"] is None  # issued from the test, not from app code
+
+
+@patch("app.main.get_lat_lon_async", return_value=(42.0, -71.0))
+def test_debug_headers_report_statements(_, client, monkeypatch):
+    body = {"address": "Boston", "filters": {"radius_miles": 5}}
+    assert "X-SQL-Statements" not in client.post("/api/stores/search", json=body).headers
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    response = client.get("/api/admin/stores/NOPE", headers={"Authorization": "Bearer nope"})
+    assert response.headers["X-SQL-Statements"] == "0"  # rejected before touching the database
+
+    with patch("app.services.sql_trace.slow_query_log") as log:
+        monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+        response = client.post("/api/stores/search", json={**body, "filters": {"radius_miles": 6}})
+    assert int(response.headers["X-SQL-Statements"]) >= 1
+    assert float(response.headers["X-SQL-Time-Ms"]) >= 0
+    entry = json.loads(log.warning.call_args_list[-1].args[0])
+    assert entry["request"] == "POST /api/stores/search"
+    assert entry["caller"].startswith("app/")
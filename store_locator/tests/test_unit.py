@@ -1,7 +1,13 @@
 from app.services.search import calculate_distance
+from app.services.geo import bounding_box
+from app.services.hours import parse_hours, compile_week, is_open, WeekClock
+from app.services.cache import LRUCache, CacheMaintainer
+import time
 from app.utils import process_services, check_is_open
 from unittest.mock import MagicMock
 from datetime import datetime
+import pytest
+import pytz
 
 
 # --- 1. Distance Calculation (Haversine) ---
@@ -22,6 +28,28 @@ def test_zero_distance():
     assert dist == 0.0
 
 
+# --- 1b. Bounding Box ---
+def test_bounding_box_contains_radius():
+    min_lat, max_lat, min_lon, max_lon = bounding_box(40.7128, -74.0060, 10)
+
+    # 10 miles is ~0.145 degrees of latitude; longitude is wider at 40N
+    assert 40.56 < min_lat < 40.57 and 40.85 < max_lat < 40.86
+    assert (max_lon - min_lon) > (max_lat - min_lat)
+    assert calculate_distance(40.7128, -74.0060, 40.7128, max_lon) >= 9.99
+
+
+def test_bounding_box_antimeridian():
+    min_lat, max_lat, min_lon, max_lon = bounding_box(0.0, 179.95, 20)
+
+    # Crossing the antimeridian wraps so that min_lon > max_lon
+    assert min_lon > 179.0
+    assert max_lon < -179.0
+
+
+def test_bounding_box_pole():
+    assert bounding_box(89.9, 10.0, 50)[2:] == (-180.0, 180.0)
+
+
 # --- 2. Service Processing ---
 def test_process_services_string():
     # Mock DB session since process_services uses it to query/create
@@ -53,4 +81,96 @@ def test_check_is_open():
         is_open = check_is_open(mock_store)
         assert isinstance(is_open, bool)
     except Exception as e:
-        pytest.fail(f"check_is_open raised an exception: {e}")
\ No newline at end of file
+        pytest.fail(f"check_is_open raised an exception: {e}")
+
+
+def test_parse_hours():
+    assert parse_hours("08:00-22:00") == (480, 1320)
+    assert parse_hours("10:00-24:00") == (600, 1440)
+    assert parse_hours("22:00-02:00") == (1320, 1560)  # overnight runs past midnight
+    assert parse_hours("closed") is None
+    assert parse_hours("Closed") is None
+    assert parse_hours("25:00-26:00") is None
+    assert parse_hours("garbage") is None
+    assert parse_hours(None) is None
+
+
+def test_compile_week_overnight_wraps_sunday():
+    week = ["closed"] * 6 + ["22:00-02:00"]
+    intervals = compile_week(tuple(week))
+
+    # Sunday 22:00 to end of week, then Monday 00:00-02:00
+    assert intervals == ((0, 120), (6 * 1440 + 1320, 7 * 1440 - 1))
+    assert is_open(intervals, 60)
+    assert not is_open(intervals, 180)
+
+
+def test_week_clock_uses_store_timezone():
+    # Monday 2024-01-15 15:30 UTC is 10:30 in New York (EST, UTC-5)
+    clock = WeekClock(datetime(2024, 1, 15, 15, 30, tzinfo=pytz.UTC))
+
+    assert clock.minute_of_week("UTC") == 15 * 60 + 30
+    assert clock.minute_of_week("America/New_York") == 10 * 60 + 30
+    # Summer: New York is UTC-4
+    summer = WeekClock(datetime(2024, 7, 15, 15, 30, tzinfo=pytz.UTC))
+    assert summer.minute_of_week("America/New_York") == 11 * 60 + 30
+
+
+def test_check_is_open_with_clock():
+    store = MagicMock(timezone="America/New_York", hours_mon="09:00-17:00", hours_sun="20:00-01:00")
+
+    monday_morning = WeekClock(datetime(2024, 1, 15, 15, 30, tzinfo=pytz.UTC))  # Mon 10:30 local
+    monday_night = WeekClock(datetime(2024, 1, 16, 3, 0, tzinfo=pytz.UTC))  # Mon 22:00 local
+    sunday_spill = WeekClock(datetime(2024, 1, 15, 5, 30, tzinfo=pytz.UTC))  # Mon 00:30 local
+
+    assert check_is_open(store, monday_morning)
+    assert not check_is_open(store, monday_night)
+    assert check_is_open(store, sunday_spill)
+
+
+# --- 4. Caching ---
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    cache.set("gone", 1, ttl_seconds=-1)
+
+    assert cache.get("gone") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_purges_expired_in_background():
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    cache.set("stale", 1, ttl_seconds=0.01)
+    cache.set("fresh", 2)
+
+    maintainer = CacheMaintainer(cache, sweep_seconds=0.02)
+    maintainer.start()
+    time.sleep(0.1)
+    maintainer.stop()
+
+    assert len(cache) == 1
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_cache_snapshot_roundtrip(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    cache.set("geo:10001", (40.75, -73.99))
+    cache.set("geo:old", (1.0, 2.0), ttl_seconds=-1)
+    cache.save(path)
+
+    restored = LRUCache(max_entries=10, ttl_seconds=60)
+    assert restored.load(path, decode=tuple) == 1
+    assert restored.get("geo:10001") == (40.75, -73.99)
+    assert restored.get("geo:old") is None